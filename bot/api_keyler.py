@@ -14,5 +14,9 @@ DISCORD_WEBHOOK_URL = os.environ.get("DISCORD_WEBHOOK_URL", "")
 
 USE_TESTNET = "True"
 
+# Binance Futures REST adresi - local benchmark/test için fake_exchange.py adresi verilebilir
+BINANCE_BASE_URL = os.environ.get("BINANCE_BASE_URL", "https://testnet.binancefuture.com")
+BINANCE_STREAM_URL = os.environ.get("BINANCE_STREAM_URL", "wss://stream.binancefuture.com")
+
 # NOT: Production'da API key'ler web sitesi üzerinden kullanıcıdan alınır
 # Environment variables sadece development/testing için kullanılır 
\ No newline at end of file
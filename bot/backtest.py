@@ -0,0 +1,464 @@
+"""
+Kaydedilmiş webhook sinyalleri için replay/backtest motoru
+
+bot_logs.log'daki (JSON satırları) "alert" kayıtlarını veya ayrı bir sinyal dosyasını, yerel OHLC mum verisi
+(CSV/Parquet) üzerinde sunucunun kullandığı TradingLimits ve PositionSizer ile yeniden oynatır.
+Stop tespiti, gerçekleşmemiş PnL ve drawdown NumPy ile vektörel hesaplanır.
+
+Varsayımlar (sunucuyla aynı model):
+- Limitler sadece giriş sinyallerine uygulanır; engellenen sinyal pozisyona dokunmaz
+- İzin verilen her giriş sinyali sunucudaki gibi sinyal anında bir işlem olarak kaydedilir (record_trade);
+  emirler simülasyonda reddedilmediği için başarılıdır - çıkışlar ve kapanan pozisyonun kârı/zararı sayaçlara girmez
+- buy/sell sinyali sinyal zamanından sonraki ilk mumun açılışında market emirle girer, ters sinyal pozisyonu çevirir
+- Giriş BracketExecutor'ın bracket'ini kurar: ATR stop (SL) ve sinyaldeki (geçersizse ATR katı) tp1-tp3 fiyatlarında
+  bekleyen TP bacakları; bacaklar mumun high/low'u seviyeye değince tetiklenir, fiyat seviyenin ötesinde açılırsa açılıştan dolar
+- Aynı mumda hem SL hem TP tetiklenirse önce SL (kötümser varsayım)
+- tp1/tp2 alarmı seviyenin bekleyen bacağını sinyalden sonraki açılışta kapatır (bacak dolmuşsa işlem yok), tp3 kalanı kapatır
+
+Sunucudan farklar:
+- Aynı yönde tekrar giriş pozisyona eklenmez (sayaçlara yine işlenir); ters giriş kapat + aç olarak modellenir
+
+Mum dosyaları: <dizin>/<SEMBOL>.csv veya <SEMBOL>.parquet; kolonlar open_time (s veya ms), open, high, low, close.
+Başlıksız Binance kline CSV'leri de okunur.
+
+Kullanım:
+    python3 backtest.py --alerts bot_logs.log --bars data/1m --max-daily-trades 5,10,20 --max-failed-trades 2,3 --risk 0.5,1
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+from trading_limits import TradingLimits
+from position_sizing import PositionSizer, SymbolFilters, SizingError
+from order_execution import BracketExecutor, TP_LEVELS
+
+TIME_COLUMNS = ("open_time", "timestamp", "time", "ts", "date")
+ENTRY_SIGNALS = ("buy", "smart_buy", "sell", "smart_sell")
+
+class BacktestError(Exception):
+    pass
+
+def _to_seconds(value):
+    """Epoch saniye/milisaniye veya ISO tarihini epoch saniyeye çevirir"""
+    if value is None or value == "":
+        return None
+    try:
+        number = float(value)
+        return number / 1000 if number > 1e11 else number
+    except (TypeError, ValueError):
+        parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed.timestamp()
+
+# Yeniden oynatılacak tek sinyal
+class Alert:
+    __slots__ = ('time', 'signal', 'symbol', 'price', 'atr', 'risk', 'tp_prices')
+
+    def __init__(self, time, signal, symbol, price=0.0, atr=0.0, risk=1.0, tp_prices=()):
+        self.time = time
+        self.signal = signal
+        self.symbol = symbol
+        self.price = price
+        self.atr = atr
+        self.risk = risk
+        self.tp_prices = tp_prices
+
+    @classmethod
+    def from_dict(cls, data, ts=None):
+        ts = ts if ts is not None else _to_seconds(data.get("time") or data.get("ts") or data.get("bar_time"))
+        if ts is None or not data.get("signal") or not data.get("symbol"):
+            return None
+        return cls(ts, str(data["signal"]).lower(), str(data["symbol"]).upper(),
+                   float(data.get("price") or 0), float(data.get("atr") or 0), float(data.get("risk") or 1),
+                   [data.get(level) for level in TP_LEVELS])
+
+def load_alerts(path):
+    """JSON log satırlarından, JSONL'den veya CSV'den sinyalleri zaman sırasıyla yükler"""
+    alerts = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if path.endswith(".csv"):
+            rows = ((row, None) for row in csv.DictReader(f))
+        else:
+            rows = _json_rows(f)
+        for row, ts in rows:
+            alert = Alert.from_dict(row, ts)
+            if alert:
+                alerts.append(alert)
+    alerts.sort(key=lambda a: a.time)
+    return alerts
+
+def _json_rows(lines):
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            # Eski metin formatındaki log satırları atlanır
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "alert" in record:
+            yield record["alert"], _to_seconds(record.get("ts"))
+        elif "signal" in record:
+            yield record, None
+
+# Tek sembolün mum dizileri
+class Bars:
+    __slots__ = ('symbol', 'ts', 'open', 'high', 'low', 'close', 'gidx')
+
+    def __init__(self, symbol, ts, open_, high, low, close):
+        order = np.argsort(ts, kind="stable")
+        self.symbol = symbol
+        self.ts = ts[order]
+        self.open = open_[order]
+        self.high = high[order]
+        self.low = low[order]
+        self.close = close[order]
+        self.gidx = None
+
+def _column(header, names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    raise BacktestError(f"Kolon bulunamadı: {names[0]}")
+
+def load_bars(symbol, path):
+    if path.endswith(".parquet"):
+        if pd is None:
+            raise BacktestError("Parquet okumak için pandas + pyarrow gerekli")
+        frame = pd.read_parquet(path)
+        frame.columns = [str(c).lower() for c in frame.columns]
+        time_column = next((c for c in TIME_COLUMNS if c in frame.columns), None)
+        if time_column is None:
+            raise BacktestError(f"{path}: zaman kolonu yok")
+        ts = frame[time_column]
+        ts = ts.astype("int64") / 1e9 if str(ts.dtype).startswith("datetime") else ts.to_numpy(dtype=float)
+        data = [np.asarray(ts, dtype=float)] + [frame[c].to_numpy(dtype=float) for c in ("open", "high", "low", "close")]
+    else:
+        with open(path) as f:
+            first = f.readline().strip().split(",")
+        try:
+            float(first[0])
+            # Başlıksız Binance kline formatı: open_time, open, high, low, close, ...
+            columns, skip = [0, 1, 2, 3, 4], 0
+        except ValueError:
+            header = [h.strip().lower() for h in first]
+            columns = [_column(header, TIME_COLUMNS)] + [_column(header, (c,)) for c in ("open", "high", "low", "close")]
+            skip = 1
+        raw = np.loadtxt(path, delimiter=",", skiprows=skip, usecols=columns, ndmin=2)
+        data = [raw[:, i] for i in range(5)]
+
+    ts = data[0]
+    if len(ts) and ts.max() > 1e11:
+        ts = ts / 1000
+    return Bars(symbol, ts, *data[1:])
+
+def load_bars_dir(directory, symbols):
+    bars = {}
+    for symbol in symbols:
+        for extension in (".parquet", ".csv"):
+            path = os.path.join(directory, symbol + extension)
+            if os.path.exists(path):
+                bars[symbol] = load_bars(symbol, path)
+                break
+    return bars
+
+def build_grid(bars):
+    """Tüm sembollerin ortak zaman ızgarası; her sembolün mumlarının ızgaradaki indeksleri gidx'e yazılır"""
+    if not bars:
+        return np.zeros(0)
+    grid = np.unique(np.concatenate([series.ts for series in bars.values()]))
+    for series in bars.values():
+        series.gidx = np.searchsorted(grid, series.ts)
+    return grid
+
+# exchange_info cache'i yerine sabit filtre tablosu
+class StaticExchangeInfo:
+    def __init__(self, filters=None, default_filters=True):
+        self.filters = filters or {}
+        self.default_filters = default_filters
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            info = json.load(f)
+        return cls({s['symbol']: SymbolFilters.from_exchange_info(s) for s in info.get('symbols', [])}, False)
+
+    def get(self, symbol, wait=None):
+        filters = self.filters.get(symbol)
+        if filters is None and self.default_filters:
+            filters = self.filters[symbol] = SymbolFilters(symbol, "0.0001", "0.001", "0.001", "1e12", "0")
+        return filters
+
+class _Position:
+    __slots__ = ('symbol', 'direction', 'qty', 'initial_qty', 'entry_price', 'entry_index', 'stop', 'targets',
+                 'checked_until', 'realized')
+
+    def __init__(self, symbol, direction, qty, entry_price, entry_index, stop, targets):
+        self.symbol = symbol
+        self.direction = direction
+        self.qty = qty
+        self.initial_qty = qty
+        self.entry_price = entry_price
+        self.entry_index = entry_index
+        self.stop = stop
+        # Bekleyen TP bacakları: {seviye: (fiyat, miktar)}
+        self.targets = targets
+        self.checked_until = entry_index
+        self.realized = 0.0
+
+# Tek parametre seti için simülasyon
+class Backtest:
+    def __init__(self, bars, exchange_info, initial_balance=10000.0, max_daily_trades=10, max_failed_trades=3,
+                 max_open_positions=5, risk=None, atr_multiplier=1.5, max_leverage=10, fee_rate=0.0004, grid=None,
+                 tp_multipliers=(1.0, 2.0, 3.0)):
+        self.bars = bars
+        # Parametre taramasında ızgara bir kez kurulup paylaşılır
+        self.grid = grid if grid is not None else build_grid(bars)
+        self.initial_balance = initial_balance
+        self.risk = risk
+        self.fee_rate = fee_rate
+        self.params = {
+            "max_daily_trades": max_daily_trades,
+            "max_failed_trades": max_failed_trades,
+            "max_open_positions": max_open_positions,
+            "risk": risk
+        }
+        self.balance = initial_balance
+        self.now = 0.0
+        self.positions = {}
+        self.legs = []
+        self.trades = []
+        self.counts = {"signals": 0, "blocked": 0, "sizing_errors": 0, "no_bars": 0, "ignored": 0}
+        self.limits = TradingLimits(max_failed_trades=max_failed_trades, max_daily_trades=max_daily_trades,
+                                    max_open_positions=max_open_positions,
+                                    open_positions=lambda: list(self.positions), clock=lambda: self.now)
+        self.sizer = PositionSizer(exchange_info, atr_multiplier=atr_multiplier, max_leverage=max_leverage)
+        self.brackets = BracketExecutor(exchange_info, tp_multipliers=tp_multipliers)
+
+    def run(self, alerts):
+        for alert in alerts:
+            self.counts["signals"] += 1
+            series = self.bars.get(alert.symbol)
+            if series is None:
+                self.counts["no_bars"] += 1
+                continue
+            self._check_stops(alert.time)
+            self.now = alert.time
+            i = int(np.searchsorted(series.ts, alert.time, side="left"))
+            if i >= len(series.ts):
+                self.counts["no_bars"] += 1
+                continue
+
+            position = self.positions.get(alert.symbol)
+            if alert.signal in ENTRY_SIGNALS:
+                if not self.limits.can_trade(alert.symbol):
+                    self.counts["blocked"] += 1
+                    continue
+                direction = 1 if "buy" in alert.signal else -1
+                if position and position.direction == direction:
+                    self.counts["ignored"] += 1
+                    self.limits.record_trade(alert.symbol, is_successful=True)
+                    continue
+                if position:
+                    self._close(position, series, i, series.open[i], position.qty)
+                self._open(alert, series, i, direction)
+            elif alert.signal in TP_LEVELS and position:
+                self._take_profit(position, alert.signal, series, i)
+            else:
+                self.counts["ignored"] += 1
+
+        # Kalan pozisyonlar: veri sonuna kadar stop kontrolü, sonra son kapanıştan kapatılır
+        self._check_stops(float("inf"))
+        for position in list(self.positions.values()):
+            series = self.bars[position.symbol]
+            last = len(series.ts) - 1
+            self.now = series.ts[last]
+            self._close(position, series, last, series.close[last], position.qty)
+        return self.report()
+
+    def _open(self, alert, series, i, direction):
+        # Boyut ve stop gerçek dolum fiyatından (sonraki mum açılışı) hesaplanır
+        price = float(series.open[i])
+        try:
+            order = self.sizer.size(alert.symbol, "BUY" if direction > 0 else "SELL", self.balance,
+                                    self.risk if self.risk is not None else alert.risk, price, alert.atr)
+        except SizingError:
+            self.counts["sizing_errors"] += 1
+            return
+        # Sunucu gibi: emir gönderilen giriş sinyali anında işlem olarak sayılır
+        self.limits.record_trade(alert.symbol, is_successful=True)
+        legs = self.brackets.build_bracket(order, alert.atr, alert.tp_prices)
+        targets = {leg.name: (float(leg.params["stopPrice"]), float(leg.params["quantity"]))
+                   for leg in legs if leg.name in TP_LEVELS}
+        self.positions[alert.symbol] = _Position(alert.symbol, direction, float(order.quantity),
+                                                 price, i, float(order.stop_price), targets)
+
+    def _take_profit(self, position, level, series, i):
+        """tp alarmı: bekleyen bacak açılıştan kapanır (dolmuşsa işlem yok), tp3 kalan pozisyonu kapatır"""
+        if level == TP_LEVELS[-1]:
+            self._close(position, series, i, series.open[i], position.qty)
+        elif level in position.targets:
+            _, qty = position.targets.pop(level)
+            self._close(position, series, i, series.open[i], min(qty, position.qty))
+        else:
+            self.counts["ignored"] += 1
+
+    def _check_stops(self, until):
+        """SL ve bekleyen TP bacaklarını until anına kadar mum mum (vektörel) tetikler"""
+        for position in list(self.positions.values()):
+            series = self.bars[position.symbol]
+            end = int(np.searchsorted(series.ts, until, side="left")) if until != float("inf") else len(series.ts)
+            while position.symbol in self.positions and position.checked_until < end:
+                start = position.checked_until
+                long = position.direction > 0
+                lows, highs = series.low[start:end], series.high[start:end]
+                # Her bacağın ilk tetiklendiği mum (yoksa aralık dışı)
+                events = []
+                stop_hits = lows <= position.stop if long else highs >= position.stop
+                if stop_hits.any():
+                    events.append((int(stop_hits.argmax()), 0, None))
+                for level, (target, _) in position.targets.items():
+                    hits = highs >= target if long else lows <= target
+                    if hits.any():
+                        events.append((int(hits.argmax()), 1, level))
+                if not events:
+                    position.checked_until = end
+                    break
+                offset, _, level = min(events)
+                j = start + offset
+                bar_open = series.open[j]
+                self.now = series.ts[j]
+                if level is None:
+                    price = min(bar_open, position.stop) if long else max(bar_open, position.stop)
+                    self._close(position, series, j, price, position.qty)
+                else:
+                    target, qty = position.targets.pop(level)
+                    price = max(bar_open, target) if long else min(bar_open, target)
+                    position.checked_until = j
+                    self._close(position, series, j, price, min(qty, position.qty))
+
+    def _close(self, position, series, j, price, qty):
+        pnl = (price - position.entry_price) * qty * position.direction
+        pnl -= self.fee_rate * (price + position.entry_price) * qty
+        self.balance += pnl
+        position.qty -= qty
+        position.realized += pnl
+        self.legs.append((position.symbol, position.entry_index, j, position.entry_price, qty, position.direction, pnl))
+        if position.qty <= position.initial_qty * 1e-9:
+            del self.positions[position.symbol]
+            self.trades.append((position.symbol, position.realized))
+
+    def equity_curve(self):
+        """(zaman, equity) dizileri - tüm semboller ortak zaman ızgarasında, gerçekleşmemiş PnL dahil"""
+        grid = self.grid
+        realized = np.zeros(len(grid))
+        unrealized = np.zeros(len(grid))
+        for symbol, entry_index, exit_index, entry_price, qty, direction, pnl in self.legs:
+            series = self.bars[symbol]
+            realized[series.gidx[exit_index]] += pnl
+            segment = slice(entry_index, exit_index)
+            unrealized[series.gidx[segment]] += (series.close[segment] - entry_price) * qty * direction
+        return grid, self.initial_balance + np.cumsum(realized) + unrealized
+
+    def report(self):
+        _, equity = self.equity_curve()
+        if len(equity):
+            peak = np.maximum.accumulate(np.maximum(equity, 1e-12))
+            max_drawdown = float(-((equity - peak) / peak).min()) * 100
+        else:
+            max_drawdown = 0.0
+        wins = sum(1 for _, pnl in self.trades if pnl > 0)
+        per_symbol = {}
+        for symbol, pnl in self.trades:
+            entry = per_symbol.setdefault(symbol, {"trades": 0, "pnl": 0.0})
+            entry["trades"] += 1
+            entry["pnl"] += pnl
+        return dict(self.params, **self.counts,
+                    trades=len(self.trades),
+                    win_rate=wins / len(self.trades) * 100 if self.trades else 0.0,
+                    pnl=self.balance - self.initial_balance,
+                    return_pct=(self.balance / self.initial_balance - 1) * 100,
+                    max_drawdown_pct=max_drawdown,
+                    final_balance=self.balance,
+                    per_symbol=per_symbol)
+
+def _float_list(value):
+    return [float(v) for v in value.split(",")] if value else [None]
+
+def _int_list(value):
+    return [int(v) for v in value.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded alerts over OHLC bars")
+    parser.add_argument("--alerts", required=True, help="bot_logs.log (JSON satırları), .jsonl veya .csv")
+    parser.add_argument("--bars", required=True, help="<SEMBOL>.csv/.parquet mum dosyalarının dizini")
+    parser.add_argument("--exchange-info", help="kaydedilmiş /fapi/v1/exchangeInfo JSON'u (yoksa genel filtreler)")
+    parser.add_argument("--balance", type=float, default=10000.0)
+    parser.add_argument("--max-daily-trades", default="10", help="virgülle ayrılmış değerler taranır")
+    parser.add_argument("--max-failed-trades", default="3")
+    parser.add_argument("--max-open-positions", default="5")
+    parser.add_argument("--risk", default="", help="risk %% (boşsa sinyaldeki risk kullanılır)")
+    parser.add_argument("--atr-multiplier", type=float, default=1.5)
+    parser.add_argument("--max-leverage", type=float, default=10)
+    parser.add_argument("--tp-atr-multipliers", default="1,2,3", help="sinyalde TP fiyatı yoksa entry ± ATR katları")
+    parser.add_argument("--fee", type=float, default=0.0004, help="taraf başına komisyon oranı")
+    parser.add_argument("--json", action="store_true", help="sonuçları JSON olarak yaz")
+    args = parser.parse_args()
+
+    if np is None:
+        print("backtest.py için numpy gerekli: pip install numpy")
+        return 1
+
+    # Limit sınıfının işlem başı INFO/WARNING logları tablo çıktısını boğmasın
+    logging.getLogger("trade_bot").setLevel(logging.ERROR)
+    started = time.perf_counter()
+    alerts = load_alerts(args.alerts)
+    bars = load_bars_dir(args.bars, sorted({a.symbol for a in alerts}))
+    exchange_info = StaticExchangeInfo.from_file(args.exchange_info) if args.exchange_info else StaticExchangeInfo()
+    grid = build_grid(bars)
+    loaded = time.perf_counter()
+    print(f"{len(alerts)} sinyal, {len(bars)} sembol, {sum(len(b.ts) for b in bars.values())} mum yüklendi "
+          f"({loaded - started:.2f}s)", file=sys.stderr)
+
+    results = []
+    for daily, failed, open_positions, risk in itertools.product(
+            _int_list(args.max_daily_trades), _int_list(args.max_failed_trades),
+            _int_list(args.max_open_positions), _float_list(args.risk)):
+        backtest = Backtest(bars, exchange_info, args.balance, daily, failed, open_positions, risk,
+                            args.atr_multiplier, args.max_leverage, args.fee, grid,
+                            [float(m) for m in args.tp_atr_multipliers.split(",")])
+        results.append(backtest.run(alerts))
+    print(f"{len(results)} parametre seti {time.perf_counter() - loaded:.2f}s içinde çalıştı", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'daily':>5} {'failed':>6} {'open':>4} {'risk':>5} {'trades':>6} {'blocked':>7} {'win %':>6} "
+          f"{'pnl':>11} {'return %':>8} {'max dd %':>8}")
+    for r in sorted(results, key=lambda r: r["pnl"], reverse=True):
+        risk = "sig" if r["risk"] is None else f"{r['risk']:g}"
+        print(f"{r['max_daily_trades']:>5} {r['max_failed_trades']:>6} {r['max_open_positions']:>4} {risk:>5} "
+              f"{r['trades']:>6} {r['blocked']:>7} {r['win_rate']:>6.1f} {r['pnl']:>11.2f} "
+              f"{r['return_pct']:>8.2f} {r['max_drawdown_pct']:>8.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
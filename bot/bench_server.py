@@ -0,0 +1,197 @@
+"""
+Webhook sunucusu uçtan uca yük/gecikme benchmark'ı
+
+Sunucuyu local fake exchange'e (fake_exchange.py) bağlı ayrı bir süreçte çalıştırır, API key bağlar,
+botu başlatır ve /webhook, /api/bot/status, /api/keys uçlarına sabit hızda (open-loop) istek gönderir.
+Gecikme, isteğin planlanan gönderim anından ölçülür - yavaş yanıtlar sonraki istekleri geciktirmez.
+
+Kullanım:
+    python3 bench_server.py --duration 20 --webhook-rps 50 --status-rps 10 --keys-rps 2
+    python3 bench_server.py --url http://127.0.0.1:5000 --no-spawn   # çalışan sunucuya karşı
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_exchange
+
+SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT"]
+FAKE_KEY = "k" * 64
+FAKE_SECRET = "s" * 64
+
+def request(base_url, method, path, body=None, headers=None, timeout=30):
+    """(HTTP kodu, gövde) döndürür - hata kodları exception fırlatmaz"""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method, headers=headers or {})
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def wait_healthy(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if request(base_url, "GET", "/health", timeout=2)[0] == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.02)
+    return False
+
+def spawn_server(port, exchange_url, extra_env):
+    env = dict(os.environ, PORT=str(port), BINANCE_BASE_URL=exchange_url,
+               BINANCE_STREAM_URL=exchange_url.replace("http://", "ws://"),
+               TRADE_JOURNAL_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-"), "journal.db"),
+               # Üretim limitleri (günde sembol başına 10 işlem, 5 pozisyon) yükün çoğunu 429'a çevirir - bench'te
+               # sipariş yolu ölçülsün diye yükseltilir; --env MAX_DAILY_TRADES=10 ile engelleme yolu da ölçülebilir
+               MAX_DAILY_TRADES="1000000", MAX_FAILED_TRADES="1000000", MAX_OPEN_POSITIONS="1000")
+    env.update(extra_env)
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen([sys.executable, os.path.join(here, "webhook_server.py")], cwd=here, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+# Tek endpoint için open-loop yük üreticisi
+class Load:
+    def __init__(self, name, rps, make_request):
+        self.name = name
+        self.rps = rps
+        self.make_request = make_request
+        self.latencies = []
+        self.codes = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def run(self, pool, duration):
+        if self.rps <= 0:
+            return
+        interval = 1.0 / self.rps
+        started = time.monotonic()
+        i = 0
+        while True:
+            scheduled = started + i * interval
+            if scheduled - started >= duration:
+                break
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(self._one, i, scheduled)
+            i += 1
+
+    def _one(self, i, scheduled):
+        try:
+            code, _ = self.make_request(i)
+        except OSError:
+            code = None
+        elapsed = (time.monotonic() - scheduled) * 1000
+        with self._lock:
+            self.latencies.append(elapsed)
+            if code is None:
+                self.errors += 1
+            else:
+                self.codes[code] = self.codes.get(code, 0) + 1
+
+    def report(self, duration):
+        count = len(self.latencies)
+        codes = " ".join(f"{code}:{n}" for code, n in sorted(self.codes.items()))
+        print(f"{self.name:<16} {count:>7} {count / duration:>8.1f} {percentile(self.latencies, 50):>9.1f} "
+              f"{percentile(self.latencies, 99):>9.1f} {max(self.latencies, default=0):>9.1f}  {codes} err:{self.errors}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook server load/latency benchmark")
+    parser.add_argument("--url", default=None, help="çalışan sunucu adresi (verilmezse sunucu başlatılır)")
+    parser.add_argument("--no-spawn", action="store_true", help="sunucu başlatma, --url adresini kullan")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--webhook-rps", type=float, default=50.0)
+    parser.add_argument("--status-rps", type=float, default=10.0)
+    parser.add_argument("--keys-rps", type=float, default=1.0)
+    parser.add_argument("--users", type=int, default=1, help="bağlanacak hesap sayısı")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--exchange-latency-ms", type=float, default=30.0)
+    parser.add_argument("--exchange-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--exchange-error-rate", type=float, default=0.0)
+    parser.add_argument("--env", action="append", default=[], help="sunucuya ek ortam değişkeni (KEY=VALUE)")
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.url or f"http://127.0.0.1:{args.port}"
+    spawned_at = time.monotonic()
+    if not args.no_spawn:
+        _, exchange_url = fake_exchange.start_in_thread(
+            port=0, latency_ms=args.exchange_latency_ms, jitter_ms=args.exchange_jitter_ms,
+            error_rate=args.exchange_error_rate)
+        extra_env = dict(item.split("=", 1) for item in args.env)
+        process = spawn_server(args.port, exchange_url, extra_env)
+        print(f"Fake exchange: {exchange_url}  sunucu: {base_url}")
+
+    try:
+        if not wait_healthy(base_url):
+            print("Sunucu /health yanıtı vermedi")
+            return 1
+        if process:
+            # Açılış regresyonları için: süreç başlatmadan ilk sağlıklı yanıta kadar geçen süre
+            print(f"İlk sağlıklı yanıt: {(time.monotonic() - spawned_at) * 1000:.0f} ms")
+
+        for n in range(args.users):
+            code, body = request(base_url, "POST", "/api/keys", {
+                "user_id": f"bench-{n}", "api_key": FAKE_KEY, "secret_key": FAKE_SECRET, "action": "connect"})
+            if code != 200:
+                print(f"API key bağlanamadı ({code}): {body[:200]}")
+                return 1
+        request(base_url, "POST", "/api/bot/start", {"user_id": "bench-0"})
+
+        def webhook(i):
+            symbol = SYMBOLS[i % len(SYMBOLS)]
+            # Fiyat/ATR sembolün fake exchange fiyatından - sabit fiyat ucuz sembollerde geçersiz stop (400) üretir
+            price = fake_exchange.DEFAULT_PRICES[symbol]
+            return request(base_url, "POST", "/webhook", {
+                "signal": "buy" if i % 2 == 0 else "sell", "symbol": symbol, "price": price,
+                "atr": price * 0.01, "risk": 1, "bar_time": f"bench-{i}"})
+
+        def status(i):
+            return request(base_url, "GET", "/api/bot/status")
+
+        def keys(i):
+            return request(base_url, "POST", "/api/keys", {"user_id": f"bench-{i % args.users}", "action": "status"})
+
+        loads = [Load("/webhook", args.webhook_rps, webhook),
+                 Load("/api/bot/status", args.status_rps, status),
+                 Load("/api/keys", args.keys_rps, keys)]
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            drivers = [threading.Thread(target=load.run, args=(pool, args.duration)) for load in loads]
+            for driver in drivers:
+                driver.start()
+            for driver in drivers:
+                driver.join()
+
+        print(f"\n{'endpoint':<16} {'count':>7} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}  codes")
+        for load in loads:
+            if load.rps > 0:
+                load.report(args.duration)
+        return 0
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+
+if __name__ == "__main__":
+    sys.exit(main())
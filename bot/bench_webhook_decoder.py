@@ -0,0 +1,161 @@
+"""
+Webhook decoder mikro-benchmark'ı
+
+Eski parse_webhook_data() zinciri ile tek geçişli decode_payload()'ı, mevcut fonksiyonun
+kabul ettiği her format için karşılaştırır.
+
+Kullanım:
+    python3 bench_webhook_decoder.py [-n 20000]
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qsl, quote, urlencode
+
+from webhook_decoder import decode_payload, decode_webhook_request
+
+logger = logging.getLogger("trade_bot")
+
+PAYLOAD = {"signal": "smart_buy", "symbol": "BTCUSDT", "price": "65123.5", "atr": "412.7", "risk": "1.5",
+           "tp1": "65600", "tp2": "66100", "tp3": "66900"}
+PAYLOAD_JSON = json.dumps(PAYLOAD)
+
+# (isim, body, content_type, query_string)
+FORMATS = [
+    ("json", PAYLOAD_JSON.encode(), "application/json", ""),
+    ("json_text_plain", PAYLOAD_JSON.encode(), "text/plain", ""),
+    ("alert", f"alert('{PAYLOAD_JSON}')".encode(), "text/plain", ""),
+    ("form_json_key", quote(PAYLOAD_JSON).encode(), "application/x-www-form-urlencoded", ""),
+    ("form_fields", urlencode(PAYLOAD).encode(), "application/x-www-form-urlencoded", ""),
+    ("query_string", b"", "", urlencode(PAYLOAD)),
+]
+
+def legacy_parse_webhook_data(request):
+    """Referans: eski parse_webhook_data() (loglama dahil, değiştirilmeden)"""
+    try:
+        content_type = request.content_type or ""
+        raw_data = request.data.decode('utf-8') if request.data else ""
+
+        logger.info(f"📨 Webhook alındı - Content-Type: '{content_type}'")
+        logger.info(f"📨 Raw data: {raw_data[:200]}...")
+
+        data = None
+
+        if 'application/json' in content_type:
+            try:
+                data = request.get_json(force=False)
+                if data:
+                    logger.info("✅ JSON formatında parse edildi")
+                    return data
+            except Exception as e:
+                logger.warning(f"JSON parse hatası: {e}")
+
+        if request.form:
+            form_data = dict(request.form)
+            logger.info(f"📋 Form data alındı: {list(form_data.keys())}")
+            if form_data:
+                first_key = list(form_data.keys())[0]
+                try:
+                    data = json.loads(first_key)
+                    logger.info("✅ Form data JSON olarak parse edildi")
+                    return data
+                except:
+                    logger.info("📋 Form data direkt kullanılıyor")
+                    return form_data
+
+        if raw_data:
+            try:
+                if 'alert(' in raw_data:
+                    start_index = raw_data.find('{')
+                    end_index = raw_data.rfind('}')
+                    if start_index != -1 and end_index != -1:
+                        json_str = raw_data[start_index:end_index+1]
+                        data = json.loads(json_str)
+                        logger.info("✅ Alert formatından JSON parse edildi")
+                        return data
+
+                if raw_data.strip().startswith('{'):
+                    data = json.loads(raw_data)
+                    logger.info("✅ Raw JSON parse edildi")
+                    return data
+
+            except Exception as e:
+                logger.warning(f"Raw data parse hatası: {e}")
+
+        if request.values:
+            data = dict(request.values)
+            logger.info(f"🌐 URL-encoded data alındı: {list(data.keys())}")
+            return data
+
+        try:
+            data = request.get_json(force=True)
+            if data:
+                logger.info("✅ Force JSON parse başarılı")
+                return data
+        except Exception as e:
+            logger.warning(f"Force JSON parse hatası: {e}")
+
+        logger.error("❌ Hiçbir format parse edilemedi")
+        return None
+
+    except Exception as e:
+        logger.error(f"Webhook data parse hatası: {e}")
+        return None
+
+def timed(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+def bench_raw(n):
+    """Flask olmadan, sadece decoder maliyeti"""
+    print(f"\n== decode_payload (ham byte, n={n}) ==")
+    for name, body, content_type, query in FORMATS:
+        args = dict(parse_qsl(query)) if query else None
+        us = timed(lambda: decode_payload(body, content_type, args=args), n)
+        print(f"{name:<18} {us:8.2f} µs/istek")
+
+def bench_flask(n):
+    """Flask request üzerinden eski ve yeni yolun karşılaştırılması"""
+    try:
+        from flask import Flask, Request
+        from werkzeug.test import EnvironBuilder
+    except ImportError:
+        print("\nFlask kurulu değil - request tabanlı karşılaştırma atlandı")
+        return
+
+    app = Flask(__name__)
+    print(f"\n== Flask request (n={n}, request oluşturma maliyeti çıkarılmış) ==")
+    print(f"{'format':<18} {'eski':>10} {'yeni':>10} {'hızlanma':>9}")
+    with app.app_context():
+        for name, body, content_type, query in FORMATS:
+            def make_request():
+                builder = EnvironBuilder(method="POST", path="/webhook", data=body,
+                                         content_type=content_type or None, query_string=query)
+                return Request(builder.get_environ())
+
+            base = timed(make_request, n)
+            legacy = timed(lambda: legacy_parse_webhook_data(make_request()), n) - base
+            new = timed(lambda: decode_webhook_request(make_request()), n) - base
+            print(f"{name:<18} {legacy:8.2f}µs {new:8.2f}µs {legacy / max(new, 0.01):8.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Webhook decoder benchmark")
+    parser.add_argument("-n", type=int, default=20000, help="format başına iterasyon")
+    args = parser.parse_args()
+
+    # Eski fonksiyonun INFO loglarının formatlama maliyeti ölçüme dahil, çıktı /dev/null'a gider
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    bench_raw(args.n)
+    bench_flask(args.n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger("trade_bot")
+
+# Kullanıcı bazlı, uzun ömürlü (keep-alive) Binance client havuzu
+class ClientRegistry:
+    def __init__(self, factory, idle_timeout=900):
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, user_id, api_key, secret_key):
+        """Kullanıcının client'ını döndürür, yoksa (veya key değiştiyse) yenisini oluşturur"""
+        now = time.monotonic()
+        credentials = (api_key, secret_key)
+        self.evict_idle(now)
+
+        with self._lock:
+            entry = self._clients.get(user_id)
+            if entry and entry['credentials'] == credentials:
+                entry['last_used'] = now
+                self.hits += 1
+                return entry['client']
+            self.misses += 1
+
+        # Client oluşturma (HTTP session) lock dışında yapılır
+        client = self.factory(api_key, secret_key)
+        self.put(user_id, client, api_key, secret_key)
+        logger.info(f"🔌 Yeni client oluşturuldu: {user_id}")
+        return client
+
+    def put(self, user_id, client, api_key, secret_key):
+        """Hazır bir client'ı havuza ekler (örn. /api/keys bağlantı testinde oluşturulan)"""
+        with self._lock:
+            old = self._clients.get(user_id)
+            self._clients[user_id] = {
+                'client': client,
+                'credentials': (api_key, secret_key),
+                'last_used': time.monotonic()
+            }
+        if old and old['client'] is not client:
+            self._close(old['client'])
+
+    def evict(self, user_id):
+        """Kullanıcının client'ını havuzdan çıkarır ve session'ını kapatır"""
+        with self._lock:
+            entry = self._clients.pop(user_id, None)
+            if entry:
+                self.evictions += 1
+        if entry:
+            self._close(entry['client'])
+            logger.info(f"🔌 Client havuzdan çıkarıldı: {user_id}")
+        return entry is not None
+
+    def evict_idle(self, now=None):
+        """idle_timeout süresince kullanılmayan client'ları temizler"""
+        now = now or time.monotonic()
+        with self._lock:
+            # Taramayı en fazla dakikada bir yap - kontrol ve güncelleme aynı kilit altında, taramalar çakışmaz
+            if now - self._last_sweep < 60:
+                return 0
+            self._last_sweep = now
+            # Boşta kalanlar kilit altında çıkarılır - arada kullanılan client kapatılmaz
+            idle = [(user_id, self._clients.pop(user_id)) for user_id, entry in list(self._clients.items())
+                    if now - entry['last_used'] >= self.idle_timeout]
+            self.evictions += len(idle)
+        for user_id, entry in idle:
+            self._close(entry['client'])
+            logger.info(f"🔌 Client havuzdan çıkarıldı: {user_id}")
+        return len(idle)
+
+    def stats(self):
+        """Havuz istatistiklerini döndürür"""
+        with self._lock:
+            size = len(self._clients)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def _close(self, client):
+        session = getattr(client, 'session', None)
+        if session is not None:
+            try:
+                session.close()
+            except Exception as e:
+                logger.warning(f"Client session kapatma hatası: {e}")
@@ -0,0 +1,153 @@
+import json
+import queue
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger("trade_bot")
+
+# Dashboard snapshot'ı, versiyon (ETag) ve Server-Sent Events yayını
+# Snapshot sadece durum değiştiğinde yeniden üretilir; pozisyonlar izleyici varken arka planda yenilenir
+# Paylaşılan state backend'i verilirse versiyon tüm worker'larda ortaktır - bir worker'daki değişiklik diğerlerinin 304'ünü bozar
+class DashboardFeed:
+    def __init__(self, build_snapshot, refresh_positions=None, refresh_interval=15, viewer_ttl=60,
+                 heartbeat_interval=15, max_subscribers=100, shared=None, poll_interval=1.0):
+        self.build_snapshot = build_snapshot
+        self.refresh_positions = refresh_positions
+        self.refresh_interval = refresh_interval
+        self.viewer_ttl = viewer_ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.max_subscribers = max_subscribers
+        self.positions = []
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._version = 0
+        self._boot_id = uuid.uuid4().hex[:8]
+        if shared:
+            # ETag öneki de ortaktır - aynı versiyon her worker'da aynı ETag'i üretir
+            shared.hsetnx("dashboard", "boot", self._boot_id)
+            self._boot_id = shared.hget("dashboard", "boot", self._boot_id)
+        self._snapshot = None
+        self._snapshot_version = -1
+        self._last_viewer = 0.0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def version(self):
+        if self.shared:
+            return self.shared.hget("dashboard", "version", {"n": 0})["n"]
+        return self._version
+
+    @property
+    def etag(self):
+        return self.etag_for(self.version)
+
+    def etag_for(self, version):
+        return f'"{self._boot_id}-{version}"'
+
+    def bump(self, reason=""):
+        """Durum değişti - versiyonu artırır ve SSE abonelerini uyarır"""
+        if self.shared:
+            self.shared.hincr("dashboard", "version", n=1)
+        with self._lock:
+            self._version += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(reason)
+            except queue.Full:
+                pass
+
+    def current(self):
+        """(versiyon, snapshot) döndürür - snapshot versiyon başına bir kez üretilir"""
+        self.touch()
+        version = self.version
+        with self._lock:
+            if self._snapshot_version == version:
+                return version, self._snapshot
+        snapshot = self.build_snapshot()
+        with self._lock:
+            if version >= self._snapshot_version:
+                self._snapshot = snapshot
+                self._snapshot_version = version
+        return version, snapshot
+
+    def touch(self):
+        """İzleyici aktivitesini işaretler ve pozisyon yenileyiciyi başlatır"""
+        self._last_viewer = time.monotonic()
+        if self.refresh_positions and (self._thread is None or not self._thread.is_alive()):
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._refresh_loop, name="dashboard-refresh", daemon=True)
+                    self._thread.start()
+
+    def set_positions(self, positions):
+        """Pozisyon görünümünü günceller, değiştiyse versiyonu artırır"""
+        if positions != self.positions:
+            self.positions = positions
+            self.bump("positions")
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=16)
+            self._subscribers.add(subscriber)
+        self.touch()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, subscriber):
+        """SSE olay üreticisi: ilk mesajda tam snapshot, sonrasında sadece değişen bölümler"""
+        try:
+            version, last = self.current()
+            yield self._format_event("snapshot", version, last)
+            # Diğer worker'lardaki değişiklikler paylaşılan versiyon yoklanarak fark edilir
+            wait = min(self.poll_interval, self.heartbeat_interval) if self.shared else self.heartbeat_interval
+            idle = 0.0
+            while True:
+                try:
+                    subscriber.get(timeout=wait)
+                except queue.Empty:
+                    idle += wait
+                    if not self.shared or self.version == version:
+                        if idle >= self.heartbeat_interval:
+                            idle = 0.0
+                            self.touch()
+                            yield ": keepalive\n\n"
+                        continue
+                idle = 0.0
+                # Art arda gelen değişiklikleri tek delta'da birleştir
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+
+                version, snapshot = self.current()
+                delta = {key: value for key, value in snapshot.items() if last.get(key) != value}
+                last = snapshot
+                if delta:
+                    yield self._format_event("delta", version, delta)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "subscribers": len(self._subscribers)
+        }
+
+    def _format_event(self, event, version, data):
+        return f"event: {event}\nid: {version}\ndata: {json.dumps(dict(data, version=version))}\n\n"
+
+    def _refresh_loop(self):
+        while time.monotonic() - self._last_viewer < self.viewer_ttl or self._subscribers:
+            try:
+                self.set_positions(self.refresh_positions())
+            except Exception as e:
+                logger.error(f"Dashboard pozisyon yenileme hatası: {e}")
+            time.sleep(self.refresh_interval)
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+_RELEASED = object()
+
+# Webhook idempotency cache kaydı
+class IdempotencyEntry:
+    __slots__ = ('key', 'expires_at', 'result', 'done', 'remote')
+
+    def __init__(self, key, expires_at, remote=False):
+        self.key = key
+        self.expires_at = expires_at
+        self.result = None
+        self.done = threading.Event()
+        # Sinyal başka bir worker'da işleniyor - sonuç paylaşılan state'ten okunur
+        self.remote = remote
+
+# TTL'li, boyutu sınırlı LRU idempotency cache'i - tekrar gelen sinyaller ilk sonucu alır
+# shared verilirse (paylaşılan state backend'i) sahiplik worker'lar arasında da tekildir
+class IdempotencyCache:
+    def __init__(self, max_entries=10000, ttl=300, shared=None, poll_interval=0.05):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def begin(self, key):
+        """(sahip_mi, kayıt) döndürür; sahip değilse aynı key daha önce/şu an işleniyor demektir"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return False, entry
+
+            entry = IdempotencyEntry(key, now + self.ttl)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.misses += 1
+            self._evict(now)
+
+        if self.shared is not None and not self.shared.hsetnx("dedup", key, None, ttl=self.ttl):
+            # Başka worker sahiplendi - yerel kayıt uzak kayda döner
+            entry.remote = True
+            with self._lock:
+                self.hits += 1
+                self.misses -= 1
+            return False, entry
+        return True, entry
+
+    def complete(self, entry, result):
+        """Sonucu kaydeder ve bekleyen tekrarları uyandırır"""
+        entry.result = result
+        if self.shared is not None:
+            self.shared.hset("dedup", entry.key, list(result), ttl=self.ttl)
+        entry.done.set()
+
+    def abort(self, key, entry):
+        """İşlem başarısız oldu - key serbest bırakılır, tekrar denemeye izin verilir"""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        if self.shared is not None and not entry.remote:
+            self.shared.hdel("dedup", key)
+        entry.done.set()
+
+    def wait(self, entry, timeout=10):
+        """İlk isteğin sonucunu bekler; sonuç yoksa None döner"""
+        if not entry.remote:
+            entry.done.wait(timeout)
+            return entry.result
+
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.shared.hget("dedup", entry.key, _RELEASED)
+            if result is _RELEASED:
+                # Sahip worker işlemi bıraktı (hata) - sonraki tekrar yeniden işlenebilsin
+                self.abort(entry.key, entry)
+                return None
+            if result is not None:
+                entry.result = tuple(result)
+                return entry.result
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _evict(self, now):
+        # Süresi dolanları baştan temizle, sonra kapasiteyi aşanları at
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+def signal_idempotency_key(signal, header_key=None):
+    """Header/payload'daki idempotency key'i veya (symbol, signal, bar zamanı) hash'ini döndürür"""
+    explicit = header_key or signal.get('idempotency_key') or signal.get('alert_id')
+    if explicit:
+        return f"k:{explicit}"
+
+    bar_time = signal.get('bar_time') or signal.get('time')
+    if bar_time:
+        digest = hashlib.sha1(f"{signal.symbol}|{signal.signal}|{bar_time}".encode()).hexdigest()
+        return f"h:{digest}"
+    return None
@@ -0,0 +1,158 @@
+import threading
+import queue
+import time
+import logging
+
+# requests ilk mesajda yüklenir - açılışta gerekmez
+requests = None
+
+logger = logging.getLogger("trade_bot")
+
+DISCORD_MAX_CONTENT = 2000
+
+# Discord bildirimlerini arka planda, toplu (batch) olarak gönderen sınıf
+class DiscordDispatcher:
+    def __init__(self, webhook_url, max_queue=500, batch_window=0.5, timeout=5, max_retries=3, observer=None):
+        self.webhook_url = webhook_url
+        # observer(süre_saniye, HTTP kodu veya "error") - her post denemesinden sonra çağrılır
+        self.observer = observer
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.sent_messages = 0
+        self.posts = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending_dropped = 0
+        self._lock = threading.Lock()
+        self._session = None
+        self._thread = None
+
+    def send(self, content):
+        """Mesajı kuyruğa ekler - asla bloklamaz; kuyruk doluysa mesaj düşürülür ve sayılır"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(content)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self._pending_dropped += 1
+            return False
+
+    def flush(self, timeout=10):
+        """Kuyruktaki tüm mesajlar gönderilene kadar bekler (kapanış/test için)"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._queue.unfinished_tasks == 0
+
+    def stats(self):
+        """Dispatcher istatistiklerini döndürür"""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "sent_messages": self.sent_messages,
+            "posts": self.posts,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited
+        }
+
+    def _ensure_worker(self):
+        # Thread ilk mesajda başlatılır - gunicorn fork'undan sonra her worker kendi thread'ine sahip olur
+        global requests
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                import requests
+                self._session = requests.Session()
+                self._thread = threading.Thread(target=self._run, name="discord-dispatcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            # Kısa pencere içinde gelen mesajları tek post'ta birleştir
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                for content in self._pack(batch):
+                    self._post(content)
+            except Exception as e:
+                logger.error(f"Discord dispatcher hatası: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _pack(self, batch):
+        """Mesajları Discord'un 2000 karakter sınırına göre gruplar"""
+        self.sent_messages += len(batch)
+        with self._lock:
+            dropped, self._pending_dropped = self._pending_dropped, 0
+        if dropped:
+            batch = batch + [f"⚠️ Kuyruk dolu - {dropped} mesaj atlandı"]
+
+        chunks = []
+        current = ""
+        for content in batch:
+            content = content[:DISCORD_MAX_CONTENT]
+            if current and len(current) + 1 + len(content) > DISCORD_MAX_CONTENT:
+                chunks.append(current)
+                current = content
+            else:
+                current = f"{current}\n{content}" if current else content
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _post(self, content):
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self._session.post(self.webhook_url, json={"content": content}, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._observe(started, "error")
+                logger.error(f"Discord mesajı gönderme hatası: {e}")
+                time.sleep(min(2 ** attempt, 10))
+                continue
+            self._observe(started, response.status_code)
+
+            if response.status_code == 429:
+                # Discord'un bildirdiği retry_after süresine uy
+                self.rate_limited += 1
+                try:
+                    retry_after = float(response.json().get('retry_after', 1))
+                except ValueError:
+                    retry_after = float(response.headers.get('Retry-After', 1))
+                logger.warning(f"Discord rate limit - {retry_after:.2f}s bekleniyor")
+                time.sleep(retry_after)
+                continue
+
+            if response.status_code >= 500:
+                time.sleep(min(2 ** attempt, 10))
+                continue
+
+            self.posts += 1
+            if response.status_code >= 400:
+                logger.error(f"Discord mesajı reddedildi: {response.status_code} {response.text[:100]}")
+                self.failed += 1
+            return response
+
+        self.failed += 1
+        logger.error(f"Discord mesajı gönderilemedi ({self.max_retries + 1} deneme): {content[:50]}...")
+        return None
+
+    def _observe(self, started, status):
+        if self.observer:
+            self.observer(time.perf_counter() - started, status)
@@ -0,0 +1,241 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger("trade_bot")
+
+HIGH = 0
+LOW = 1
+
+# Binance USDⓈ-M Futures REST ağırlıkları (metod -> ağırlık); listede olmayan okumalar 1 sayılır
+METHOD_WEIGHTS = {
+    "account": 5,
+    "balance": 5,
+    "get_position_risk": 5,
+    "get_account_trades": 5,
+    "get_income_history": 30,
+    "get_orders": 40,
+    "get_all_orders": 5,
+    "exchange_info": 1,
+    "klines": 5,
+    "ticker_price": 2,
+    "mark_price": 1,
+    "new_order": 1,
+    "new_batch_order": 5,
+    "cancel_order": 1,
+    "cancel_open_orders": 1,
+    "cancel_batch_order": 1,
+    "change_leverage": 1,
+    "change_margin_type": 1
+}
+
+# Emir ve pozisyon değiştiren çağrılar önceliklidir ve asla birleştirilmez
+WRITE_PREFIXES = ("new_", "cancel_", "change_", "renew_", "close_", "modify_")
+
+class ExchangeBusy(RuntimeError):
+    """Ağırlık bütçesi bekleme süresi içinde açılmadı"""
+
+def is_write(method):
+    return method.startswith(WRITE_PREFIXES)
+
+# Hesap başına dakikalık ağırlık için token bucket; okumalar bütçenin bir kısmını emirlere bırakır
+class WeightBudget:
+    def __init__(self, capacity, reserve):
+        self.capacity = capacity
+        self.reserve = reserve
+        self.tokens = float(capacity)
+        self.used_weight = 0
+        self.paused_until = 0.0
+        self._rate = capacity / 60.0
+        self._updated = time.monotonic()
+        self._waiting_high = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self, weight, priority, timeout):
+        """Ağırlığı bütçeden düşer; timeout içinde yer açılmazsa False"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if priority == HIGH:
+                self._waiting_high += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    floor = 0 if priority == HIGH else self.reserve
+                    if now >= self.paused_until and self.tokens - weight >= floor \
+                            and (priority == HIGH or not self._waiting_high):
+                        self.tokens -= weight
+                        return True
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return False
+                    needed = max(self.paused_until - now, (weight + floor - self.tokens) / self._rate, 0.01)
+                    self._cond.wait(min(needed, remaining))
+            finally:
+                if priority == HIGH:
+                    self._waiting_high -= 1
+                    self._cond.notify_all()
+
+    def sync(self, used_weight):
+        """Exchange'in bildirdiği X-MBX-USED-WEIGHT-1M ile yerel modeli düzeltir"""
+        with self._cond:
+            self.used_weight = used_weight
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(self.capacity - used_weight))
+
+    def pause(self, seconds):
+        """429/418 sonrası tüm çağrıları verilen süre boyunca bekletir"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                "available": round(self.tokens, 1),
+                "capacity": self.capacity,
+                "used_weight_1m": self.used_weight,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1)
+            }
+
+class _InFlight:
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+# Tüm exchange çağrılarının geçtiği merkezi zamanlayıcı: ağırlık bütçesi, öncelik ve okuma birleştirme
+class ExchangeScheduler:
+    def __init__(self, weight_limit=2400, safety=0.9, reserve_ratio=0.2, wait_timeout=10, ban_backoff=60,
+                 request_timeout=10):
+        self.capacity = int(weight_limit * safety)
+        self.reserve = int(self.capacity * reserve_ratio)
+        self.wait_timeout = wait_timeout
+        # Client'ın HTTP istek zaman aşımı - birleşen okumalar lideri en fazla bütçe beklemesi + bu süre kadar bekler
+        self.request_timeout = request_timeout
+        self.ban_backoff = ban_backoff
+        self.calls = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self._budgets = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def budget(self, account):
+        budget = self._budgets.get(account)
+        if budget is None:
+            with self._lock:
+                budget = self._budgets.setdefault(account, WeightBudget(self.capacity, self.reserve))
+        return budget
+
+    def call(self, account, method, func, args=(), kwargs=None):
+        """func(*args, **kwargs)'ı bütçe/öncelik kurallarıyla çalıştırır; aynı anda yapılan aynı okumalar tek çağrıda birleşir"""
+        kwargs = kwargs or {}
+        if is_write(method):
+            return self._execute(account, method, HIGH, func, args, kwargs)
+
+        try:
+            key = (account, method, args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return self._execute(account, method, LOW, func, args, kwargs)
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._inflight[key] = _InFlight()
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+
+        if not owner:
+            if not flight.event.wait(self.wait_timeout + self.request_timeout):
+                raise TimeoutError(f"Birleşen exchange okuması zaman aşımına uğradı: {method}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._execute(account, method, LOW, func, args, kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _execute(self, account, method, priority, func, args, kwargs):
+        budget = self.budget(account)
+        if not budget.acquire(METHOD_WEIGHTS.get(method, 1), priority, self.wait_timeout):
+            self.rejected += 1
+            raise ExchangeBusy(f"Exchange ağırlık bütçesi dolu: {method}")
+        self.calls += 1
+        try:
+            response = func(*args, **kwargs)
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            if status in (418, 429):
+                self.rate_limited += 1
+                headers = getattr(e, "header", None) or {}
+                retry_after = float(headers.get("Retry-After") or headers.get("retry-after") or self.ban_backoff)
+                budget.pause(retry_after)
+                logger.warning(f"⛔ Exchange rate limit ({status}) - {account} {retry_after:.0f}s bekletiliyor")
+            raise
+        return self._unwrap(budget, response)
+
+    def _unwrap(self, budget, response):
+        # show_limit_usage=True ile client {"limit_usage": {...}, "data": ...} döndürür
+        if isinstance(response, dict) and "limit_usage" in response and "data" in response:
+            used = response["limit_usage"].get("x-mbx-used-weight-1m")
+            if used is not None:
+                budget.sync(int(used))
+            return response["data"]
+        return response
+
+    def stats(self):
+        with self._lock:
+            budgets = dict(self._budgets)
+            inflight = len(self._inflight)
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+            "inflight_reads": inflight,
+            "accounts": {account: budget.stats() for account, budget in budgets.items()}
+        }
+
+# Client metodlarını zamanlayıcı üzerinden çağıran proxy - client API'si değişmez
+class ScheduledClient:
+    def __init__(self, client, scheduler, account):
+        self._client = client
+        self._scheduler = scheduler
+        self._account = account
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        scheduler = self._scheduler
+        account = self._account
+
+        def call(*args, **kwargs):
+            return scheduler.call(account, name, attr, args, kwargs)
+
+        self.__dict__[name] = call
+        return call
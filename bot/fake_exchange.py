@@ -0,0 +1,443 @@
+"""
+Local Binance USDⓈ-M Futures stand-in
+
+Benchmark ve offline test için gerçek testnet yerine kullanılır. Sadece standart kütüphane gerektirir.
+account, positionRisk, exchangeInfo, order/batchOrders, income, userTrades ve listenKey uçlarını taklit eder;
+gecikme ve hata enjekte edilebilir. Aynı port üzerinden websocket stream'leri de sunar:
+/ws/!markPrice@arr@1s (saniyede bir mark price) ve /ws/<listenKey> (fill sonrası ACCOUNT_UPDATE).
+
+Kullanım:
+    python3 fake_exchange.py --port 9100 --latency-ms 40 --jitter-ms 20 --error-rate 0.01
+    BINANCE_BASE_URL=http://127.0.0.1:9100 BINANCE_STREAM_URL=ws://127.0.0.1:9100 python3 webhook_server.py
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import queue
+import random
+import select
+import struct
+import threading
+import time
+import uuid
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+logger = logging.getLogger("fake_exchange")
+
+DEFAULT_PRICES = {"BTCUSDT": 65000.0, "ETHUSDT": 3200.0, "BNBUSDT": 580.0, "SOLUSDT": 150.0, "XRPUSDT": 0.52}
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Endpoint ağırlıkları (X-MBX-USED-WEIGHT-1M başlığı için)
+WEIGHTS = {"/fapi/v2/account": 5, "/fapi/v2/positionRisk": 5, "/fapi/v1/exchangeInfo": 1,
+           "/fapi/v1/income": 30, "/fapi/v1/userTrades": 5}
+
+# Exchange durumu: bakiye, pozisyonlar, emirler ve gelir kayıtları
+class FakeExchangeState:
+    def __init__(self, balance=10000.0, extra_symbols=0):
+        self.prices = dict(DEFAULT_PRICES)
+        for i in range(extra_symbols):
+            self.prices[f"SYM{i}USDT"] = 10.0 + i
+        self.wallet_balance = balance
+        self.positions = {}
+        self.trades = []
+        self.income = []
+        self.requests = 0
+        self._user_streams = set()
+        self._next_id = 1
+        self._weight_minute = 0
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def mark_price(self, symbol):
+        # Zamana bağlı küçük dalgalanma - deterministik
+        base = self.prices.get(symbol, 100.0)
+        return round(base * (1 + 0.002 * math.sin(time.time() / 30)), 2)
+
+    def use_weight(self, path):
+        with self._lock:
+            self.requests += 1
+            minute = int(time.time() // 60)
+            if minute != self._weight_minute:
+                self._weight_minute = minute
+                self._weight = 0
+            self._weight += WEIGHTS.get(path, 1)
+            return self._weight
+
+    def exchange_info(self):
+        symbols = []
+        for symbol, price in self.prices.items():
+            tick = "0.10" if price >= 1000 else ("0.01" if price >= 10 else "0.0001")
+            step = "0.001" if price >= 1000 else ("0.01" if price >= 10 else "1")
+            symbols.append({
+                "symbol": symbol,
+                "status": "TRADING",
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": tick, "minPrice": tick, "maxPrice": "1000000"},
+                    {"filterType": "LOT_SIZE", "stepSize": step, "minQty": step, "maxQty": "10000"},
+                    {"filterType": "MARKET_LOT_SIZE", "stepSize": step, "minQty": step, "maxQty": "10000"},
+                    {"filterType": "MIN_NOTIONAL", "notional": "5"}
+                ]
+            })
+        return {"timezone": "UTC", "serverTime": int(time.time() * 1000), "symbols": symbols}
+
+    def position_rows(self):
+        rows = []
+        with self._lock:
+            positions = dict(self.positions)
+        for symbol in self.prices:
+            amount, entry = positions.get(symbol, (0.0, 0.0))
+            mark = self.mark_price(symbol)
+            rows.append({
+                "symbol": symbol,
+                "positionAmt": f"{amount}",
+                "entryPrice": f"{entry}",
+                "markPrice": f"{mark}",
+                "unRealizedProfit": f"{(mark - entry) * amount:.8f}",
+                "leverage": "10",
+                "positionSide": "BOTH"
+            })
+        return rows
+
+    def account(self):
+        unrealized = sum(float(p["unRealizedProfit"]) for p in self.position_rows())
+        balance = f"{self.wallet_balance:.8f}"
+        return {
+            "totalWalletBalance": balance,
+            "totalUnrealizedProfit": f"{unrealized:.8f}",
+            "availableBalance": balance,
+            "assets": [{"asset": "USDT", "walletBalance": balance, "availableBalance": balance}],
+            "positions": self.position_rows()
+        }
+
+    def new_order(self, params):
+        symbol = params.get("symbol", "")
+        side = params.get("side", "BUY")
+        order_type = params.get("type", "MARKET")
+        if symbol not in self.prices:
+            return {"code": -1121, "msg": "Invalid symbol."}, 400
+        try:
+            quantity = float(params.get("quantity", 0) or 0)
+        except ValueError:
+            return {"code": -1100, "msg": "Illegal characters found in parameter 'quantity'."}, 400
+        close_position = params.get("closePosition") == "true"
+        if quantity <= 0 and not close_position:
+            return {"code": -4003, "msg": "Quantity less than or equal to zero."}, 400
+
+        with self._lock:
+            order_id = self._next_id
+            self._next_id += 1
+
+        order = {
+            "orderId": order_id,
+            "clientOrderId": params.get("newClientOrderId") or uuid.uuid4().hex[:20],
+            "symbol": symbol,
+            "side": side,
+            "type": order_type,
+            "origQty": f"{quantity}",
+            "price": params.get("price", "0"),
+            "stopPrice": params.get("stopPrice", "0"),
+            "reduceOnly": params.get("reduceOnly") == "true",
+            "status": "NEW",
+            "updateTime": int(time.time() * 1000)
+        }
+        if order_type == "MARKET":
+            self._fill(order, quantity)
+        return order, 200
+
+    def _fill(self, order, quantity):
+        symbol = order["symbol"]
+        price = self.mark_price(symbol)
+        signed = quantity if order["side"] == "BUY" else -quantity
+        realized = 0.0
+        closed = 0.0
+        with self._lock:
+            amount, entry = self.positions.get(symbol, (0.0, 0.0))
+            if amount and (amount > 0) != (signed > 0):
+                closed = min(abs(amount), abs(signed))
+                realized = (price - entry) * closed * (1 if amount > 0 else -1)
+            new_amount = round(amount + signed, 8)
+            if new_amount == 0:
+                self.positions.pop(symbol, None)
+            elif amount == 0 or (amount > 0) != (new_amount > 0):
+                self.positions[symbol] = (new_amount, price)
+            elif abs(new_amount) > abs(amount):
+                self.positions[symbol] = (new_amount, (entry * abs(amount) + price * quantity) / abs(new_amount))
+            else:
+                self.positions[symbol] = (new_amount, entry)
+            self.wallet_balance += realized
+            now = int(time.time() * 1000)
+            trade_id = len(self.trades) + 1
+            self.trades.append({"id": trade_id, "orderId": order["orderId"], "symbol": symbol, "side": order["side"],
+                                "price": f"{price}", "qty": f"{quantity}", "realizedPnl": f"{realized:.8f}",
+                                "commission": "0", "time": now})
+            if closed:
+                self.income.append({"symbol": symbol, "incomeType": "REALIZED_PNL", "income": f"{realized:.8f}",
+                                    "asset": "USDT", "time": now, "tranId": trade_id, "tradeId": str(trade_id)})
+        order.update({"status": "FILLED", "executedQty": f"{quantity}", "avgPrice": f"{price}"})
+        self.publish_account_update(symbol)
+
+    def subscribe_user_stream(self):
+        stream = queue.Queue(maxsize=1000)
+        with self._lock:
+            self._user_streams.add(stream)
+        return stream
+
+    def unsubscribe_user_stream(self, stream):
+        with self._lock:
+            self._user_streams.discard(stream)
+
+    def publish_account_update(self, symbol):
+        with self._lock:
+            amount, entry = self.positions.get(symbol, (0.0, 0.0))
+            balance = f"{self.wallet_balance:.8f}"
+            streams = list(self._user_streams)
+        mark = self.mark_price(symbol)
+        event = {
+            "e": "ACCOUNT_UPDATE",
+            "E": int(time.time() * 1000),
+            "a": {
+                "m": "ORDER",
+                "B": [{"a": "USDT", "wb": balance, "cw": balance}],
+                "P": [{"s": symbol, "pa": f"{amount}", "ep": f"{entry}",
+                       "up": f"{(mark - entry) * amount:.8f}", "ps": "BOTH"}]
+            }
+        }
+        for stream in streams:
+            try:
+                stream.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def mark_price_events(self):
+        now = int(time.time() * 1000)
+        return [{"e": "markPriceUpdate", "E": now, "s": symbol, "p": f"{self.mark_price(symbol)}"}
+                for symbol in self.prices]
+
+    def query_records(self, records, params):
+        start = int(params.get("startTime", 0) or 0)
+        limit = int(params.get("limit", 100) or 100)
+        symbol = params.get("symbol")
+        income_type = params.get("incomeType")
+        with self._lock:
+            rows = [r for r in records if r["time"] >= start
+                    and (not symbol or r["symbol"] == symbol)
+                    and (not income_type or r.get("incomeType") == income_type)]
+        return rows[:limit]
+
+# HTTP isteklerini FakeExchangeState'e yönlendiren handler
+class FakeExchangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    error_rate = 0.0
+    # Websocket bağlantısı bu kadar saniye sonra kapatılır (yeniden bağlanma testi için; 0 = kapalı)
+    ws_lifetime = 0.0
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _params(self):
+        parsed = urlparse(self.path)
+        params = dict(parse_qsl(parsed.query))
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+        return parsed.path, params
+
+    def _send(self, body, status=200, weight=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if weight is not None:
+            self.send_header("X-MBX-USED-WEIGHT-1M", str(weight))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        path, params = self._params()
+        # v1/v2/v3 aynı cevabı verir
+        normalized = path.replace("/fapi/v1/", "/fapi/v2/") if path.endswith(("/account", "/positionRisk", "/balance")) else path
+        normalized = normalized.replace("/fapi/v3/", "/fapi/v2/")
+        weight = self.state.use_weight(normalized)
+
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.error_rate and random.random() < self.error_rate:
+            if random.random() < 0.5:
+                return self._send({"code": -1003, "msg": "Too many requests (injected)."}, 429, weight)
+            return self._send({"code": -1000, "msg": "Internal error (injected)."}, 500, weight)
+
+        state = self.state
+        route = (method, normalized)
+        if route in (("GET", "/fapi/v1/ping"),):
+            return self._send({}, weight=weight)
+        if route == ("GET", "/fapi/v1/time"):
+            return self._send({"serverTime": int(time.time() * 1000)}, weight=weight)
+        if route == ("GET", "/fapi/v1/exchangeInfo"):
+            return self._send(state.exchange_info(), weight=weight)
+        if route == ("GET", "/fapi/v2/account"):
+            return self._send(state.account(), weight=weight)
+        if route == ("GET", "/fapi/v2/balance"):
+            return self._send(state.account()["assets"], weight=weight)
+        if route == ("GET", "/fapi/v2/positionRisk"):
+            rows = state.position_rows()
+            if params.get("symbol"):
+                rows = [r for r in rows if r["symbol"] == params["symbol"]]
+            return self._send(rows, weight=weight)
+        if route == ("GET", "/fapi/v1/premiumIndex"):
+            rows = [{"symbol": s, "markPrice": f"{state.mark_price(s)}"} for s in state.prices]
+            if params.get("symbol"):
+                rows = next((r for r in rows if r["symbol"] == params["symbol"]), {})
+            return self._send(rows, weight=weight)
+        if route == ("POST", "/fapi/v1/order"):
+            body, status = state.new_order(params)
+            return self._send(body, status, weight)
+        if route == ("POST", "/fapi/v1/batchOrders"):
+            orders = json.loads(params.get("batchOrders", "[]"))
+            results = []
+            for order in orders:
+                body, status = state.new_order({k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in order.items()})
+                results.append(body)
+            return self._send(results, weight=weight)
+        if route in (("DELETE", "/fapi/v1/allOpenOrders"), ("DELETE", "/fapi/v1/order")):
+            return self._send({"code": 200, "msg": "The operation of cancel all open order is done."}, weight=weight)
+        if normalized == "/fapi/v1/listenKey":
+            return self._send({"listenKey": params.get("listenKey") or uuid.uuid4().hex}, weight=weight)
+        if route == ("GET", "/fapi/v1/income"):
+            return self._send(state.query_records(state.income, params), weight=weight)
+        if route == ("GET", "/fapi/v1/userTrades"):
+            return self._send(state.query_records(state.trades, params), weight=weight)
+        return self._send({"code": -5000, "msg": f"Path {path} not found"}, 404, weight)
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            return self._websocket(urlparse(self.path).path)
+        self._handle("GET")
+
+    def _websocket(self, path):
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+
+        user_stream = None if path.startswith("/ws/!markPrice") else self.state.subscribe_user_stream()
+        deadline = time.monotonic() + self.ws_lifetime if self.ws_lifetime else None
+        next_push = time.monotonic()
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                if not self._ws_poll_incoming():
+                    return
+                if user_stream is None:
+                    if time.monotonic() >= next_push:
+                        self._ws_send(0x1, json.dumps(self.state.mark_price_events()).encode())
+                        next_push += 1.0
+                    time.sleep(0.05)
+                else:
+                    try:
+                        self._ws_send(0x1, json.dumps(user_stream.get(timeout=0.1)).encode())
+                    except queue.Empty:
+                        pass
+            self._ws_send(0x8, struct.pack("!H", 1000))
+        except OSError:
+            pass
+        finally:
+            if user_stream is not None:
+                self.state.unsubscribe_user_stream(user_stream)
+
+    def _ws_send(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([length])
+        elif length < 65536:
+            header += bytes([126]) + struct.pack("!H", length)
+        else:
+            header += bytes([127]) + struct.pack("!Q", length)
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+    def _ws_poll_incoming(self):
+        """İstemci çerçevelerini işler (ping -> pong); kapanışta False"""
+        while select.select([self.rfile], [], [], 0)[0]:
+            head = self.rfile.read(2)
+            if len(head) < 2:
+                return False
+            opcode = head[0] & 0x0F
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self.rfile.read(8))[0]
+            mask = self.rfile.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(length)))
+            if opcode == 0x8:
+                self._ws_send(0x8, payload[:2])
+                return False
+            if opcode == 0x9:
+                self._ws_send(0xA, payload)
+        return True
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+def create_server(host="127.0.0.1", port=9100, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                  balance=10000.0, extra_symbols=0, ws_lifetime=0.0):
+    """Yapılandırılmış (henüz çalışmayan) fake exchange sunucusu döndürür"""
+    handler = type("ConfiguredFakeExchangeHandler", (FakeExchangeHandler,), {
+        "state": FakeExchangeState(balance, extra_symbols),
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "error_rate": error_rate,
+        "ws_lifetime": ws_lifetime
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_thread(**kwargs):
+    """Sunucuyu arka plan thread'inde başlatır ve (server, base_url) döndürür"""
+    server = create_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="fake-exchange", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Binance Futures stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="her isteğe eklenen ortalama gecikme")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="gecikme sapması (±)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429/500 döndürülen istek oranı (0-1)")
+    parser.add_argument("--balance", type=float, default=10000.0)
+    parser.add_argument("--extra-symbols", type=int, default=0, help="SYM{i}USDT şeklinde ek semboller")
+    parser.add_argument("--ws-lifetime", type=float, default=0.0, help="websocket bağlantılarını N saniye sonra kapat")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = create_server(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                           args.balance, args.extra_symbols, args.ws_lifetime)
+    logger.info(f"Fake exchange çalışıyor: http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+logger = logging.getLogger("trade_bot")
+
+# Tek sinyali tüm bağlı hesaplarda paralel çalıştıran sınıf
+# Toplam gecikme hesapların toplamı değil, en yavaş hesap kadardır
+class FanoutExecutor:
+    def __init__(self, max_workers=8, user_timeout=10):
+        self.max_workers = max_workers
+        self.user_timeout = user_timeout
+        self.runs = 0
+        self.timeouts = 0
+        self.late = 0
+        self._pool = None
+
+    def run(self, handler, user_ids, pending_message="Account {key} still processing, result will be logged"):
+        """handler(user_id) -> (yanıt, HTTP kodu); {user_id: (yanıt, HTTP kodu)} döndürür
+        pending_message: zaman aşımına uğrayan anahtar için yanıt mesajı ({key} anahtarla doldurulur)"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fanout")
+        self.runs += 1
+
+        started = time.monotonic()
+        futures = {user_id: self._pool.submit(handler, user_id) for user_id in user_ids}
+        deadline = started + self.user_timeout
+
+        results = {}
+        for user_id, future in futures.items():
+            try:
+                results[user_id] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                # Thread durdurulamaz ve emir yine de gönderilebilir - hata yerine "pending" döner
+                # (5xx tekrar denemeyi tetikler ve aynı sinyal ikinci kez işlenirdi); geç gelen sonuç loglanır
+                self.timeouts += 1
+                if not future.cancel():
+                    future.add_done_callback(lambda f, user_id=user_id: self._log_late(user_id, f))
+                logger.warning(f"⏱️ Fan-out zaman aşımı: {user_id} ({self.user_timeout}s) - işlem arka planda sürüyor")
+                results[user_id] = ({"status": "pending", "message": pending_message.format(key=user_id)}, 202)
+            except Exception as e:
+                logger.error(f"Fan-out hatası ({user_id}): {e}")
+                results[user_id] = ({"status": "error", "message": str(e)}, 500)
+
+        logger.info(f"📡 Fan-out tamamlandı: {len(user_ids)} hesap, {(time.monotonic() - started) * 1000:.0f} ms")
+        return results
+
+    def _log_late(self, user_id, future):
+        self.late += 1
+        try:
+            outcome = future.result()
+            # Hesap handler'ı (yanıt, kod), toplu sembol handler'ı [(sıra, (yanıt, kod))] döndürür
+            pairs = [outcome] if isinstance(outcome, tuple) else [result for _, result in outcome]
+            summary = ", ".join(f"{status_code} {body.get('status')}" for body, status_code in pairs)
+            logger.info(f"⏱️ Fan-out geç sonuç: {user_id} → {summary}")
+        except Exception as e:
+            logger.error(f"Fan-out geç hata ({user_id}): {e}")
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "user_timeout": self.user_timeout,
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "late": self.late
+        }
+
+def aggregate_results(signal, results):
+    """Hesap bazlı sonuçları tek yanıtta toplar - zaman aşımına uğrayan (202) hesaplar "pending" sayılır"""
+    pending = [user_id for user_id, (_, code) in results.items() if code == 202]
+    succeeded = [user_id for user_id, (_, code) in results.items() if code < 400 and code != 202]
+    if succeeded:
+        status_code = 200
+    elif pending:
+        # Tekrar denenmeyen kod - bekleyen hesaplarda emir gitmiş olabilir
+        status_code = 202
+    else:
+        status_code = max((code for _, code in results.values()), default=400)
+    if len(succeeded) == len(results):
+        status = "ok"
+    elif not succeeded and pending:
+        status = "pending"
+    else:
+        status = "partial" if succeeded else "error"
+    return {
+        "status": status,
+        "signal": signal.signal,
+        "symbol": signal.symbol,
+        "accounts": len(results),
+        "succeeded": len(succeeded),
+        "pending": len(pending),
+        "results": {user_id: dict(body, http_status=code) for user_id, (body, code) in results.items()}
+    }, status_code
+
+def aggregate_batch_results(results):
+    """Toplu webhook'un sıralı [(yanıt, HTTP kodu)] sonuçlarını tek yanıtta toplar"""
+    codes = [code for _, code in results]
+    succeeded = sum(1 for code in codes if code < 400)
+    if succeeded:
+        status_code = 200
+    else:
+        status_code = max(codes, default=400)
+    return {
+        "status": "ok" if succeeded == len(results) else ("partial" if succeeded else "error"),
+        "count": len(results),
+        "succeeded": succeeded,
+        "blocked": codes.count(429),
+        "failed": len(results) - succeeded - codes.count(429),
+        "results": [dict(body, index=index, http_status=code) for index, (body, code) in enumerate(results)]
+    }, status_code
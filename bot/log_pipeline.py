@@ -0,0 +1,139 @@
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Log kaydında standart olmayan alanlar JSON çıktısına eklenir
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "trace_id"}
+
+class JsonFormatter(logging.Formatter):
+    """Kayıtları tek satırlık JSON olarak biçimlendirir (mesaj burada, writer thread'inde üretilir)"""
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", None),
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SizeAndDayRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Dosya max_bytes'ı aştığında veya UTC gün değiştiğinde döndürülür"""
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=7, encoding="utf-8"):
+        # Dosya ilk kayıtta açılır - açılış diske dokunmaz
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self._day = self._today()
+
+    def _today(self):
+        return datetime.datetime.now(datetime.timezone.utc).date()
+
+    def shouldRollover(self, record):
+        if self._today() != self._day:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._day = self._today()
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Kaydı biçimlendirmeden sınırlı kuyruğa bırakır; kuyruk doluysa kaydı düşürür ve sayar"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Biçimlendirme listener thread'ine bırakılır; sadece exception metni burada sabitlenir
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# Yüksek hızda payload loglamasını saniye başına belirli sayıya indiren örnekleyici
+class LogSampler:
+    def __init__(self, max_per_second=5):
+        self.max_per_second = max_per_second
+        self.suppressed = 0
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Bu saniyenin kotası dolmadıysa True; dolduysa kayıt atlanır ve sayılır"""
+        now = int(time.monotonic())
+        with self._lock:
+            if now != self._window:
+                self._window = now
+                self._count = 0
+            if self._count < self.max_per_second:
+                self._count += 1
+                return True
+            self.suppressed += 1
+            return False
+
+# Arka plan thread'inde biçimlendirme ve dosya yazımı yapan log pipeline'ı
+class LogPipeline:
+    def __init__(self, handlers, queue_size=10000, filters=()):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        for log_filter in filters:
+            self.handler.addFilter(log_filter)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        """Kuyruktaki kayıtları yazar ve thread'i durdurur"""
+        self.listener.stop()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "dropped": self.handler.dropped
+        }
+
+def configure_logging(path="bot_logs.log", level=logging.INFO, async_mode=True, max_bytes=10 * 1024 * 1024,
+                      backup_count=7, queue_size=10000, filters=()):
+    """Konsol (metin) + döndürülen JSON dosya loglamasını kurar; async_mode'da LogPipeline döndürür"""
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - [%(trace_id)s] %(message)s'))
+    handlers = [console]
+    if path:
+        file_handler = SizeAndDayRotatingFileHandler(path, max_bytes, backup_count)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if not async_mode:
+        for handler in handlers:
+            for log_filter in filters:
+                handler.addFilter(log_filter)
+            root.addHandler(handler)
+        return None
+
+    pipeline = LogPipeline(handlers, queue_size, filters)
+    root.addHandler(pipeline.handler)
+    pipeline.start()
+    return pipeline
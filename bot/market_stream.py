@@ -0,0 +1,321 @@
+import json
+import threading
+import time
+import logging
+
+try:
+    import websocket
+except ImportError:
+    websocket = None
+
+logger = logging.getLogger("trade_bot")
+
+# Hesabın stream'den beslenen bakiye ve pozisyon görünümü
+class AccountView:
+    __slots__ = ('balance', 'available', 'available_stale', 'positions', 'connected', 'updated_at')
+
+    def __init__(self):
+        self.balance = 0.0
+        self.available = 0.0
+        # ACCOUNT_UPDATE kullanılan marjini taşımaz - pozisyon değişince kullanılabilir bakiye REST'ten yenilenmeli
+        self.available_stale = False
+        # sembol -> REST positionRisk satırı biçiminde dict
+        self.positions = {}
+        self.connected = False
+        self.updated_at = 0.0
+
+    def seed(self, account, position_rows):
+        """REST snapshot'ı ile başlangıç durumunu kurar"""
+        # ACCOUNT_UPDATE USDT cüzdanını taşır - farkı doğru hesaplamak için başlangıç da USDT satırından alınır
+        usdt = next((a for a in account.get('assets', []) if a.get('asset') == 'USDT'), None)
+        self.balance = float(usdt['walletBalance'] if usdt else account.get('totalWalletBalance', 0))
+        self.available = float(account.get('availableBalance', 0))
+        self.available_stale = False
+        self.positions = {p['symbol']: p for p in position_rows if float(p['positionAmt']) != 0}
+        self.updated_at = time.time()
+
+    def apply_account_update(self, update):
+        for balance in update.get('B', []):
+            if balance.get('a') == 'USDT':
+                # Cüzdan değişimi (gerçekleşen PnL, komisyon, funding) REST'ten gelen kullanılabilir bakiyeye eklenir;
+                # cw açık pozisyonların marjinini düşmediği için doğrudan kullanılmaz
+                wallet = float(balance['wb'])
+                self.available += wallet - self.balance
+                self.balance = wallet
+        positions = dict(self.positions)
+        for p in update.get('P', []):
+            if p.get('ps', 'BOTH') != 'BOTH':
+                continue
+            self.available_stale = True
+            if float(p['pa']) == 0:
+                positions.pop(p['s'], None)
+            else:
+                positions[p['s']] = {
+                    'symbol': p['s'],
+                    'positionAmt': p['pa'],
+                    'entryPrice': p['ep'],
+                    'unRealizedProfit': p.get('up', '0')
+                }
+        # Okuyucular kilitsiz okur - sözlük tek atamayla değiştirilir
+        self.positions = positions
+        self.updated_at = time.time()
+
+    def open_positions(self):
+        return list(self.positions.values())
+
+    def refresh_available(self, available):
+        """REST'ten okunan kullanılabilir bakiyeyi yazar"""
+        self.available = available
+        self.available_stale = False
+
+# Tek websocket bağlantısını yeniden bağlanma ve backoff ile sürdüren temel sınıf
+class _StreamWorker:
+    name = "stream"
+
+    def __init__(self, url, recv_timeout=60, max_backoff=30):
+        self.url = url
+        self.recv_timeout = recv_timeout
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.reconnects = 0
+        self.messages = 0
+        self._stop = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _stream_url(self):
+        return self.url
+
+    def _on_connect(self):
+        pass
+
+    def _on_disconnect(self):
+        pass
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                url = self._stream_url()
+                self._ws = websocket.create_connection(url, timeout=self.recv_timeout)
+                self.connected = True
+                backoff = 1
+                self._on_connect()
+                self._receive()
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"📡 {self.name} bağlantısı koptu: {e}")
+            finally:
+                self.connected = False
+                self._on_disconnect()
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+            if self._stop.wait(backoff):
+                break
+            self.reconnects += 1
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _receive(self):
+        # Sessiz bağlantıda ping atılır; pong da gelmezse bağlantı ölü sayılır
+        awaiting_pong = False
+        while not self._stop.is_set():
+            try:
+                opcode, data = self._ws.recv_data(control_frame=True)
+            except websocket.WebSocketTimeoutException:
+                if awaiting_pong:
+                    raise
+                self._ws.ping()
+                awaiting_pong = True
+                continue
+            awaiting_pong = False
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                return
+            if opcode in (websocket.ABNF.OPCODE_TEXT, websocket.ABNF.OPCODE_BINARY):
+                self.messages += 1
+                self._handle(json.loads(data))
+
+    def _handle(self, message):
+        raise NotImplementedError
+
+# Tüm sembollerin mark price akışı (!markPrice@arr@1s)
+class MarkPriceStream(_StreamWorker):
+    name = "mark-price-stream"
+
+    def __init__(self, url, **kwargs):
+        super().__init__(f"{url}/ws/!markPrice@arr@1s", **kwargs)
+        self.prices = {}
+
+    def _handle(self, message):
+        updates = message if isinstance(message, list) else message.get('data', [message])
+        prices = self.prices
+        received = time.monotonic()
+        for update in updates:
+            if update.get('e') == 'markPriceUpdate':
+                # Tazelik yerel alım zamanıyla ölçülür - borsa olay zamanı saat kaymasından etkilenir
+                prices[update['s']] = (float(update['p']), received)
+
+# Hesabın user-data akışı: listen key oluşturma, keepalive ve ACCOUNT_UPDATE işleme
+class UserDataStream(_StreamWorker):
+    name = "user-data-stream"
+
+    def __init__(self, url, get_client, view, keepalive_interval=1800, on_update=None, **kwargs):
+        super().__init__(url, **kwargs)
+        # Client her bağlantıda havuzdan yeniden alınır - havuz client'ı kapatmış olabilir
+        self.get_client = get_client
+        self.view = view
+        self.keepalive_interval = keepalive_interval
+        self.on_update = on_update
+        self.listen_key = None
+        self.keepalives = 0
+        self._keepalive_thread = None
+
+    def _stream_url(self):
+        self.listen_key = self.get_client().new_listen_key()['listenKey']
+        return f"{self.url}/ws/{self.listen_key}"
+
+    def _on_connect(self):
+        # Bağlantı sırasında kaçan olaylar REST snapshot'ı ile kapatılır
+        client = self.get_client()
+        self.view.seed(client.account(), client.get_position_risk())
+        self.view.connected = True
+        if self._keepalive_thread is None or not self._keepalive_thread.is_alive():
+            self._keepalive_thread = threading.Thread(target=self._keepalive, name="listen-key-keepalive", daemon=True)
+            self._keepalive_thread.start()
+        self._notify()
+
+    def _on_disconnect(self):
+        self.view.connected = False
+
+    def _keepalive(self):
+        while not self._stop.wait(self.keepalive_interval):
+            if not self.connected or not self.listen_key:
+                continue
+            try:
+                self.get_client().renew_listen_key(listenKey=self.listen_key)
+                self.keepalives += 1
+            except Exception as e:
+                logger.warning(f"Listen key yenilenemedi, yeniden bağlanılıyor: {e}")
+                self._drop()
+
+    def _drop(self):
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _handle(self, message):
+        event = message.get('e')
+        if event == 'ACCOUNT_UPDATE':
+            self.view.apply_account_update(message.get('a', {}))
+            self._notify()
+        elif event == 'listenKeyExpired':
+            logger.warning("Listen key süresi doldu, yeniden bağlanılıyor")
+            self._drop()
+
+    def _notify(self):
+        if self.on_update:
+            try:
+                self.on_update()
+            except Exception as e:
+                logger.error(f"Stream güncelleme bildirimi hatası: {e}")
+
+# Mark price ve hesap görünümlerini yöneten alt sistem - okumalar O(1), REST'e gerek kalmaz
+class MarketStreams:
+    def __init__(self, stream_url, client_for, enabled=True, price_max_age=10, keepalive_interval=1800,
+                 on_update=None):
+        self.stream_url = stream_url.rstrip('/')
+        self.client_for = client_for
+        self.enabled = enabled and websocket is not None
+        self.price_max_age = price_max_age
+        self.keepalive_interval = keepalive_interval
+        self.on_update = on_update
+        self._market = None
+        self._users = {}
+        self._lock = threading.Lock()
+        if enabled and websocket is None:
+            logger.warning("websocket-client kurulu değil - market stream'leri kapalı, REST kullanılacak")
+
+    def start_market(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._market is None:
+                self._market = MarkPriceStream(self.stream_url)
+            self._market.start()
+
+    def add_user(self, user_id):
+        """Hesabın user-data stream'ini başlatır (zaten varsa dokunmaz)"""
+        if not self.enabled:
+            return
+        self.start_market()
+        with self._lock:
+            stream = self._users.get(user_id)
+            if stream is None:
+                stream = self._users[user_id] = UserDataStream(
+                    self.stream_url, lambda: self.client_for(user_id), AccountView(),
+                    keepalive_interval=self.keepalive_interval, on_update=self.on_update)
+        stream.start()
+
+    def remove_user(self, user_id):
+        with self._lock:
+            stream = self._users.pop(user_id, None)
+        if stream:
+            stream.stop()
+
+    def mark_price(self, symbol):
+        """Taze mark price; stream yoksa veya fiyat eskiyse None"""
+        if self._market is None:
+            return None
+        entry = self._market.prices.get(symbol)
+        if entry is None or time.monotonic() - entry[1] > self.price_max_age:
+            return None
+        return entry[0]
+
+    def account_view(self, user_id):
+        """Stream bağlıysa hesabın canlı görünümü, değilse None (çağıran REST'e düşer)"""
+        stream = self._users.get(user_id)
+        if stream is None or not stream.view.connected:
+            return None
+        return stream.view
+
+    def stats(self):
+        market = self._market
+        return {
+            "enabled": self.enabled,
+            "mark_price": {
+                "connected": market.connected,
+                "symbols": len(market.prices),
+                "messages": market.messages,
+                "reconnects": market.reconnects
+            } if market else None,
+            "users": {
+                user_id: {
+                    "connected": stream.connected,
+                    "positions": len(stream.view.positions),
+                    "messages": stream.messages,
+                    "reconnects": stream.reconnects,
+                    "keepalives": stream.keepalives
+                } for user_id, stream in list(self._users.items())
+            }
+        }
@@ -0,0 +1,201 @@
+import bisect
+import logging
+import threading
+import time
+import uuid
+
+# Varsayılan gecikme kovaları (saniye) - 0.5 ms'den 10 s'ye
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# Etiket kombinasyonu başına artan sayaç
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+# Sabit kovalı gecikme histogramı - observe() tek bisect + kilitli toplama (mikrosaniye mertebesi)
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [kova sayıları..., +Inf, toplam]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, labels=()):
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {values[-1]:.6f}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, self.labels)
+        return False
+
+# Değeri scrape anında bir fonksiyondan okunan gösterge (kuyruk derinlikleri vb.)
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.read()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for labels, sample in sorted(value.items()):
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {sample}"
+
+# Metrik kayıt defteri ve Prometheus text formatı (0.0.4) çıktısı
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, read, labelnames=()):
+        return self._register(Gauge(name, help_text, read, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                lines.append(f"# {metric.name} okunamadı: {e}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+# Exchange client'ının public metodlarını zamanlayan proxy - client API'si değişmez
+class InstrumentedClient:
+    def __init__(self, client, latency, errors):
+        self._client = client
+        self._latency = latency
+        self._errors = errors
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        latency = self._latency
+        errors = self._errors
+        labels = (name,)
+
+        def call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception:
+                errors.inc(labels)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started, labels)
+
+        # Sarmalayıcı cache'lenir - sonraki çağrılar __getattr__'a düşmez
+        self.__dict__[name] = call
+        return call
+
+# İstek bazlı trace ID - log satırlarına ve arka plan işlerine taşınır
+_trace = threading.local()
+
+def new_trace_id(incoming=None):
+    """Gelen ID'yi (X-Request-ID) veya yeni bir ID'yi aktif thread'e atar"""
+    trace_id = (incoming or "")[:64] or uuid.uuid4().hex[:12]
+    _trace.id = trace_id
+    return trace_id
+
+def get_trace_id():
+    return getattr(_trace, "id", None)
+
+def set_trace_id(trace_id):
+    _trace.id = trace_id
+
+def traced(func):
+    """Fonksiyonu çağıran thread'in trace ID'si ile çalışacak şekilde sarar (thread havuzları için)"""
+    trace_id = get_trace_id()
+
+    def wrapper(*args, **kwargs):
+        previous = get_trace_id()
+        _trace.id = trace_id
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _trace.id = previous
+    return wrapper
+
+class TraceIdFilter(logging.Filter):
+    """Log kayıtlarına %(trace_id)s alanını ekler"""
+    def filter(self, record):
+        record.trace_id = getattr(_trace, "id", None) or "-"
+        return True
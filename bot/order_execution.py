@@ -0,0 +1,309 @@
+import math
+import threading
+import time
+import uuid
+import logging
+
+from shared_state import LocalState
+
+logger = logging.getLogger("trade_bot")
+
+# Binance tek batchOrders isteğinde en fazla 5 emir kabul eder
+MAX_BATCH = 5
+TP_LEVELS = ("tp1", "tp2", "tp3")
+
+# Tek emir bacağının (entry/sl/tp) isteği ve sonucu
+class Leg:
+    __slots__ = ('name', 'params', 'order_id', 'status', 'error')
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        self.order_id = None
+        self.status = "pending"
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.status != "pending"
+
+    def apply(self, response):
+        """Exchange yanıtını (başarılı emir veya {code, msg}) bacağa işler"""
+        if isinstance(response, dict) and "orderId" in response:
+            self.order_id = response["orderId"]
+            self.status = response.get("status", "NEW")
+        else:
+            message = response.get("msg", str(response)) if isinstance(response, dict) else str(response)
+            self.fail(message)
+
+    def fail(self, message):
+        self.status = "rejected"
+        self.error = message
+
+    def to_dict(self):
+        return {
+            "leg": self.name,
+            "type": self.params.get("type"),
+            "side": self.params.get("side"),
+            "quantity": self.params.get("quantity"),
+            "stop_price": self.params.get("stopPrice"),
+            "order_id": self.order_id,
+            "status": self.status,
+            "error": self.error
+        }
+
+# Bir sinyalin exchange'e gönderilen tüm bacakları
+class Execution:
+    def __init__(self, symbol, legs):
+        self.symbol = symbol
+        self.legs = legs
+        self.requests = 0
+        self.elapsed_ms = 0.0
+        # Emir gerekmeyen sinyalin nedeni (örn. TP bacağı zaten dolmuş) - başarısız işlem sayılmaz
+        self.skipped = None
+
+    @property
+    def ok(self):
+        return bool(self.legs) and all(leg.ok for leg in self.legs)
+
+    @property
+    def entry_ok(self):
+        entry = self.leg("entry")
+        return entry is None or entry.ok
+
+    def leg(self, name):
+        return next((leg for leg in self.legs if leg.name == name), None)
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "skipped": self.skipped,
+            "requests": self.requests,
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "legs": [leg.to_dict() for leg in self.legs]
+        }
+
+def split_steps(steps, parts, min_steps):
+    """Toplam adımı parçalara böler; minimumun altındaki parçalar sonrakine eklenir"""
+    base = steps // parts
+    sizes = [base] * (parts - 1) + [steps - base * (parts - 1)]
+    merged = []
+    carry = 0
+    for size in sizes:
+        size += carry
+        if size < min_steps:
+            carry = size
+            continue
+        merged.append(size)
+        carry = 0
+    if carry and merged:
+        merged[-1] += carry
+    return merged
+
+# Entry + stop-loss + take-profit bacaklarını birlikte kurup batch emirle gönderen motor
+# Açık bracket'ler (etiket + bekleyen TP bacakları) paylaşılan durumda tutulur - restart ve diğer worker'lar da görür
+class BracketExecutor:
+    def __init__(self, exchange_info, tp_multipliers=(1.0, 2.0, 3.0), single_batch=False, working_type="MARK_PRICE",
+                 state=None):
+        self.exchange_info = exchange_info
+        self.state = state or LocalState()
+        self.tp_multipliers = tuple(tp_multipliers)
+        self.single_batch = single_batch
+        self.working_type = working_type
+        self.executions = 0
+        self.failed = 0
+        self.invalid_targets = 0
+        self._lock = threading.Lock()
+
+    def build_bracket(self, order_size, atr, tp_prices=None):
+        """OrderSize'dan entry, SL ve TP bacaklarını üretir (fiyat/miktar exchange adımlarına yuvarlanır)"""
+        filters = self.exchange_info.get(order_size.symbol)
+        is_buy = order_size.side == "BUY"
+        exit_side = "SELL" if is_buy else "BUY"
+        tag = uuid.uuid4().hex[:12]
+        symbol = order_size.symbol
+
+        legs = [
+            Leg("entry", {"symbol": symbol, "side": order_size.side, "type": "MARKET",
+                          "quantity": order_size.quantity, "newClientOrderId": f"{tag}-entry"}),
+            Leg("sl", {"symbol": symbol, "side": exit_side, "type": "STOP_MARKET", "stopPrice": order_size.stop_price,
+                       "closePosition": "true", "workingType": self.working_type, "newClientOrderId": f"{tag}-sl"})
+        ]
+
+        steps = filters.qty_steps(float(order_size.quantity))
+        min_steps = max(1, filters.qty_steps(filters.min_qty))
+        sizes = split_steps(steps, len(self.tp_multipliers), min_steps)
+        price = float(order_size.price)
+        rounding = math.floor if is_buy else math.ceil
+        entry_ticks = filters.price_ticks(price, rounding)
+        for i, size in enumerate(sizes):
+            name = TP_LEVELS[i] if i < len(TP_LEVELS) else f"tp{i + 1}"
+            distance = atr * self.tp_multipliers[i]
+            ticks = filters.price_ticks(price + distance if is_buy else price - distance, rounding)
+            if tp_prices and i < len(tp_prices) and tp_prices[i]:
+                alert_ticks = filters.price_ticks(float(tp_prices[i]), rounding)
+                # Entry'nin kârlı tarafında olmayan hedef borsada reddedilir/anında tetiklenir - ATR hedefi kullanılır
+                if (alert_ticks > entry_ticks) if is_buy else (0 < alert_ticks < entry_ticks):
+                    ticks = alert_ticks
+                else:
+                    with self._lock:
+                        self.invalid_targets += 1
+                    logger.warning(f"{symbol} {name} hedefi {tp_prices[i]} entry {price} ({order_size.side}) için "
+                                   f"geçersiz, ATR hedefi {filters.format_price(ticks)} kullanılıyor")
+            if ticks <= 0:
+                continue
+            legs.append(Leg(name, {"symbol": symbol, "side": exit_side, "type": "TAKE_PROFIT_MARKET",
+                                   "stopPrice": filters.format_price(ticks), "quantity": filters.format_qty(size),
+                                   "reduceOnly": "true", "workingType": self.working_type,
+                                   "newClientOrderId": f"{tag}-{name}"}))
+        return legs
+
+    def open(self, client, order_size, atr, account=None, tp_prices=None, has_position=False):
+        """Bracket'i gönderir: varsayılan entry + tek batch (SL/TP), single_batch'te tek istek
+        has_position: sembolde açık pozisyon biliniyor (stream/pozisyon cache'i) - eski emirler önce iptal edilir"""
+        started = time.perf_counter()
+        legs = self.build_bracket(order_size, atr, tp_prices)
+        execution = Execution(order_size.symbol, legs)
+        key = self._key(account, order_size.symbol)
+
+        if has_position or self.state.hget("brackets", key) is not None:
+            # Önceki bracket'in bekleyen SL/TP emirleri yeni pozisyonu kapatmasın
+            self._cancel_all(client, execution, key)
+
+        if self.single_batch:
+            self._submit(client, execution, legs)
+            if not legs[0].ok and any(leg.ok for leg in legs[1:]):
+                # Entry reddedildiyse kabul edilen koruma emirleri geri alınır
+                self._cancel_all(client, execution, key)
+            if not legs[0].ok:
+                for leg in legs[1:]:
+                    leg.fail("entry rejected")
+        else:
+            self._submit(client, execution, legs[:1])
+            if legs[0].ok:
+                self._submit(client, execution, legs[1:])
+            else:
+                for leg in legs[1:]:
+                    leg.fail("entry rejected")
+
+        if legs[0].ok and any(leg.ok for leg in legs[1:]):
+            self.state.hset("brackets", key, {
+                "tag": legs[0].params["newClientOrderId"].rsplit("-", 1)[0],
+                "legs": {leg.name: leg.params["quantity"] for leg in legs[2:] if leg.ok}
+            })
+        with self._lock:
+            self.executions += 1
+            if not execution.ok:
+                self.failed += 1
+        execution.elapsed_ms = (time.perf_counter() - started) * 1000
+        self._log(execution)
+        return execution
+
+    def take_profit(self, client, symbol, level, position_amt, account=None, levels=1):
+        """tp1/tp2/tp3 sinyali: seviyenin bekleyen TP bacağı iptal edilip kalan miktarı reduce-only market emirle kapatılır
+        (bacak zaten dolduysa sinyal onay sayılır, emir gönderilmez); tp3 pozisyonun tamamını kapatır
+        Bracket kaydı yoksa (elle açılmış pozisyon) seviye başına pozisyonun eşit payı kapatılır
+        levels > 1: birleştirilmiş ardışık TP seviyeleri (örn. tp1+tp2) tek emirde kapatılır"""
+        started = time.perf_counter()
+        filters = self.exchange_info.get(symbol)
+        amount = abs(position_amt)
+        index = TP_LEVELS.index(level) if level in TP_LEVELS else len(TP_LEVELS) - 1
+        remaining_levels = len(TP_LEVELS) - index
+        levels = max(1, min(levels, remaining_levels))
+        closes_all = levels == remaining_levels
+        names = TP_LEVELS[index:index + levels]
+        name = level if levels == 1 else f"{level}-{names[-1]}"
+        key = self._key(account, symbol)
+        bracket = self.state.hget("brackets", key)
+        execution = Execution(symbol, [])
+
+        if not amount:
+            # SL/TP bacakları pozisyonu zaten kapatmış - kalan emirler temizlenir
+            execution.skipped = "no open position"
+            if bracket is not None:
+                self._cancel_all(client, execution, key)
+        elif closes_all or not filters:
+            quantity = filters.format_qty(filters.qty_steps(amount)) if filters else f"{amount}"
+        elif bracket is not None:
+            # Cancel-and-replace: bekleyen bacak iptal edilir, dolmamış miktarı market emirle kapatılır
+            steps = 0
+            for tp in names:
+                if tp in bracket["legs"]:
+                    steps += filters.qty_steps(self._cancel_leg(client, execution, symbol, bracket, tp))
+            remaining = dict(bracket, legs={tp: qty for tp, qty in bracket["legs"].items() if tp not in names})
+            self.state.hset("brackets", key, remaining)
+            steps = min(steps, filters.qty_steps(amount))
+            if steps:
+                quantity = filters.format_qty(steps)
+            else:
+                execution.skipped = "take-profit leg already filled"
+        else:
+            steps = filters.qty_steps(amount * levels / remaining_levels)
+            quantity = filters.format_qty(steps if steps >= max(1, filters.qty_steps(filters.min_qty))
+                                          else filters.qty_steps(amount))
+
+        if execution.skipped is None:
+            leg = Leg(name, {"symbol": symbol, "side": "SELL" if position_amt > 0 else "BUY", "type": "MARKET",
+                             "quantity": quantity, "reduceOnly": "true"})
+            execution.legs.append(leg)
+            self._submit(client, execution, [leg])
+            if closes_all and leg.ok:
+                # Pozisyon kapandı - kalan SL/TP emirleri (hangi süreç açmış olursa olsun) temizlenir
+                self._cancel_all(client, execution, key)
+        execution.elapsed_ms = (time.perf_counter() - started) * 1000
+        self._log(execution)
+        return execution
+
+    def stats(self):
+        return {
+            "executions": self.executions,
+            "failed": self.failed,
+            "invalid_targets": self.invalid_targets,
+            "single_batch": self.single_batch
+        }
+
+    def _submit(self, client, execution, legs):
+        for start in range(0, len(legs), MAX_BATCH):
+            chunk = legs[start:start + MAX_BATCH]
+            execution.requests += 1
+            try:
+                if len(chunk) == 1:
+                    responses = [client.new_order(**chunk[0].params)]
+                else:
+                    responses = client.new_batch_order(batchOrders=[leg.params for leg in chunk])
+            except Exception as e:
+                for leg in chunk:
+                    leg.fail(str(e))
+                continue
+            for leg, response in zip(chunk, responses):
+                leg.apply(response)
+
+    def _key(self, account, symbol):
+        return f"{account or '-'}:{symbol}"
+
+    def _cancel_leg(self, client, execution, symbol, bracket, tp):
+        """Bekleyen TP bacağını client id ile iptal eder; dolmamış miktarı döndürür (dolmuş/bulunamadıysa 0)"""
+        execution.requests += 1
+        try:
+            response = client.cancel_order(symbol=symbol, origClientOrderId=f"{bracket['tag']}-{tp}")
+        except Exception as e:
+            # Bilinmeyen emir: bacak borsada tetiklenmiş - sinyal onaydır
+            logger.info(f"{symbol} {tp} bacağı iptal edilemedi, dolmuş sayılıyor: {e}")
+            return 0.0
+        if isinstance(response, dict) and "origQty" in response:
+            return float(response["origQty"]) - float(response.get("executedQty", 0))
+        return float(bracket["legs"][tp])
+
+    def _cancel_all(self, client, execution, key):
+        try:
+            client.cancel_open_orders(symbol=execution.symbol)
+            execution.requests += 1
+            self.state.hdel("brackets", key)
+        except Exception as e:
+            logger.error(f"{execution.symbol} emirleri iptal edilemedi: {e}")
+
+    def _log(self, execution):
+        summary = " ".join(f"{leg.name}:{leg.status}" for leg in execution.legs) or f"emir yok ({execution.skipped})"
+        level = logging.INFO if execution.ok or execution.skipped else logging.ERROR
+        logger.log(level, "🧾 %s emirleri (%s istek, %.0f ms): %s", execution.symbol, execution.requests,
+                   execution.elapsed_ms, summary)
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+import logging
+
+from trading_limits import utc_day
+
+logger = logging.getLogger("trade_bot")
+
+# Günlük PnL'e sayılan gelir tipleri - komisyon ve funding de gerçekleşmiş sonuca dahildir
+PNL_INCOME_TYPES = ("REALIZED_PNL", "COMMISSION", "FUNDING_FEE")
+# USD'ye 1:1 sayılan marjin varlıkları - BNB komisyonu gibi diğer varlıklar atlanır
+PNL_ASSETS = ("USDT", "USDC", "FDUSD", "BUSD")
+
+def income_key(row):
+    # tranId aynı işlemin farklı gelir tiplerinde tekrar edebilir
+    return f"{row.get('tranId')}:{row.get('incomeType')}"
+
+# Gerçekleşmiş PnL'i borsanın gelir geçmişinden artımlı çekip TradingLimits sayaçlarına işleyen arka plan görevi
+# Her hesap için imleç (son kaydın zamanı + o milisaniyedeki kayıtlar) PnL ile aynı limit olayında saklanır
+# (journal'a birlikte yazılır); her turda imleçten sonraki kayıtlar için tek istek atılır - maliyet çalışma süresinden bağımsızdır
+class PnlReconciler:
+    def __init__(self, accounts, state, interval=60, page_size=1000, clock=None):
+        # accounts() -> [(hesap_id, client, limits)]
+        self.accounts = accounts
+        self.state = state
+        self.interval = interval
+        self.page_size = page_size
+        self.clock = clock or time.time
+        self.polls = 0
+        self.records = 0
+        self.errors = 0
+        self.last_run = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Arka planda periyodik uzlaştırmayı başlatır"""
+        if not self.interval:
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="pnl-reconciler", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.poll()
+            time.sleep(self.interval)
+
+    def poll(self):
+        """Tüm hesaplar için bir uzlaştırma turu çalıştırır"""
+        for account, client, limits in self.accounts():
+            # Zarar limitiyle duran hesap sinyal gelmese de gün dönümünde açılır
+            limits.roll_day()
+            if client is None:
+                continue
+            # Paylaşılan backend'de aralık başına hesabı tek worker sorgular
+            if not self.state.hsetnx("pnl:lease", account, os.getpid(), ttl=self.interval * 0.9):
+                continue
+            try:
+                self.reconcile(account, client, limits)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"PnL uzlaştırma hatası ({account}): {e}")
+        self.polls += 1
+        self.last_run = self.clock()
+
+    def reconcile(self, account, client, limits):
+        """İmleçten sonraki gelir kayıtlarını tek istekle çeker ve sembol/gün bazında limitlere işler"""
+        cursor = limits.income_cursor(account)
+        if cursor is None:
+            # İlk çalışma (veya journal'sız restart - sayaçlar da sıfırdır): bugünün başından itibaren
+            cursor = {"time": utc_day(self.clock()) * 86400 * 1000, "ids": []}
+        rows = client.get_income_history(startTime=cursor["time"], limit=self.page_size)
+
+        seen = set(cursor["ids"])
+        last_time, last_ids = cursor["time"], list(cursor["ids"])
+        totals = {}
+        applied = 0
+        changed = False
+        for row in sorted(rows, key=lambda r: int(r["time"])):
+            ts = int(row["time"])
+            key = income_key(row)
+            if ts == cursor["time"] and key in seen:
+                continue
+            if ts > last_time:
+                last_time, last_ids = ts, []
+            last_ids.append(key)
+            changed = True
+            if row.get("incomeType") in PNL_INCOME_TYPES and row.get("symbol") and row.get("asset", "USDT") in PNL_ASSETS:
+                total_key = (utc_day(ts / 1000), row["symbol"])
+                totals[total_key] = totals.get(total_key, 0.0) + float(row["income"])
+                applied += 1
+
+        if changed:
+            limits.record_income(account, [(day, symbol, amount) for (day, symbol), amount in sorted(totals.items())],
+                                 {"time": last_time, "ids": last_ids})
+        self.records += applied
+        if len(rows) >= self.page_size:
+            logger.warning(f"PnL uzlaştırma geride ({account}): sayfa dolu, kalan kayıtlar sonraki turda işlenecek")
+        return totals
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "polls": self.polls,
+            "records": self.records,
+            "errors": self.errors,
+            "last_run": self.last_run
+        }
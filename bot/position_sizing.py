@@ -0,0 +1,240 @@
+import math
+import threading
+import time
+import logging
+from decimal import Decimal
+
+# numpy sadece size_batch'te gerekir - açılışı yavaşlatmaması için ilk kullanımda yüklenir
+np = None
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np or None
+
+logger = logging.getLogger("trade_bot")
+
+# Float bölme hatalarında (örn. 0.3 / 0.1 = 2.9999...) bir adım kaybetmemek için tolerans
+EPSILON = 1e-9
+
+class SizingError(ValueError):
+    pass
+
+def _decimals(value):
+    """'0.00100' -> 3 (anlamlı ondalık basamak sayısı)"""
+    exponent = Decimal(value).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+# Sembol bazlı, önceden hesaplanmış quantization tablosu (tam sayı tick/step aritmetiği)
+class SymbolFilters:
+    __slots__ = ('symbol', 'tick_size', 'step_size', 'price_decimals', 'qty_decimals',
+                 'min_qty', 'max_qty', 'min_notional')
+
+    def __init__(self, symbol, tick_size, step_size, min_qty, max_qty, min_notional):
+        self.symbol = symbol
+        self.price_decimals = _decimals(tick_size)
+        self.qty_decimals = _decimals(step_size)
+        self.tick_size = float(tick_size)
+        self.step_size = float(step_size)
+        self.min_qty = float(min_qty)
+        self.max_qty = float(max_qty)
+        self.min_notional = float(min_notional)
+
+    @classmethod
+    def from_exchange_info(cls, info):
+        filters = {f['filterType']: f for f in info.get('filters', [])}
+        price_filter = filters.get('PRICE_FILTER', {})
+        lot_size = filters.get('MARKET_LOT_SIZE') or filters.get('LOT_SIZE', {})
+        min_notional = filters.get('MIN_NOTIONAL', {})
+        return cls(
+            info['symbol'],
+            price_filter.get('tickSize', '0.01'),
+            lot_size.get('stepSize', '0.001'),
+            lot_size.get('minQty', '0'),
+            lot_size.get('maxQty', '1e12'),
+            min_notional.get('notional', min_notional.get('minNotional', '0'))
+        )
+
+    def price_ticks(self, price, rounding=math.floor):
+        return int(rounding(price / self.tick_size + (EPSILON if rounding is math.floor else -EPSILON)))
+
+    def qty_steps(self, quantity):
+        return int(math.floor(quantity / self.step_size + EPSILON))
+
+    def format_price(self, ticks):
+        return f"{ticks * self.tick_size:.{self.price_decimals}f}"
+
+    def format_qty(self, steps):
+        return f"{steps * self.step_size:.{self.qty_decimals}f}"
+
+# Exchange'e gönderilmeye hazır emir boyutu
+class OrderSize:
+    __slots__ = ('symbol', 'side', 'quantity', 'price', 'stop_price', 'notional', 'risk_amount')
+
+    def __init__(self, symbol, side, quantity, price, stop_price, notional, risk_amount):
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.price = price
+        self.stop_price = stop_price
+        self.notional = notional
+        self.risk_amount = risk_amount
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+# exchange_info'yu bir kez yükleyip arka planda yenileyen metadata cache'i
+class ExchangeInfoCache:
+    def __init__(self, fetch, refresh_interval=3600):
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.loaded_at = None
+        self.refreshes = 0
+        self._filters = {}
+        self._loaded = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Arka planda ilk yüklemeyi ve periyodik yenilemeyi başlatır"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="exchange-info", daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        info = self.fetch()
+        filters = {}
+        for symbol_info in info.get('symbols', []):
+            if symbol_info.get('status', 'TRADING') != 'TRADING':
+                continue
+            try:
+                filters[symbol_info['symbol']] = SymbolFilters.from_exchange_info(symbol_info)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"{symbol_info.get('symbol')} filtreleri okunamadı: {e}")
+        # Tablo tek atamayla değiştirilir - okuyucular kilitsiz okur
+        self._filters = filters
+        self.loaded_at = time.time()
+        self.refreshes += 1
+        self._loaded.set()
+        logger.info(f"📐 Exchange bilgisi yüklendi: {len(filters)} sembol")
+
+    def get(self, symbol, wait=5.0):
+        """Sembol filtrelerini döndürür; ilk yükleme bitmediyse en fazla wait saniye bekler"""
+        if not self._loaded.is_set():
+            self.start()
+            self._loaded.wait(wait)
+        return self._filters.get(symbol)
+
+    def stats(self):
+        return {
+            "symbols": len(self._filters),
+            "loaded_at": self.loaded_at,
+            "refreshes": self.refreshes
+        }
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+                delay = self.refresh_interval
+            except Exception as e:
+                logger.error(f"Exchange bilgisi yüklenemedi: {e}")
+                delay = 30
+            time.sleep(delay)
+
+# Bakiye, risk % ve ATR stop mesafesinden exchange kurallarına uygun emir boyutu hesaplayan motor
+class PositionSizer:
+    def __init__(self, exchange_info, atr_multiplier=1.5, max_leverage=10):
+        self.exchange_info = exchange_info
+        self.atr_multiplier = atr_multiplier
+        self.max_leverage = max_leverage
+
+    def size(self, symbol, side, balance, risk_percentage, price, atr):
+        """Tek sembol için OrderSize döndürür; exchange kurallarını sağlamıyorsa SizingError"""
+        filters = self.exchange_info.get(symbol)
+        if filters is None:
+            raise SizingError(f"{symbol} için exchange filtresi yok")
+        if not price or price <= 0:
+            raise SizingError("Geçerli referans fiyat yok")
+        if not atr or atr <= 0:
+            raise SizingError("ATR stop mesafesi yok")
+
+        risk_amount = balance * risk_percentage / 100
+        stop_distance = atr * self.atr_multiplier
+        quantity = min(risk_amount / stop_distance, balance * self.max_leverage / price)
+        steps = min(filters.qty_steps(quantity), filters.qty_steps(filters.max_qty))
+        return self._build(filters, side, steps, price, stop_distance, risk_amount)
+
+    def size_batch(self, symbols, sides, balances, risk_percentages, prices, atrs):
+        """Birden çok sembolü tek seferde boyutlandırır (numpy varsa vektörel); hatalılar için SizingError döner"""
+        filters = [self.exchange_info.get(symbol) for symbol in symbols]
+        np = _load_numpy()
+        if np is None:
+            return [self._size_safe(*args) for args in zip(symbols, sides, balances, risk_percentages, prices, atrs)]
+
+        valid = np.array([f is not None for f in filters])
+        step = np.array([f.step_size if f else 1.0 for f in filters])
+        max_qty = np.array([f.max_qty if f else 0.0 for f in filters])
+        balance = np.asarray(balances, dtype=float)
+        price = np.asarray(prices, dtype=float)
+        atr = np.asarray([a or 0.0 for a in atrs], dtype=float)
+
+        risk_amount = balance * np.asarray(risk_percentages, dtype=float) / 100
+        stop_distance = atr * self.atr_multiplier
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quantity = np.minimum(risk_amount / stop_distance, balance * self.max_leverage / price)
+            steps = np.floor(np.minimum(quantity, max_qty) / step + EPSILON)
+        ok = valid & (price > 0) & (atr > 0) & np.isfinite(steps)
+
+        results = []
+        for i, symbol in enumerate(symbols):
+            if not ok[i]:
+                results.append(self._size_safe(symbol, sides[i], balances[i], risk_percentages[i], prices[i], atrs[i]))
+                continue
+            try:
+                results.append(self._build(filters[i], sides[i], int(steps[i]), float(price[i]),
+                                           float(stop_distance[i]), float(risk_amount[i])))
+            except SizingError as e:
+                results.append(e)
+        return results
+
+    def _size_safe(self, *args):
+        try:
+            return self.size(*args)
+        except SizingError as e:
+            return e
+
+    def _build(self, filters, side, steps, price, stop_distance, risk_amount):
+        quantity = steps * filters.step_size
+        if steps <= 0 or quantity < filters.min_qty:
+            raise SizingError(f"{filters.symbol} miktarı minimumun altında ({quantity} < {filters.min_qty})")
+        notional = quantity * price
+        if notional < filters.min_notional:
+            raise SizingError(f"{filters.symbol} emir değeri minimumun altında ({notional:.2f} < {filters.min_notional})")
+
+        # Long için fiyat aşağı, stop aşağı; short için yukarı yuvarlanır
+        is_buy = side.upper() == "BUY"
+        if is_buy:
+            price_ticks = filters.price_ticks(price, math.floor)
+            stop_ticks = filters.price_ticks(price - stop_distance, math.floor)
+        else:
+            price_ticks = filters.price_ticks(price, math.ceil)
+            stop_ticks = filters.price_ticks(price + stop_distance, math.ceil)
+        if stop_ticks <= 0:
+            raise SizingError(f"{filters.symbol} stop fiyatı geçersiz")
+
+        return OrderSize(
+            filters.symbol,
+            "BUY" if is_buy else "SELL",
+            filters.format_qty(steps),
+            filters.format_price(price_ticks),
+            filters.format_price(stop_ticks),
+            round(notional, 8),
+            round(risk_amount, 8)
+        )
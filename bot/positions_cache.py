@@ -0,0 +1,95 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger("trade_bot")
+
+# Kullanıcı bazlı açık pozisyon snapshot'ı - TTL ve tek uçuşlu (single-flight) yenileme
+class PositionsCache:
+    def __init__(self, ttl=5.0, wait_timeout=15.0):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.misses = 0
+        self.shared_waits = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            entry = {'positions': None, 'fetched_at': 0.0, 'generation': 0, 'inflight': None, 'error': None}
+            self._entries[user_id] = entry
+        return entry
+
+    def get(self, user_id, fetch):
+        """Snapshot tazeyse onu, değilse fetch() sonucunu döndürür; eşzamanlı çağrılar tek yenilemeyi paylaşır"""
+        with self._lock:
+            entry = self._entry(user_id)
+            if entry['positions'] is not None and time.monotonic() - entry['fetched_at'] < self.ttl:
+                self.hits += 1
+                return entry['positions']
+
+            inflight = entry['inflight']
+            if inflight is None:
+                # Bu çağrı yenilemeyi yapacak (leader)
+                inflight = entry['inflight'] = threading.Event()
+                generation = entry['generation']
+                leader = True
+                self.misses += 1
+            else:
+                leader = False
+                self.shared_waits += 1
+
+        if not leader:
+            if not inflight.wait(self.wait_timeout):
+                raise TimeoutError(f"Pozisyon yenilemesi zaman aşımına uğradı: {user_id}")
+            with self._lock:
+                error = entry['error']
+                positions = entry['positions']
+            if error is not None:
+                raise error
+            return positions
+
+        positions = None
+        error = None
+        try:
+            positions = fetch()
+            return positions
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                entry['error'] = error
+                if error is None:
+                    entry['positions'] = positions
+                    # Yenileme sırasında invalidate edildiyse veri eski sayılır
+                    entry['fetched_at'] = time.monotonic() if entry['generation'] == generation else 0.0
+                entry['inflight'] = None
+            inflight.set()
+
+    def invalidate(self, user_id=None):
+        """Kullanıcının (veya herkesin) snapshot'ını geçersiz kılar - emir gerçekleşince çağrılır"""
+        with self._lock:
+            entries = [self._entries[user_id]] if user_id in self._entries else []
+            if user_id is None:
+                entries = list(self._entries.values())
+            for entry in entries:
+                entry['fetched_at'] = 0.0
+                entry['generation'] += 1
+
+    def forget(self, user_id):
+        """Kullanıcının snapshot'ını tamamen siler"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        """Cache istatistiklerini döndürür"""
+        return {
+            "ttl": self.ttl,
+            "users": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_waits": self.shared_waits
+        }
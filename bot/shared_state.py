@@ -0,0 +1,262 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+_MISSING = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL,
+    PRIMARY KEY (name, field)
+) WITHOUT ROWID;
+"""
+
+# Hash'ler (name -> field -> değer) üzerinde ortak arayüz; skaler anahtarlar boş field'lı hash'tir
+class _StateBase:
+    shared = False
+
+    def get(self, key, default=None):
+        return self.hget(key, "", default)
+
+    def set(self, key, value, ttl=None):
+        self.hset(key, "", value, ttl)
+
+    def hash(self, name):
+        """Hash'e dict arayüzü döndürür"""
+        return StateHash(self, name)
+
+    def record(self, name, **defaults):
+        """Hash alanlarına attribute olarak erişen nesne döndürür"""
+        return StateRecord(self, name, defaults)
+
+# Süreç içi backend - tek worker için; değerler kopyalanmaz, çağıranlar her yazımda yeni değer verir
+class LocalState(_StateBase):
+    def __init__(self):
+        # name -> {field: (değer, bitiş zamanı veya None)}
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _row(self, name, field, now):
+        bucket = self._data.get(name)
+        row = bucket.get(field) if bucket else None
+        if row is not None and row[1] is not None and row[1] <= now:
+            del bucket[field]
+            return None
+        return row
+
+    def hget(self, name, field, default=None):
+        with self._lock:
+            row = self._row(name, field, time.time())
+        return default if row is None else row[0]
+
+    def hgetall(self, name):
+        now = time.time()
+        with self._lock:
+            bucket = self._data.get(name) or {}
+            return {f: v for f, (v, expires) in bucket.items() if expires is None or expires > now}
+
+    def hlen(self, name):
+        return len(self.hgetall(name))
+
+    def hset(self, name, field, value, ttl=None):
+        with self._lock:
+            self._data.setdefault(name, {})[field] = (value, time.time() + ttl if ttl else None)
+
+    def hsetnx(self, name, field, value, ttl=None):
+        """Alan yoksa (veya süresi dolduysa) yazar; yazıldıysa True"""
+        now = time.time()
+        with self._lock:
+            if self._row(name, field, now) is not None:
+                return False
+            self._data.setdefault(name, {})[field] = (value, now + ttl if ttl else None)
+            return True
+
+    def hdel(self, name, field):
+        with self._lock:
+            bucket = self._data.get(name)
+            return bool(bucket) and bucket.pop(field, None) is not None
+
+    def hincr(self, name, field, **amounts):
+        """Dict değerli alanın sayaçlarını atomik artırır, yeni değeri döndürür"""
+        with self._lock:
+            row = self._row(name, field, time.time())
+            value = dict(row[0]) if row else {}
+            for key, amount in amounts.items():
+                value[key] = value.get(key, 0) + amount
+            self._data.setdefault(name, {})[field] = (value, None)
+            return value
+
+    def delete(self, name):
+        with self._lock:
+            self._data.pop(name, None)
+
+    def stats(self):
+        return {"backend": "local", "keys": len(self._data)}
+
+# Aynı makinedeki tüm worker'ların paylaştığı SQLite (WAL) backend'i
+# Okuma-yaz-değiştir işlemleri BEGIN IMMEDIATE ile süreçler arası atomiktir
+class SqliteState(_StateBase):
+    shared = True
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        try:
+            # API key'ler de bu dosyada tutulur
+            os.chmod(path, 0o600)
+        except OSError:
+            pass
+
+    def connection(self):
+        # Bağlantılar thread'e ve sürece özeldir - fork (gunicorn --preload) sonrası yeniden açılır
+        # Paylaşılan sinyal geçmişi gibi modüller aynı dosyadaki kendi tablolarına bu bağlantıyla erişir
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def hget(self, name, field, default=None):
+        row = self.connection().execute("SELECT value, expires FROM kv WHERE name = ? AND field = ?",
+                                   (name, field)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return json.loads(row[0])
+
+    def hgetall(self, name):
+        rows = self.connection().execute("SELECT field, value FROM kv WHERE name = ? AND (expires IS NULL OR expires > ?)",
+                                    (name, time.time()))
+        return {field: json.loads(value) for field, value in rows}
+
+    def hlen(self, name):
+        return self.connection().execute("SELECT COUNT(*) FROM kv WHERE name = ? AND (expires IS NULL OR expires > ?)",
+                                    (name, time.time())).fetchone()[0]
+
+    def hset(self, name, field, value, ttl=None):
+        self.connection().execute("INSERT OR REPLACE INTO kv (name, field, value, expires) VALUES (?, ?, ?, ?)",
+                             (name, field, json.dumps(value), time.time() + ttl if ttl else None))
+
+    def hsetnx(self, name, field, value, ttl=None):
+        now = time.time()
+        with self.transaction() as conn:
+            # Süresi dolan kayıtlar yer açar - TTL'li hash'ler (dedup) bu sayede büyümez
+            conn.execute("DELETE FROM kv WHERE name = ? AND expires <= ?", (name, now))
+            cursor = conn.execute("INSERT OR IGNORE INTO kv (name, field, value, expires) VALUES (?, ?, ?, ?)",
+                                  (name, field, json.dumps(value), now + ttl if ttl else None))
+            return cursor.rowcount == 1
+
+    def hdel(self, name, field):
+        return self.connection().execute("DELETE FROM kv WHERE name = ? AND field = ?", (name, field)).rowcount > 0
+
+    def hincr(self, name, field, **amounts):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT value FROM kv WHERE name = ? AND field = ?", (name, field)).fetchone()
+            value = json.loads(row[0]) if row else {}
+            for key, amount in amounts.items():
+                value[key] = value.get(key, 0) + amount
+            conn.execute("INSERT OR REPLACE INTO kv (name, field, value, expires) VALUES (?, ?, ?, NULL)",
+                         (name, field, json.dumps(value)))
+            return value
+
+    def delete(self, name):
+        self.connection().execute("DELETE FROM kv WHERE name = ?", (name,))
+
+    def stats(self):
+        return {"backend": "sqlite", "path": self.path,
+                "keys": self.connection().execute("SELECT COUNT(DISTINCT name) FROM kv").fetchone()[0]}
+
+# Backend'deki bir hash'in dict görünümü - her işlem backend'e gider
+class StateHash(MutableMapping):
+    def __init__(self, state, name):
+        self.state = state
+        self.name = name
+
+    def __getitem__(self, field):
+        value = self.state.hget(self.name, field, _MISSING)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        self.state.hset(self.name, field, value)
+
+    def __delitem__(self, field):
+        if not self.state.hdel(self.name, field):
+            raise KeyError(field)
+
+    def __contains__(self, field):
+        return self.state.hget(self.name, field, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter(list(self.state.hgetall(self.name)))
+
+    def __len__(self):
+        return self.state.hlen(self.name)
+
+    def get(self, field, default=None):
+        return self.state.hget(self.name, field, default)
+
+    # Tek sorguyla tutarlı kopya
+    def keys(self):
+        return self.state.hgetall(self.name).keys()
+
+    def items(self):
+        return self.state.hgetall(self.name).items()
+
+    def values(self):
+        return self.state.hgetall(self.name).values()
+
+# Hash alanlarını attribute olarak okuyan/yazan kayıt (örn. bot.status)
+class StateRecord:
+    def __init__(self, state, name, defaults):
+        object.__setattr__(self, '_state', state)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_defaults', defaults)
+
+    def __getattr__(self, attr):
+        if attr not in self._defaults:
+            raise AttributeError(attr)
+        return self._state.hget(self._name, attr, self._defaults[attr])
+
+    def __setattr__(self, attr, value):
+        if attr not in self._defaults:
+            raise AttributeError(attr)
+        self._state.hset(self._name, attr, value)
+
+def default_state_path():
+    # tmpfs tercih edilir: paylaşılan durum (API key'ler dahil) diske kalıcı yazılmaz
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "trade_bot_state.db")
+
+def create_state(backend="local", path=None):
+    """STATE_BACKEND değerine göre backend oluşturur: local (tek süreç) veya sqlite (worker'lar arası)"""
+    if backend == "local":
+        return LocalState()
+    if backend == "sqlite":
+        return SqliteState(path or default_state_path())
+    raise ValueError(f"Bilinmeyen state backend: {backend}")
@@ -0,0 +1,135 @@
+import threading
+import time
+import uuid
+import logging
+
+from webhook_decoder import Signal
+
+logger = logging.getLogger("trade_bot")
+
+# Giriş sinyallerinin yönü: alış +1, satış -1
+ENTRY_DIRECTIONS = {"buy": 1, "smart_buy": 1, "sell": -1, "smart_sell": -1}
+TP_SIGNALS = ("tp1", "tp2", "tp3")
+
+def tp_runs(levels):
+    """Sıralı TP seviyelerini ardışık gruplara böler: [tp1, tp3] -> [[tp1], [tp3]]"""
+    runs = []
+    for level in levels:
+        if runs and TP_SIGNALS.index(level) == TP_SIGNALS.index(runs[-1][-1]) + 1:
+            runs[-1].append(level)
+        else:
+            runs.append([level])
+    return runs
+
+def merge_signals(items):
+    """
+    [(signal_id, Signal)] listesini net niyetlere indirger; ([Signal], özet) döndürür - liste boşsa işlem yok
+    buy + sell -> [] (flat), buy + smart_buy -> son buy, tp1 + tp2 -> tp1'den tp2'ye birleşik azaltma
+    Sadece ardışık TP seviyeleri birleşir: tp1 + tp3 -> tp1, ardından tp3
+    Net giriş varsa TP sinyalleri uygulanmaz ve özetin "dropped" listesinde döner
+    """
+    signals = [signal for _, signal in items]
+    summary = {
+        "signal_ids": [signal_id for signal_id, _ in items],
+        "signals": [signal.signal for signal in signals]
+    }
+    if len(signals) == 1:
+        summary["intent"] = signals[0].signal
+        return [signals[0]], summary
+
+    net = sum(ENTRY_DIRECTIONS.get(signal.signal, 0) for signal in signals)
+    levels = sorted({signal.signal for signal in signals if signal.signal in TP_SIGNALS}, key=TP_SIGNALS.index)
+
+    if net:
+        # Net yöndeki en son sinyal güncel fiyat/ATR'yi taşır
+        intent = next(signal for signal in reversed(signals)
+                      if ENTRY_DIRECTIONS.get(signal.signal, 0) * net > 0)
+        summary["intent"] = intent.signal
+        # Yeni giriş yeni bracket kurar - burst'teki TP'ler eski pozisyona aittir ve uygulanmaz
+        dropped = [signal_id for signal_id, signal in items if signal.signal in TP_SIGNALS]
+        if dropped:
+            summary["dropped"] = dropped
+        return [intent], summary
+    if levels:
+        base = next(signal for signal in reversed(signals) if signal.signal in TP_SIGNALS)
+        intents = [Signal(run[0], base.symbol, base.price, base.atr, base.risk, base.extra, tp_levels=len(run))
+                   for run in tp_runs(levels)]
+        summary["intent"] = " + ".join(run[0] if len(run) == 1 else f"{run[0]}-{run[-1]}" for run in tp_runs(levels))
+        return intents, summary
+    if any(signal.signal in ENTRY_DIRECTIONS for signal in signals):
+        summary["intent"] = "flat"
+        return [], summary
+    summary["intent"] = signals[-1].signal
+    return [signals[-1]], summary
+
+# Bir sembolün pencere içinde toplanan sinyalleri
+class _Batch:
+    __slots__ = ('items', 'full', 'done', 'result')
+
+    def __init__(self):
+        self.items = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.result = None
+
+# Senkron webhook modu için sembol başına birleştirme penceresi
+# Penceredeki ilk istek (lider) pencere kapanınca birleşik niyeti bir kez çalıştırır, diğerleri sonucunu bekler
+class SignalCoalescer:
+    def __init__(self, handler, window=0.3, max_signals=20, wait_timeout=30):
+        self.handler = handler
+        self.window = window
+        self.max_signals = max_signals
+        # Takipçinin liderin sonucunu en fazla bekleme süresi (pencere dahil)
+        self.wait_timeout = wait_timeout
+        self.batches = 0
+        self.merged = 0
+        self.timeouts = 0
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def submit(self, signal):
+        """Sinyali sembolün penceresine ekler; (signal_id, (yanıt, HTTP kodu)) döndürür"""
+        signal_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            batch = self._open.get(signal.symbol)
+            leader = batch is None
+            if leader:
+                batch = self._open[signal.symbol] = _Batch()
+            batch.items.append((signal_id, signal))
+            if len(batch.items) >= self.max_signals:
+                # Dolu pencere beklemeden kapanır
+                del self._open[signal.symbol]
+                batch.full.set()
+
+        if not leader:
+            if not batch.done.wait(self.wait_timeout):
+                # Lider işlemeye devam ediyor - 5xx tekrar denemeyi tetikleyip sinyali çift işletirdi
+                self.timeouts += 1
+                logger.warning(f"⏱️ Birleşik sinyal sonucu beklenemedi ({signal.symbol}, {self.wait_timeout}s)")
+                return signal_id, ({"status": "error", "message": "Coalesced signal is still being processed",
+                                    "symbol": signal.symbol}, 409)
+            return signal_id, batch.result
+
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._open.get(signal.symbol) is batch:
+                del self._open[signal.symbol]
+            self.batches += 1
+            self.merged += len(batch.items) - 1
+        try:
+            batch.result = self.handler(batch.items)
+        except Exception as e:
+            logger.error(f"Birleşik sinyal işlenemedi ({signal.symbol}): {e}")
+            batch.result = ({"status": "error", "message": str(e)}, 500)
+        finally:
+            batch.done.set()
+        return signal_id, batch.result
+
+    def stats(self):
+        return {
+            "window_ms": round(self.window * 1000),
+            "batches": self.batches,
+            "merged": self.merged,
+            "timeouts": self.timeouts,
+            "open_windows": len(self._open)
+        }
@@ -0,0 +1,167 @@
+import threading
+import queue
+import time
+import uuid
+import logging
+from collections import deque, OrderedDict
+
+logger = logging.getLogger("trade_bot")
+
+class SignalQueueFull(Exception):
+    pass
+
+# Sinyalleri kuyruğa alıp worker havuzunda çalıştıran sınıf
+# Farklı semboller paralel, aynı sembolün sinyalleri kesinlikle geliş sırasıyla işlenir
+# coalesce_window verilirse sembolün pencere içinde biriken sinyalleri batch_handler'a tek seferde verilir
+class SignalExecutor:
+    def __init__(self, handler, workers=4, max_pending=1000, max_results=10000, coalesce_window=0, batch_handler=None,
+                 shared=None, result_ttl=3600):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.coalesce_window = coalesce_window if batch_handler else 0
+        self.batch_handler = batch_handler
+        # Paylaşılan state backend'i: sonuçlar tüm worker'larda /api/signals/<id> ile okunabilir
+        self.shared = shared
+        self.result_ttl = result_ttl
+        self.completed = 0
+        self.failed = 0
+        self._pending = 0
+        self._symbol_queues = {}
+        self._active_symbols = set()
+        self._ready = queue.Queue()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def submit(self, symbol, payload):
+        """Sinyali kuyruğa ekler ve signal ID döndürür"""
+        self._ensure_workers()
+        signal_id = uuid.uuid4().hex[:16]
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise SignalQueueFull(f"Sinyal kuyruğu dolu ({self.max_pending})")
+            self._pending += 1
+            result = self._store_result(signal_id, {
+                "signal_id": signal_id,
+                "symbol": symbol,
+                "state": "queued",
+                "submitted_at": time.time()
+            })
+            self._symbol_queues.setdefault(symbol, deque()).append((signal_id, payload, time.monotonic()))
+            # Sembol şu an bir worker'da değilse hazır kuyruğuna al
+            if symbol not in self._active_symbols:
+                self._active_symbols.add(symbol)
+                self._ready.put(symbol)
+        if self.shared:
+            # hsetnx süresi dolan sonuçları da temizler
+            self.shared.hsetnx("signal_results", signal_id, result, ttl=self.result_ttl)
+        return signal_id
+
+    def get_result(self, signal_id):
+        """Signal ID'ye ait durumu/sonucu döndürür"""
+        with self._lock:
+            result = self._results.get(signal_id)
+            if result:
+                return dict(result)
+        # Sinyal başka bir worker'da kuyruğa alınmış olabilir
+        return self.shared.hget("signal_results", signal_id) if self.shared else None
+
+    def stats(self):
+        """Executor istatistiklerini döndürür"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "active_symbols": len(self._active_symbols),
+                "completed": self.completed,
+                "failed": self.failed
+            }
+
+    def _store_result(self, signal_id, result):
+        self._results[signal_id] = result
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return result
+
+    def _publish(self, signal_ids):
+        if not self.shared:
+            return
+        for signal_id in signal_ids:
+            with self._lock:
+                result = self._results.get(signal_id)
+                result = dict(result) if result is not None else None
+            if result is not None:
+                self.shared.hset("signal_results", signal_id, result, ttl=self.result_ttl)
+
+    def _ensure_workers(self):
+        if len(self._threads) == self.workers and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f"signal-worker-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            symbol = self._ready.get()
+            if self.coalesce_window:
+                # Pencere ilk sinyalin gelişinden itibaren sayılır
+                with self._lock:
+                    first_at = self._symbol_queues[symbol][0][2]
+                delay = first_at + self.coalesce_window - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            with self._lock:
+                symbol_queue = self._symbol_queues[symbol]
+                if self.coalesce_window:
+                    items = [(signal_id, payload) for signal_id, payload, _ in symbol_queue]
+                    symbol_queue.clear()
+                else:
+                    signal_id, payload, _ = symbol_queue.popleft()
+                    items = [(signal_id, payload)]
+                for signal_id, _ in items:
+                    result = self._results.get(signal_id)
+                    if result is not None:
+                        result["state"] = "running"
+            self._publish(signal_id for signal_id, _ in items)
+
+            started = time.time()
+            signal_ids = ", ".join(signal_id for signal_id, _ in items)
+            try:
+                if len(items) > 1:
+                    body, status_code = self.batch_handler(items)
+                else:
+                    body, status_code = self.handler(items[0][1])
+                state = "done" if status_code < 400 else "rejected"
+            except Exception as e:
+                logger.error(f"Kuyruktaki sinyal işlenemedi ({signal_ids}): {e}")
+                body, status_code, state = {"status": "error", "message": str(e)}, 500, "error"
+
+            with self._lock:
+                self._pending -= len(items)
+                if state == "error":
+                    self.failed += len(items)
+                else:
+                    self.completed += len(items)
+                for signal_id, _ in items:
+                    result = self._results.get(signal_id)
+                    if result is not None:
+                        result.update({
+                            "state": state,
+                            "http_status": status_code,
+                            "result": body,
+                            "started_at": started,
+                            "finished_at": time.time()
+                        })
+                # Sembolün sıradaki sinyali varsa tekrar hazır kuyruğuna al
+                if self._symbol_queues[symbol]:
+                    self._ready.put(symbol)
+                else:
+                    del self._symbol_queues[symbol]
+                    self._active_symbols.discard(symbol)
+            self._publish(signal_id for signal_id, _ in items)
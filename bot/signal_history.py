@@ -0,0 +1,389 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Gecikme kovaları (ms) - yüzdelikler kova sınırlarından yaklaşık hesaplanır
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# HTTP koduna göre sinyal sonucu
+OUTCOMES = {200: "ok", 202: "accepted", 400: "rejected", 409: "duplicate", 429: "blocked", 502: "failed"}
+
+def outcome_for(status_code):
+    return OUTCOMES.get(status_code, "error" if status_code >= 500 else "rejected")
+
+def latency_percentile(counts, total, pct):
+    """Kovanın üst sınırı döner (son kova için '>' son sınır)"""
+    if not total:
+        return None
+    target = pct * total
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS, counts):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return f">{LATENCY_BUCKETS_MS[-1]}"
+
+def success_rate(outcomes):
+    success = outcomes.get("ok", 0)
+    decided = success + outcomes.get("failed", 0) + outcomes.get("error", 0)
+    return round(success / decided * 100, 1) if decided else 0.0
+
+_local = threading.local()
+
+def begin_stages():
+    """Bu thread'de (örn. HTTP isteği boyunca) aşama sürelerini toplamaya başlar"""
+    _local.stages = {}
+    return _local.stages
+
+def end_stages():
+    _local.stages = None
+
+@contextmanager
+def stage_scope():
+    """İç kapsam: üst kapsamın aşamalarını (decode, dedup_wait) devralır, çıkışta üst kapsam geri gelir"""
+    parent = getattr(_local, 'stages', None)
+    stages = _local.stages = dict(parent) if parent else {}
+    try:
+        yield stages
+    finally:
+        _local.stages = parent
+
+def record_stage(name, seconds):
+    stages = getattr(_local, 'stages', None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+# Tek sinyalin kompakt kaydı - aşama süreleri sabit STAGES sırasıyla tuple olarak tutulur
+class SignalRecord:
+    __slots__ = ('seq', 'ts', 'symbol', 'signal', 'user', 'outcome', 'http_status', 'latency_ms', 'stages_ms', 'trace_id')
+
+    def __init__(self, seq, ts, symbol, signal, user, outcome, http_status, latency_ms, stages_ms, trace_id):
+        self.seq = seq
+        self.ts = ts
+        self.symbol = symbol
+        self.signal = signal
+        self.user = user
+        self.outcome = outcome
+        self.http_status = http_status
+        self.latency_ms = latency_ms
+        self.stages_ms = stages_ms
+        self.trace_id = trace_id
+
+    def to_dict(self, stage_names):
+        return {
+            "id": self.seq,
+            "ts": self.ts,
+            "symbol": self.symbol,
+            "signal": self.signal,
+            "user": self.user,
+            "outcome": self.outcome,
+            "http_status": self.http_status,
+            "latency_ms": self.latency_ms,
+            "stages_ms": {name: ms for name, ms in zip(stage_names, self.stages_ms) if ms is not None},
+            "trace_id": self.trace_id
+        }
+
+# Sabit kapasiteli sinyal geçmişi: halka tampon + sembol/kullanıcı indeksleri + artımlı toplamlar
+# Bellek çalışma süresinden bağımsızdır; eski kayıt üzerine yazılırken indeks ve toplamlardan düşülür
+class SignalHistory:
+    def __init__(self, capacity=10000, stages=("decode", "dedup_wait", "limits", "sizing", "execution")):
+        self.capacity = capacity
+        self.stages = tuple(stages)
+        self._slots = [None] * capacity
+        self._next_seq = 1
+        self._by_symbol = {}
+        self._by_user = {}
+        self._outcomes = {}
+        self._signals = {}
+        self._symbol_outcomes = {}
+        self._user_outcomes = {}
+        self._latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._latency_sum = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, symbol, signal, user, http_status, latency_seconds, stages=None, trace_id=None, outcome=None):
+        stages = stages or {}
+        stages_ms = tuple(round(stages[name] * 1000, 2) if name in stages else None for name in self.stages)
+        latency_ms = round(latency_seconds * 1000, 2)
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            record = SignalRecord(seq, time.time(), symbol, signal, user, outcome or outcome_for(http_status), http_status,
+                                  latency_ms, stages_ms, trace_id)
+            slot = seq % self.capacity
+            evicted = self._slots[slot]
+            if evicted is not None:
+                self._unindex(evicted)
+            self._slots[slot] = record
+            self._index(record)
+        return seq
+
+    def __len__(self):
+        return min(self._next_seq - 1, self.capacity)
+
+    def _index(self, record):
+        self._by_symbol.setdefault(record.symbol, deque()).append(record.seq)
+        self._by_user.setdefault(record.user, deque()).append(record.seq)
+        self._count(self._outcomes, record.outcome, 1)
+        self._count(self._signals, record.signal, 1)
+        self._count(self._symbol_outcomes.setdefault(record.symbol, {}), record.outcome, 1)
+        self._count(self._user_outcomes.setdefault(record.user, {}), record.outcome, 1)
+        self._latency_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, record.latency_ms)] += 1
+        self._latency_sum += record.latency_ms
+
+    def _unindex(self, record):
+        # En eski kayıt her indeksin de en solundadır
+        for index, key, outcomes in ((self._by_symbol, record.symbol, self._symbol_outcomes),
+                                     (self._by_user, record.user, self._user_outcomes)):
+            seqs = index[key]
+            seqs.popleft()
+            self._count(outcomes[key], record.outcome, -1)
+            if not seqs:
+                del index[key]
+                del outcomes[key]
+        self._count(self._outcomes, record.outcome, -1)
+        self._count(self._signals, record.signal, -1)
+        self._latency_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, record.latency_ms)] -= 1
+        self._latency_sum -= record.latency_ms
+
+    @staticmethod
+    def _count(counts, key, delta):
+        value = counts.get(key, 0) + delta
+        if value:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    def _get(self, seq):
+        record = self._slots[seq % self.capacity]
+        return record if record is not None and record.seq == seq else None
+
+    def query(self, symbol=None, user=None, outcome=None, before=None, limit=50):
+        """En yeniden eskiye kayıtlar; (kayıtlar, sonraki sayfa için before) döndürür"""
+        with self._lock:
+            if symbol is not None or user is not None:
+                # Küçük indeks taranır, diğer filtre kayıt üzerinde uygulanır
+                candidates = [index.get(key, ()) for index, key in ((self._by_symbol, symbol), (self._by_user, user))
+                              if key is not None]
+                seqs = reversed(min(candidates, key=len))
+            else:
+                newest = self._next_seq - 1 if before is None else min(self._next_seq, before) - 1
+                seqs = range(newest, max(0, self._next_seq - 1 - self.capacity), -1)
+
+            records = []
+            for seq in seqs:
+                if before is not None and seq >= before:
+                    continue
+                record = self._get(seq)
+                if record is None:
+                    break
+                if (symbol is not None and record.symbol != symbol) or (user is not None and record.user != user) \
+                        or (outcome is not None and record.outcome != outcome):
+                    continue
+                records.append(record)
+                if len(records) > limit:
+                    break
+
+        has_more = len(records) > limit
+        records = records[:limit]
+        next_before = records[-1].seq if has_more else None
+        return [record.to_dict(self.stages) for record in records], next_before
+
+    def stats(self, symbol=None, user=None):
+        """Penceredeki sinyallerin toplamları; sembol/kullanıcı verilirse o indeksin toplamları"""
+        with self._lock:
+            size = len(self)
+            oldest = self._get(self._next_seq - size) if size else None
+            result = {
+                "capacity": self.capacity,
+                "size": size,
+                "since": oldest.ts if oldest else None
+            }
+            if symbol is not None and user is not None:
+                # İki filtre birlikte: sembol indeksi kullanıcıya göre süzülür (sadece bellekteki pencere)
+                outcomes = {}
+                for seq in self._by_symbol.get(symbol, ()):
+                    record = self._get(seq)
+                    if record.user == user:
+                        self._count(outcomes, record.outcome, 1)
+            elif symbol is not None:
+                outcomes = dict(self._symbol_outcomes.get(symbol, {}))
+            elif user is not None:
+                outcomes = dict(self._user_outcomes.get(user, {}))
+
+            if symbol is not None or user is not None:
+                result.update(symbol=symbol, user=user, total=sum(outcomes.values()), outcomes=outcomes)
+            else:
+                counts = list(self._latency_counts)
+                total = sum(counts)
+                result.update({
+                    "total": total,
+                    "outcomes": dict(self._outcomes),
+                    "signals": dict(self._signals),
+                    "symbols": {s: dict(o) for s, o in self._symbol_outcomes.items()},
+                    "users": {u: dict(o) for u, o in self._user_outcomes.items()},
+                    "latency_ms": {
+                        "mean": round(self._latency_sum / total, 2) if total else 0.0,
+                        "p50": latency_percentile(counts, total, 0.50),
+                        "p95": latency_percentile(counts, total, 0.95),
+                        "p99": latency_percentile(counts, total, 0.99)
+                    }
+                })
+        result["success_rate"] = success_rate(result["outcomes"])
+        return result
+
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signal_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    symbol TEXT NOT NULL,
+    signal TEXT NOT NULL,
+    user TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    http_status INTEGER,
+    latency_ms REAL NOT NULL,
+    bucket INTEGER NOT NULL,
+    stages TEXT NOT NULL,
+    trace_id TEXT
+);
+CREATE INDEX IF NOT EXISTS signal_history_symbol ON signal_history (symbol, seq);
+CREATE INDEX IF NOT EXISTS signal_history_user ON signal_history (user, seq);
+CREATE TABLE IF NOT EXISTS signal_totals (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    PRIMARY KEY (kind, key, outcome)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS signal_history_add AFTER INSERT ON signal_history BEGIN
+    INSERT INTO signal_totals VALUES
+        ('all', '', NEW.outcome, 1, NEW.latency_ms),
+        ('signal', NEW.signal, '', 1, 0),
+        ('symbol', NEW.symbol, NEW.outcome, 1, 0),
+        ('user', NEW.user, NEW.outcome, 1, 0),
+        ('latency', NEW.bucket, '', 1, 0)
+    ON CONFLICT (kind, key, outcome) DO UPDATE SET n = n + 1, latency_sum = latency_sum + excluded.latency_sum;
+END;
+CREATE TRIGGER IF NOT EXISTS signal_history_evict AFTER DELETE ON signal_history BEGIN
+    UPDATE signal_totals SET n = n - 1, latency_sum = latency_sum - OLD.latency_ms
+        WHERE kind = 'all' AND key = '' AND outcome = OLD.outcome;
+    UPDATE signal_totals SET n = n - 1 WHERE kind = 'signal' AND key = OLD.signal AND outcome = '';
+    UPDATE signal_totals SET n = n - 1 WHERE kind = 'symbol' AND key = OLD.symbol AND outcome = OLD.outcome;
+    UPDATE signal_totals SET n = n - 1 WHERE kind = 'user' AND key = OLD.user AND outcome = OLD.outcome;
+    UPDATE signal_totals SET n = n - 1 WHERE kind = 'latency' AND key = CAST(OLD.bucket AS TEXT) AND outcome = '';
+    DELETE FROM signal_totals WHERE n <= 0;
+END;
+"""
+
+# Worker'lar arası paylaşılan sinyal geçmişi (STATE_BACKEND=sqlite) - state dosyasında sabit kapasiteli tablo
+# Toplamlar trigger'larla ekleme/silmede artımlı güncellenir; sorgular indeksten okunur, tüm worker'lar aynı sayıları görür
+class SharedSignalHistory:
+    def __init__(self, state, capacity=10000, stages=("decode", "dedup_wait", "limits", "sizing", "execution")):
+        self.state = state
+        self.capacity = capacity
+        self.stages = tuple(stages)
+        self.state.connection().executescript(SHARED_SCHEMA)
+
+    def add(self, symbol, signal, user, http_status, latency_seconds, stages=None, trace_id=None, outcome=None):
+        stages = stages or {}
+        latency_ms = round(latency_seconds * 1000, 2)
+        stages_ms = {name: round(stages[name] * 1000, 2) for name in self.stages if name in stages}
+        with self.state.transaction() as conn:
+            seq = conn.execute(
+                "INSERT INTO signal_history (ts, symbol, signal, user, outcome, http_status, latency_ms, bucket, stages, trace_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), symbol, signal, user or "", outcome or outcome_for(http_status), http_status, latency_ms,
+                 bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms), json.dumps(stages_ms), trace_id)).lastrowid
+            # Kapasiteyi aşan en eski kayıt silinir - evict trigger'ı toplamlardan düşer
+            conn.execute("DELETE FROM signal_history WHERE seq <= ?", (seq - self.capacity,))
+        return seq
+
+    def __len__(self):
+        return self.state.connection().execute("SELECT COUNT(*) FROM signal_history").fetchone()[0]
+
+    def query(self, symbol=None, user=None, outcome=None, before=None, limit=50):
+        """En yeniden eskiye kayıtlar; (kayıtlar, sonraki sayfa için before) döndürür"""
+        where, params = [], []
+        for column, value in (("symbol", symbol), ("user", user), ("outcome", outcome)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if before is not None:
+            where.append("seq < ?")
+            params.append(before)
+        sql = ("SELECT seq, ts, symbol, signal, user, outcome, http_status, latency_ms, stages, trace_id FROM signal_history"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY seq DESC LIMIT ?")
+        rows = self.state.connection().execute(sql, params + [limit + 1]).fetchall()
+
+        next_before = rows[limit - 1][0] if len(rows) > limit else None
+        return [{
+            "id": seq,
+            "ts": ts,
+            "symbol": symbol,
+            "signal": signal,
+            "user": user or None,
+            "outcome": outcome,
+            "http_status": http_status,
+            "latency_ms": latency_ms,
+            "stages_ms": json.loads(stages),
+            "trace_id": trace_id
+        } for seq, ts, symbol, signal, user, outcome, http_status, latency_ms, stages, trace_id in rows[:limit]], next_before
+
+    def stats(self, symbol=None, user=None):
+        """Penceredeki sinyallerin toplamları; sembol/kullanıcı verilirse o indeksin toplamları"""
+        conn = self.state.connection()
+        oldest = conn.execute("SELECT ts FROM signal_history ORDER BY seq LIMIT 1").fetchone()
+        result = {
+            "capacity": self.capacity,
+            "size": len(self),
+            "since": oldest[0] if oldest else None
+        }
+        if symbol is not None and user is not None:
+            outcomes = dict(conn.execute("SELECT outcome, COUNT(*) FROM signal_history WHERE symbol = ? AND user = ?"
+                                         " GROUP BY outcome", (symbol, user)))
+        elif symbol is not None or user is not None:
+            kind, key = ("symbol", symbol) if symbol is not None else ("user", user)
+            outcomes = dict(conn.execute("SELECT outcome, n FROM signal_totals WHERE kind = ? AND key = ?", (kind, key)))
+
+        if symbol is not None or user is not None:
+            result.update(symbol=symbol, user=user, total=sum(outcomes.values()), outcomes=outcomes)
+        else:
+            totals = {}
+            latency_sum = 0.0
+            for kind, key, outcome, n, kind_latency in conn.execute("SELECT kind, key, outcome, n, latency_sum FROM signal_totals"):
+                totals.setdefault(kind, []).append((key, outcome, n))
+                if kind == "all":
+                    latency_sum += kind_latency
+            counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            for key, _, n in totals.get("latency", ()):
+                counts[int(key)] = n
+            total = sum(counts)
+            grouped = {"symbol": {}, "user": {}}
+            for kind in grouped:
+                for key, outcome, n in totals.get(kind, ()):
+                    grouped[kind].setdefault(key or None, {})[outcome] = n
+            result.update({
+                "total": total,
+                "outcomes": {outcome: n for _, outcome, n in totals.get("all", ())},
+                "signals": {key: n for key, _, n in totals.get("signal", ())},
+                "symbols": grouped["symbol"],
+                "users": grouped["user"],
+                "latency_ms": {
+                    "mean": round(latency_sum / total, 2) if total else 0.0,
+                    "p50": latency_percentile(counts, total, 0.50),
+                    "p95": latency_percentile(counts, total, 0.95),
+                    "p99": latency_percentile(counts, total, 0.99)
+                }
+            })
+        result["success_rate"] = success_rate(result["outcomes"])
+        return result
+
+def create_signal_history(capacity=10000, state=None):
+    """Paylaşılan state backend'i varsa worker'lar arası tablo, yoksa süreç içi halka tampon"""
+    if state is not None and state.shared:
+        return SharedSignalHistory(state, capacity)
+    return SignalHistory(capacity)
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger("trade_bot")
+
+def process_age():
+    """Sürecin başlangıcından beri geçen saniye (Linux /proc); bilinmiyorsa None"""
+    try:
+        with open("/proc/self/stat") as f:
+            # comm alanı boşluk içerebilir - kapanan parantezden sonrası sabit alanlardır
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Açılış süresinin dökümü: import/kurulum aşamaları, arka plan warm-up adımları ve ilk sağlıklı yanıt
+class StartupProfiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Modül import edilene kadar geçen süre (yorumlayıcı açılışı dahil)
+        age = process_age()
+        self.before_import_ms = round(age * 1000, 1) if age is not None else None
+        self.phases = []
+        self.marks = {}
+        self.warmup_errors = {}
+        self.ready = threading.Event()
+        self._thread = None
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, round((time.perf_counter() - started) * 1000, 1)))
+
+    def mark(self, name):
+        """Olayın açılıştan itibaren zamanını bir kez kaydeder"""
+        if name not in self.marks:
+            self.marks[name] = self.elapsed_ms()
+            if name == "first_healthy":
+                logger.info("🩺 İlk sağlıklı yanıt: %s ms (import öncesi %s ms)", self.marks[name], self.before_import_ms)
+
+    def warm_up(self, steps):
+        """(ad, fonksiyon) adımlarını arka plan thread'inde sırayla çalıştırır; bitince ready set edilir"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run_warmup, args=(steps,), name="warm-up", daemon=True)
+        self._thread.start()
+
+    def wait_ready(self, timeout):
+        return self.ready.wait(timeout)
+
+    def _run_warmup(self, steps):
+        for name, func in steps:
+            try:
+                with self.phase(f"warmup:{name}"):
+                    func()
+            except Exception as e:
+                # Başarısız adım açılışı durdurmaz - alt sistem ilk kullanımda yeniden denenir
+                self.warmup_errors[name] = str(e)
+                logger.error(f"Warm-up adımı başarısız ({name}): {e}")
+        self.mark("ready")
+        self.ready.set()
+        logger.info("🔥 Warm-up tamamlandı: %s", ", ".join(f"{name} {ms} ms" for name, ms in self.phases))
+
+    def report(self):
+        return {
+            "before_import_ms": self.before_import_ms,
+            "phases_ms": dict(self.phases),
+            "marks_ms": dict(self.marks),
+            "ready": self.ready.is_set(),
+            "warmup_errors": dict(self.warmup_errors)
+        }
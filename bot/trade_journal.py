@@ -0,0 +1,204 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+import logging
+
+from trading_limits import TradingLimits
+
+logger = logging.getLogger("trade_bot")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+# Journal'dan yeniden kurulan durum: işlem limitleri (hesap bazlı dahil) + bot durumu
+class JournalState:
+    def __init__(self, history_days=7):
+        self.history_days = history_days
+        self.limits = TradingLimits(history_days=history_days)
+        self.user_limits = {}
+        self.bot = {}
+
+    def limits_for(self, user_id):
+        if not user_id:
+            return self.limits
+        if user_id not in self.user_limits:
+            self.user_limits[user_id] = TradingLimits(history_days=self.history_days)
+        return self.user_limits[user_id]
+
+    def apply(self, event_type, payload):
+        if event_type == "bot":
+            self.bot.update(payload)
+        else:
+            self.limits_for(payload.get("user")).apply_event(event_type, payload)
+
+    def export(self):
+        return {
+            "limits": self.limits.export_state(),
+            "users": {user_id: limits.export_state() for user_id, limits in self.user_limits.items()},
+            "bot": dict(self.bot)
+        }
+
+    def restore(self, state):
+        self.limits.restore_state(state["limits"])
+        for user_id, limits_state in state.get("users", {}).items():
+            self.limits_for(user_id).restore_state(limits_state)
+        self.bot = dict(state.get("bot", {}))
+
+# İşlem, limit ve bot durumu olaylarını SQLite (WAL) üzerinde append-only tutan journal
+class TradeJournal:
+    def __init__(self, path, batch_interval=0.2, snapshot_every=1000, snapshot_interval=300,
+                 retention_days=90, history_days=7):
+        self.path = path
+        self.batch_interval = batch_interval
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.retention_days = retention_days
+        self.history_days = history_days
+        self.written = 0
+        self.snapshots = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = None
+        self._last_event_id = 0
+        # Replikaya uygulanan son olay - birden fazla süreç aynı journal'a yazabilir
+        self._applied_event_id = 0
+        self._last_snapshot_event_id = 0
+        self._last_snapshot_at = time.monotonic()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Her batch commit'i fsync edilir
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def recover(self):
+        """Son snapshot + journal kuyruğundan durumu kurar ve JournalState döndürür"""
+        started = time.perf_counter()
+        state = JournalState(self.history_days)
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT event_id, state FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+            if row:
+                self._last_snapshot_event_id = row[0]
+                state.restore(json.loads(row[1]))
+
+            replayed = 0
+            for event_id, event_type, payload in conn.execute(
+                    "SELECT id, type, payload FROM events WHERE id > ? ORDER BY id", (self._last_snapshot_event_id,)):
+                state.apply(event_type, json.loads(payload))
+                self._last_event_id = event_id
+                replayed += 1
+            self._last_event_id = max(self._last_event_id, self._last_snapshot_event_id)
+            self._applied_event_id = self._last_event_id
+        finally:
+            conn.close()
+
+        # Writer thread'in replikası kurtarılan durumdan devam eder
+        self._state = JournalState(self.history_days)
+        self._state.restore(json.loads(json.dumps(state.export())))
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"📒 Journal'dan durum yüklendi: snapshot #{self._last_snapshot_event_id} + {replayed} olay, {elapsed:.1f} ms")
+        return state
+
+    def append(self, event_type, payload):
+        """Olayı yazma kuyruğuna ekler - çağıran thread'i bloklamaz"""
+        self._ensure_writer()
+        self._queue.put((time.time(), event_type, payload))
+
+    def flush(self, timeout=10):
+        """Kuyruktaki olaylar diske yazılana kadar bekler"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self._queue.unfinished_tasks == 0
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "snapshots": self.snapshots,
+            "last_event_id": self._last_event_id
+        }
+
+    def _ensure_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._state is None:
+                    self._state = JournalState(self.history_days)
+                self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_interval
+            # Kısa pencere içindeki olaylar tek transaction (tek fsync) ile yazılır
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                with conn:
+                    for ts, event_type, payload in batch:
+                        cursor = conn.execute("INSERT INTO events (ts, type, payload) VALUES (?, ?, ?)",
+                                              (ts, event_type, json.dumps(payload)))
+                        self._last_event_id = cursor.lastrowid
+                    self.written += len(batch)
+                    if self._snapshot_due():
+                        self._write_snapshot(conn)
+            except Exception as e:
+                logger.error(f"Journal yazma hatası: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _snapshot_due(self):
+        pending = self._last_event_id - self._last_snapshot_event_id
+        if pending >= self.snapshot_every:
+            return True
+        return pending > 0 and time.monotonic() - self._last_snapshot_at >= self.snapshot_interval
+
+    def _catch_up(self, conn):
+        # Replika diğer worker'ların olayları dahil tabloyu sırayla izler - snapshot her zaman tam durumdur
+        for event_id, event_type, payload in conn.execute(
+                "SELECT id, type, payload FROM events WHERE id > ? ORDER BY id", (self._applied_event_id,)):
+            self._state.apply(event_type, json.loads(payload))
+            self._applied_event_id = event_id
+
+    def _write_snapshot(self, conn):
+        self._catch_up(conn)
+        conn.execute("INSERT INTO snapshots (event_id, ts, state) VALUES (?, ?, ?)",
+                     (self._applied_event_id, time.time(), json.dumps(self._state.export())))
+        # Son 3 snapshot dışındakileri ve saklama süresini aşan olayları temizle
+        conn.execute("DELETE FROM snapshots WHERE id NOT IN (SELECT id FROM snapshots ORDER BY id DESC LIMIT 3)")
+        conn.execute("DELETE FROM events WHERE ts < ? AND id <= ?",
+                     (time.time() - self.retention_days * 86400, self._applied_event_id))
+        self._last_snapshot_event_id = self._applied_event_id
+        self._last_snapshot_at = time.monotonic()
+        self.snapshots += 1
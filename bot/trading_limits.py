@@ -0,0 +1,292 @@
+import threading
+import time
+import datetime
+import logging
+from collections import deque
+
+from shared_state import LocalState
+
+logger = logging.getLogger("trade_bot")
+
+def utc_day(now=None):
+    """UTC gün numarası (epoch'tan beri geçen gün) - strftime'dan çok daha ucuz"""
+    return int((now if now is not None else time.time()) // 86400)
+
+def day_to_str(day):
+    return (datetime.date(1970, 1, 1) + datetime.timedelta(days=day)).isoformat()
+
+def empty_counters():
+    return {"trades": 0, "failed": 0, "pnl": 0.0}
+
+# Engelli semboller hash'inde tüm sembolleri kapatan alan (günlük zarar limiti)
+ALL_SYMBOLS = "*"
+
+# İşlem limitleri ve başarısız işlem takibi için sınıf
+# Günlük sayaçlar ve engelli semboller state backend'inde tutulur - paylaşılan backend'de tüm worker'lar aynı limitleri görür
+class TradingLimits:
+    def __init__(self, max_failed_trades=3, max_daily_trades=10, max_open_positions=5,
+                 history_days=7, open_positions=None, on_block=None, listener=None, clock=None,
+                 state=None, scope="bot", max_daily_loss=None, on_max_loss=None, on_day_change=None):
+        self.max_failed_trades = max_failed_trades
+        self.max_daily_trades = max_daily_trades
+        self.max_open_positions = max_open_positions
+        # Açık pozisyonu olan semboller: open_positions() -> iterable (None ise pozisyon limiti uygulanmaz)
+        self.open_positions = open_positions
+        self.on_block = on_block
+        # Günlük gerçekleşmiş zarar bu tutarı aşınca gün sonuna kadar tüm semboller kapanır: on_max_loss(pnl, sebep)
+        self.max_daily_loss = max_daily_loss
+        self.on_max_loss = on_max_loss
+        # UTC gün değişiminde çağrılır (örn. zarar limitiyle duran botu yeniden açmak için): on_day_change(gün)
+        self.on_day_change = on_day_change
+        # Olay dinleyicisi (örn. trade journal): listener(olay_tipi, payload)
+        self.listener = listener
+        # Zaman kaynağı - replay/backtest simüle saat verebilir
+        self.clock = clock or time.time
+        self.state = state or LocalState()
+        self.scope = scope
+        # Geçmiş günlerin özetleri: (gün, {sembol: sayaçlar}) - en fazla history_days gün tutulur
+        self.history = deque(maxlen=history_days)
+        self._day = utc_day(self.clock())
+        self._lock = threading.Lock()
+
+    def _counters_key(self, day):
+        return f"limits:{self.scope}:{day}"
+
+    def _blocked_key(self, day):
+        return f"blocked:{self.scope}:{day}"
+
+    @property
+    def trade_blocked_symbols(self):
+        return set(self.state.hgetall(self._blocked_key(self._day)))
+
+    def _roll_day(self):
+        """UTC gün değiştiyse bugünün sayaçlarını arşivler (eski günler gün anahtarlarında kalır)"""
+        today = utc_day(self.clock())
+        if today != self._day:
+            self._advance_to(today)
+
+    def roll_day(self):
+        """Gün değişimini işlem beklemeden uygular (duran bot ve arka plan görevleri için)"""
+        self._roll_day()
+
+    def _advance_to(self, day):
+        with self._lock:
+            if day <= self._day:
+                return
+            counters = self.state.hgetall(self._counters_key(self._day))
+            if counters:
+                self.history.append((self._day, counters))
+            previous, self._day = self._day, day
+            # Geçmiş penceresinden çıkan tüm günlerin anahtarları silinir - birkaç gün atlanırsa (kapalı kalma) hepsi;
+            # önceki günden sonraki anahtarlar yazılmamış olabilir, aralık en fazla geçmiş penceresi kadardır
+            for expired in range(previous - self.history.maxlen, min(previous, day - self.history.maxlen - 1) + 1):
+                self.state.delete(self._counters_key(expired))
+                self.state.delete(self._blocked_key(expired))
+        logger.info("Günlük işlem istatistikleri sıfırlandı (UTC gün değişimi).")
+        if self.on_day_change:
+            self.on_day_change(day)
+
+    def _emit(self, event_type, payload):
+        if self.listener:
+            try:
+                self.listener(event_type, payload)
+            except Exception as e:
+                logger.error(f"Limit olayı kaydedilemedi ({event_type}): {e}")
+
+    def reset_daily_stats(self):
+        self.state.delete(self._counters_key(self._day))
+        self.state.delete(self._blocked_key(self._day))
+        self._emit("reset", {"day": self._day})
+        logger.info("Günlük işlem istatistikleri sıfırlandı.")
+
+    def get_today_key(self):
+        return day_to_str(utc_day(self.clock()))
+
+    def block_symbol(self, symbol, reason=""):
+        """Sembolü gün sonuna kadar işleme kapatır"""
+        # Atomik: aynı anda engelleyen worker'lardan sadece biri bildirim gönderir
+        if not self.state.hsetnx(self._blocked_key(self._day), symbol, reason):
+            return
+        self._emit("block", {"symbol": symbol, "reason": reason, "day": self._day})
+        logger.warning(f"{symbol} için işlemler engellendi. {reason}".strip())
+        if self.on_block:
+            self.on_block(symbol, reason)
+
+    def record_trade(self, symbol, is_successful=True, profit_loss=None):
+        self._roll_day()
+        counters = self.state.hincr(self._counters_key(self._day), symbol, trades=1,
+                                    failed=0 if is_successful else 1, pnl=profit_loss or 0.0)
+        failed = counters["failed"]
+
+        self._emit("trade", {"symbol": symbol, "ok": is_successful, "pnl": profit_loss, "day": self._day})
+        if not is_successful and failed >= self.max_failed_trades:
+            self.block_symbol(symbol, f"{failed} başarısız işlem")
+
+        logger.info(f"İşlem kaydedildi: {symbol}, Başarı: {is_successful}")
+
+    def _cursor_key(self):
+        return f"income_cursor:{self.scope}"
+
+    def income_cursor(self, account):
+        """Hesabın borsa gelir geçmişinde işlenen son kaydı (yoksa None)"""
+        return self.state.hget(self._cursor_key(), account)
+
+    def record_income(self, account, entries, cursor):
+        """
+        Borsadan uzlaştırılan gerçekleşmiş PnL'i [(gün, sembol, tutar)] ve hesabın gelir imlecini birlikte işler
+        Tek journal olayıdır - restart sonrası sayaçlar ve imleç aynı noktadan kurulur, kayıt iki kez sayılmaz
+        """
+        self._roll_day()
+        newest = max((day for day, _, _ in entries), default=self._day)
+        if newest > self._day:
+            self._advance_to(newest)
+        self._apply_income(account, entries, cursor)
+        self._emit("income", {"account": account, "entries": [list(entry) for entry in entries],
+                              "cursor": cursor, "day": self._day})
+        if any(day == self._day for day, _, _ in entries):
+            self._check_daily_loss()
+
+    def _apply_income(self, account, entries, cursor):
+        for day, symbol, amount in entries:
+            if day < self._day:
+                # Gün dönümünden önce kapanan işlem - sadece geçmiş özeti güncellenir
+                self._add_to_history(day, symbol, pnl=amount)
+            elif day == self._day:
+                # trades/failed sıfırla eklenir - sayaç dict'i her zaman tam alanlı olur
+                self.state.hincr(self._counters_key(self._day), symbol, trades=0, failed=0, pnl=amount)
+        self.state.hset(self._cursor_key(), account, cursor)
+
+    def _check_daily_loss(self):
+        if not self.max_daily_loss:
+            return
+        pnl = self.total_daily_pnl()
+        if pnl > -self.max_daily_loss:
+            return
+        reason = f"günlük zarar limiti ({pnl:.2f} / -{self.max_daily_loss})"
+        # Atomik: limit gün içinde bir kez tetiklenir
+        blocked_key = self._blocked_key(self._day)
+        if not self.state.hsetnx(blocked_key, ALL_SYMBOLS, reason):
+            return
+        self._emit("block", {"symbol": ALL_SYMBOLS, "reason": reason, "day": self._day})
+        for symbol in self.state.hgetall(self._counters_key(self._day)):
+            if self.state.hsetnx(blocked_key, symbol, reason):
+                self._emit("block", {"symbol": symbol, "reason": reason, "day": self._day})
+        logger.warning(f"🛑 Tüm işlemler gün sonuna kadar durduruldu: {reason}")
+        if self.on_max_loss:
+            self.on_max_loss(pnl, reason)
+
+    def _allows(self, symbol, blocked, trades, held):
+        """/webhook ve /webhook/batch için tek kural: sembol engelli değil, günlük işlem limiti dolmamış ve
+        sinyal yeni pozisyon açacaksa pozisyon limiti dolmamış (tutulan sembol pozisyon sayısını artırmaz)"""
+        return symbol not in blocked and ALL_SYMBOLS not in blocked and trades < self.max_daily_trades \
+            and (held is None or symbol in held or len(held) < self.max_open_positions)
+
+    def can_trade(self, symbol):
+        self._roll_day()
+        blocked = self.state.hgetall(self._blocked_key(self._day))
+        counters = self.state.hget(self._counters_key(self._day), symbol, empty_counters())
+        held = set(self.open_positions()) if self.open_positions is not None else None
+        return self._allows(symbol, blocked, counters["trades"], held)
+
+    def can_trade_many(self, symbols, open_symbols=()):
+        """
+        Toplu sinyal için tek okumayla limit kontrolü; sırayla [bool] döndürür
+        Batch içinde izin verilen sinyaller sonrakilerin günlük işlem ve açık pozisyon sayısına eklenir
+        """
+        self._roll_day()
+        blocked = self.state.hgetall(self._blocked_key(self._day))
+        counters = self.state.hgetall(self._counters_key(self._day))
+        held = set(open_symbols) if self.open_positions is not None else None
+        pending = {}
+        allowed = []
+        for symbol in symbols:
+            trades = counters.get(symbol, empty_counters())["trades"] + pending.get(symbol, 0)
+            ok = self._allows(symbol, blocked, trades, held)
+            if ok:
+                pending[symbol] = pending.get(symbol, 0) + 1
+                if held is not None:
+                    held.add(symbol)
+            allowed.append(ok)
+        return allowed
+
+    def total_daily_trades(self):
+        self._roll_day()
+        return sum(c["trades"] for c in self.state.hgetall(self._counters_key(self._day)).values())
+
+    def total_daily_pnl(self):
+        self._roll_day()
+        return sum(c["pnl"] for c in self.state.hgetall(self._counters_key(self._day)).values())
+
+    def snapshot(self):
+        """Bugünün sayaçlarını ve engelli sembolleri döndürür"""
+        self._roll_day()
+        return {
+            "date": day_to_str(self._day),
+            "symbols": self.state.hgetall(self._counters_key(self._day)),
+            "blocked_symbols": sorted(self.trade_blocked_symbols)
+        }
+
+    def apply_event(self, event_type, payload):
+        """Journal olayını yan etkisiz (Discord/listener olmadan) uygular - kurtarma sırasında kullanılır"""
+        day = payload.get("day", self._day)
+        if day > self._day:
+            self._advance_to(day)
+
+        if event_type == "income":
+            # Kayıtlar kendi günlerine göre uygulanır - imleç her durumda ilerler
+            self._apply_income(payload["account"], payload["entries"], payload["cursor"])
+            return
+
+        if day < self._day:
+            # Geçmiş güne ait olay - sadece geçmiş özeti güncellenir
+            if event_type == "trade":
+                self._add_to_history(day, payload["symbol"], trades=1, failed=0 if payload.get("ok", True) else 1,
+                                     pnl=payload.get("pnl") or 0.0)
+            return
+
+        if event_type == "trade":
+            self.state.hincr(self._counters_key(self._day), payload["symbol"], trades=1,
+                             failed=0 if payload.get("ok", True) else 1, pnl=payload.get("pnl") or 0.0)
+        elif event_type == "block":
+            self.state.hset(self._blocked_key(self._day), payload["symbol"], payload.get("reason", ""))
+        elif event_type == "reset":
+            self.state.delete(self._counters_key(self._day))
+            self.state.delete(self._blocked_key(self._day))
+
+    def _add_to_history(self, day, symbol, **amounts):
+        summary = next((data for d, data in self.history if d == day), None)
+        if summary is None:
+            return
+        counters = summary.setdefault(symbol, empty_counters())
+        for key, amount in amounts.items():
+            counters[key] += amount
+
+    def export_state(self):
+        """Snapshot için tüm durumu serileştirilebilir dict olarak döndürür"""
+        with self._lock:
+            return {
+                "day": self._day,
+                "counters": self.state.hgetall(self._counters_key(self._day)),
+                "blocked_symbols": sorted(self.trade_blocked_symbols),
+                "history": [[day, data] for day, data in self.history],
+                "income_cursors": self.state.hgetall(self._cursor_key())
+            }
+
+    def restore_state(self, state):
+        """export_state() çıktısından durumu geri yükler"""
+        with self._lock:
+            self._day = state["day"]
+            counters_key = self._counters_key(self._day)
+            blocked_key = self._blocked_key(self._day)
+            self.state.delete(counters_key)
+            self.state.delete(blocked_key)
+            for symbol, counters in state["counters"].items():
+                self.state.hset(counters_key, symbol, dict(empty_counters(), **counters))
+            for symbol in state["blocked_symbols"]:
+                self.state.hset(blocked_key, symbol, "")
+            self.state.delete(self._cursor_key())
+            for account, cursor in state.get("income_cursors", {}).items():
+                self.state.hset(self._cursor_key(), account, cursor)
+            self.history.clear()
+            for day, data in state["history"]:
+                self.history.append((day, data))
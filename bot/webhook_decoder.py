@@ -0,0 +1,189 @@
+import json
+import math
+import logging
+from urllib.parse import parse_qsl
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+logger = logging.getLogger("trade_bot")
+
+class WebhookDecodeError(ValueError):
+    pass
+
+TP_FIELDS = ("tp1", "tp2", "tp3")
+
+# Doğrulanmış TradingView sinyali
+class Signal:
+    __slots__ = ('signal', 'symbol', 'price', 'atr', 'risk', 'extra', 'tp_levels')
+
+    def __init__(self, signal, symbol, price=0.0, atr=None, risk=1.0, extra=None, tp_levels=1):
+        self.signal = signal
+        self.symbol = symbol
+        self.price = price
+        self.atr = atr
+        self.risk = risk
+        self.extra = extra or {}
+        # Birleştirilmiş ardışık TP seviye sayısı - sadece coalescer atar, payload'dan okunmaz
+        self.tp_levels = tp_levels
+
+    def get(self, key, default=None):
+        """Ek alanları (tp1, id, time...) okur"""
+        return self.extra.get(key, default)
+
+    def to_dict(self):
+        data = dict(self.extra)
+        data.update({
+            "signal": self.signal,
+            "symbol": self.symbol,
+            "price": self.price,
+            "atr": self.atr,
+            "risk": self.risk
+        })
+        return data
+
+    def __repr__(self):
+        return f"Signal({self.signal} {self.symbol} @{self.price} atr={self.atr} risk={self.risk})"
+
+def _to_float(data, key, default):
+    value = data.get(key)
+    if value is None or value == "":
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise WebhookDecodeError(f"Invalid numeric field: {key}")
+    # nan/inf karşılaştırmaları atlatır (nan < 0 False) - sonlu olmayan değerler reddedilir
+    if not math.isfinite(number):
+        raise WebhookDecodeError(f"Non-finite numeric field: {key}")
+    return number
+
+def build_signal(data):
+    """Parse edilmiş dict'i doğrular ve Signal'e çevirir"""
+    if not isinstance(data, dict):
+        raise WebhookDecodeError("Payload must be an object")
+
+    signal = data.get('signal')
+    symbol = data.get('symbol')
+    if not signal or not symbol or not isinstance(signal, str) or not isinstance(symbol, str):
+        raise WebhookDecodeError("Missing required fields: signal, symbol")
+
+    price = _to_float(data, 'price', 0.0)
+    atr = _to_float(data, 'atr', None)
+    risk = _to_float(data, 'risk', 1.0)
+    if price < 0 or (atr is not None and atr < 0):
+        raise WebhookDecodeError("price and atr must be non-negative")
+    if not 0 < risk <= 100:
+        raise WebhookDecodeError("risk must be in (0, 100]")
+
+    extra = {k: v for k, v in data.items() if k not in Signal.__slots__}
+    # Opsiyonel TP fiyatları burada sayıya çevrilir - geçersiz değer emir aşamasında 500 yerine 400 alır
+    for key in TP_FIELDS:
+        if key in extra:
+            value = _to_float(data, key, None)
+            if value is not None and value < 0:
+                raise WebhookDecodeError(f"{key} must be non-negative")
+            extra[key] = value
+    return Signal(signal.strip().lower(), symbol.strip().upper(), price, atr, risk, extra)
+
+def _decode_json(body):
+    try:
+        return json_loads(body)
+    except ValueError as e:
+        raise WebhookDecodeError(f"Invalid JSON: {e}")
+
+def _decode_form(form):
+    # TradingView bazen JSON'u form key'i olarak gönderir
+    first_key = next(iter(form), "")
+    if first_key.startswith("{"):
+        return _decode_json(first_key)
+    return form
+
+def decode_payload(body, content_type="", form=None, args=None):
+    """
+    Webhook gövdesini tek geçişte çözer: format ilk byte'lardan ve Content-Type'tan bir kez belirlenir
+    Desteklenen formatlar: JSON, alert('{...}'), form (JSON key veya key=value) ve query string
+    """
+    body = body or b""
+    stripped = body.lstrip()
+    head = stripped[:6]
+
+    if head[:1] == b"{":
+        # JSON - Content-Type ne olursa olsun (text/plain, form ile gönderilen JSON dahil)
+        data = _decode_json(stripped)
+    elif head == b"alert(":
+        start = stripped.find(b"{")
+        end = stripped.rfind(b"}")
+        if start == -1 or end < start:
+            raise WebhookDecodeError("alert() payload does not contain JSON")
+        data = _decode_json(stripped[start:end + 1])
+    elif content_type.startswith("multipart/form-data") and form:
+        data = _decode_form(dict(form))
+    elif stripped and (content_type.startswith("application/x-www-form-urlencoded") or b"=" in stripped):
+        data = _decode_form(dict(parse_qsl(stripped.decode("utf-8", "replace"), keep_blank_values=True)))
+    elif args:
+        data = dict(args)
+    elif stripped:
+        raise WebhookDecodeError("Unrecognized payload format")
+    else:
+        raise WebhookDecodeError("Empty payload")
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📨 Webhook çözüldü - Content-Type: '%s', data: %s", content_type, data)
+    return build_signal(data)
+
+def decode_webhook_request(request):
+    """Flask request'inden Signal üretir"""
+    content_type = request.content_type or ""
+    # multipart gövdesi Flask tarafından parse edilir, diğer formatlar ham byte'lardan çözülür
+    if content_type.startswith("multipart/form-data"):
+        return decode_payload(b"", content_type, form=request.form, args=request.args)
+    return decode_payload(request.get_data(), content_type, args=request.args)
+
+def _batch_item(data):
+    try:
+        return build_signal(data), None
+    except WebhookDecodeError as e:
+        return None, str(e)
+
+def decode_batch(body, max_signals=500):
+    """
+    Toplu webhook gövdesini çözer: JSON dizi, {"signals": [...]} veya NDJSON (satır başına bir sinyal)
+    Gönderim sırasıyla [(Signal veya None, hata veya None)] döndürür - geçersiz sinyal batch'in geri kalanını düşürmez
+    """
+    stripped = (body or b"").strip()
+    if not stripped:
+        raise WebhookDecodeError("Empty payload")
+
+    try:
+        data = json_loads(stripped)
+    except ValueError:
+        data = None
+        if stripped[:1] != b"{":
+            raise WebhookDecodeError("Batch must be a JSON array, {\"signals\": [...]} or NDJSON")
+
+    if data is None:
+        # NDJSON - bozuk satır sadece kendi sonucunu hatalı yapar
+        lines = [line for line in stripped.splitlines() if line.strip()]
+        if len(lines) > max_signals:
+            raise WebhookDecodeError(f"Batch exceeds {max_signals} signals")
+        items = []
+        for line in lines:
+            try:
+                items.append(_batch_item(json_loads(line)))
+            except ValueError as e:
+                items.append((None, f"Invalid JSON: {e}"))
+        return items
+
+    if isinstance(data, dict):
+        data = data.get("signals", [data])
+    if not isinstance(data, list):
+        raise WebhookDecodeError("signals must be an array")
+    if not data:
+        raise WebhookDecodeError("Batch contains no signals")
+    if len(data) > max_signals:
+        raise WebhookDecodeError(f"Batch exceeds {max_signals} signals")
+    return [_batch_item(item) for item in data]
@@ -1,9 +1,14 @@
-from flask import Flask, request, jsonify
-import json
+from startup_profiler import StartupProfiler
+
+# Açılış profili - import/kurulum aşamaları, warm-up adımları ve ilk sağlıklı yanıt süresi (/api/bot/status)
+startup = StartupProfiler()
+
+with startup.phase("import:flask"):
+    from flask import Flask, Response, request, jsonify, g
+    from flask_cors import CORS
 import os
-import math
 try:
-    from api_keyler import API_KEY, API_SECRET, DISCORD_TOKEN, DISCORD_CHANNEL_ID, DISCORD_WEBHOOK_URL, USE_TESTNET, DEFAULT_SYMBOL
+    from api_keyler import API_KEY, API_SECRET, DISCORD_TOKEN, DISCORD_CHANNEL_ID, DISCORD_WEBHOOK_URL, USE_TESTNET, DEFAULT_SYMBOL, BINANCE_BASE_URL, BINANCE_STREAM_URL
 except ImportError:
     import os
     API_KEY = os.environ.get("BINANCE_API_KEY", "")
@@ -13,135 +18,251 @@ except ImportError:
     DISCORD_WEBHOOK_URL = os.environ.get("DISCORD_WEBHOOK_URL", "")
     USE_TESTNET = os.environ.get("USE_TESTNET", "True")
     DEFAULT_SYMBOL = os.environ.get("DEFAULT_SYMBOL", "BTCUSDT")
+    BINANCE_BASE_URL = os.environ.get("BINANCE_BASE_URL", "https://testnet.binancefuture.com")
+    BINANCE_STREAM_URL = os.environ.get("BINANCE_STREAM_URL", "wss://stream.binancefuture.com")
 
-from binance.um_futures import UMFutures
+import atexit
+from contextlib import contextmanager
 import logging
-import requests
 import datetime
 import time
+# binance client modülü ağırdır - warm-up thread'inde veya ilk client oluşturulurken yüklenir
+UMFutures = None
+with startup.phase("import:modules"):
+    from client_registry import ClientRegistry
+    from positions_cache import PositionsCache
+    from discord_dispatcher import DiscordDispatcher
+    from signal_executor import SignalExecutor, SignalQueueFull
+    from signal_coalescer import SignalCoalescer, merge_signals
+    from webhook_decoder import decode_webhook_request, decode_batch, WebhookDecodeError
+    from trading_limits import TradingLimits
+    from pnl_reconciler import PnlReconciler
+    from trade_journal import TradeJournal
+    from shared_state import create_state
+    from dedup_cache import IdempotencyCache, signal_idempotency_key
+    from dashboard_feed import DashboardFeed
+    from position_sizing import ExchangeInfoCache, PositionSizer, SizingError
+    from order_execution import BracketExecutor, TP_LEVELS
+    from market_stream import MarketStreams
+    from fanout import FanoutExecutor, aggregate_results, aggregate_batch_results
+    from log_pipeline import configure_logging, LogSampler
+    from exchange_scheduler import ExchangeScheduler, ScheduledClient
+    from signal_history import create_signal_history, begin_stages, end_stages, stage_scope, record_stage
+    from metrics import MetricsRegistry, InstrumentedClient, TraceIdFilter, new_trace_id, get_trace_id, set_trace_id, traced
 
-# İşlem limitleri ve başarısız işlem takibi için sınıf
-class TradingLimits:
-    def __init__(self):
-        self.daily_trades = {}
-        self.failed_trades = {}
-        self.daily_pnl = {}
-        self.trade_blocked_symbols = set()
-        self.max_failed_trades = 3
-        self.max_daily_trades = 10
-        self.max_open_positions = 5
-        
-    def reset_daily_stats(self):
-        today = datetime.datetime.now().strftime('%Y-%m-%d')
-        self.daily_trades[today] = {}
-        self.failed_trades[today] = {}
-        self.daily_pnl[today] = {}
-        self.trade_blocked_symbols = set()
-        logger.info("Günlük işlem istatistikleri sıfırlandı.")
-        
-    def get_today_key(self):
-        return datetime.datetime.now().strftime('%Y-%m-%d')
-        
-    def record_trade(self, symbol, is_successful=True, profit_loss=None):
-        today = self.get_today_key()
-        
-        if today not in self.daily_trades:
-            self.daily_trades[today] = {}
-        if today not in self.failed_trades:
-            self.failed_trades[today] = {}
-        if today not in self.daily_pnl:
-            self.daily_pnl[today] = {}
-            
-        if symbol not in self.daily_trades[today]:
-            self.daily_trades[today][symbol] = 0
-        if symbol not in self.failed_trades[today]:
-            self.failed_trades[today][symbol] = 0
-        if symbol not in self.daily_pnl[today]:
-            self.daily_pnl[today][symbol] = 0
-            
-        self.daily_trades[today][symbol] += 1
-        
-        if not is_successful:
-            self.failed_trades[today][symbol] += 1
-            if self.failed_trades[today][symbol] >= self.max_failed_trades:
-                self.trade_blocked_symbols.add(symbol)
-                logger.warning(f"{symbol} için işlemler engellendi.")
-                send_discord_message(f"⛔️ **İŞLEM ENGELLENDİ** - {symbol}")
-        
-        if profit_loss is not None:
-            self.daily_pnl[today][symbol] += profit_loss
-            
-        logger.info(f"İşlem kaydedildi: {symbol}, Başarı: {is_successful}")
-        
-    def can_trade(self, symbol):
-        today = self.get_today_key()
-        
-        if symbol in self.trade_blocked_symbols:
-            return False
-            
-        if today in self.daily_trades and symbol in self.daily_trades[today]:
-            if self.daily_trades[today][symbol] >= self.max_daily_trades:
-                return False
-                
-        open_positions = len(get_open_positions())
-        if open_positions >= self.max_open_positions:
-            return False
-            
-        return True
+# Fan-out modu: tek TradingView alarmı tüm bağlı hesaplarda çalışır
+SIGNAL_FANOUT = os.environ.get("SIGNAL_FANOUT", "False") == "True"
+
+# Günlük gerçekleşmiş zarar limiti (USDT, 0 kapalı) - PnL borsadan uzlaştırılır, aşılınca bot durur
+MAX_DAILY_LOSS = float(os.environ.get("MAX_DAILY_LOSS", 0))
+
+def halt_on_daily_loss(user_id, pnl, reason):
+    """Günlük zarar limiti aşıldı - fan-out'ta sadece o hesap, tek hesap modunda bot durdurulur"""
+    suffix = f" (User: {user_id})" if user_id else ""
+    if user_id is None:
+        bot_state.status = "halted"
+        publish_bot_state()
+    send_discord_message(f"🛑 **GÜNLÜK ZARAR LİMİTİ** - PnL {pnl:.2f} USDT, işlemler gün sonuna kadar durduruldu{suffix}")
+
+def resume_after_daily_loss(user_id):
+    """UTC gün değişti - zarar limitiyle duran bot yeniden çalışır (elle durdurulan bota dokunulmaz)"""
+    if user_id is None and bot_state.status == "halted":
+        bot_state.status = "running"
+        publish_bot_state()
+        logger.info("▶️ Yeni UTC günü - günlük zarar limiti sıfırlandı, bot yeniden çalışıyor")
+        send_discord_message("▶️ **YENİ GÜN** - Günlük zarar limiti sıfırlandı, bot yeniden çalışıyor")
+
+def create_trading_limits(user_id=None):
+    """Hesap (veya tüm bot) için TradingLimits oluşturur; olaylar kullanıcı etiketiyle yayınlanır"""
+    suffix = f" (User: {user_id})" if user_id else ""
+    return TradingLimits(
+        max_failed_trades=int(os.environ.get("MAX_FAILED_TRADES", 3)),
+        max_daily_trades=int(os.environ.get("MAX_DAILY_TRADES", 10)),
+        max_open_positions=int(os.environ.get("MAX_OPEN_POSITIONS", 5)),
+        history_days=int(os.environ.get("TRADE_HISTORY_DAYS", 7)),
+        open_positions=lambda: [p['symbol'] for p in get_open_positions(user_id=user_id)],
+        on_block=lambda symbol, reason: send_discord_message(f"⛔️ **İŞLEM ENGELLENDİ** - {symbol}{suffix}"),
+        max_daily_loss=MAX_DAILY_LOSS,
+        on_max_loss=lambda pnl, reason: halt_on_daily_loss(user_id, pnl, reason),
+        on_day_change=lambda day: resume_after_daily_loss(user_id),
+        listener=lambda event_type, payload: on_limits_event(event_type, dict(payload, user=user_id) if user_id else payload),
+        state=shared_state,
+        scope=f"user:{user_id}" if user_id else "bot"
+    )
+
+# Paylaşılan durum: API key'ler, bot durumu ve işlem limitleri bu backend'de tutulur
+# STATE_BACKEND=sqlite ile aynı makinedeki tüm gunicorn worker'ları aynı durumu görür
+shared_state = create_state(os.environ.get("STATE_BACKEND", "local"), os.environ.get("STATE_PATH") or None)
 
 # Global değişkenler
-trade_limits = TradingLimits()
-user_api_keys = {}
-active_trading_user = None
-bot_status = "offline"
-
-# Loglama sistemi
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("bot_logs.log"),
-        logging.StreamHandler()
-    ]
-)
+trade_limits = create_trading_limits()
+user_trade_limits = {}
+user_api_keys = shared_state.hash("api_keys")
+bot_state = shared_state.record("bot", status="offline", active_user=None)
+
+# Loglama sistemi - her satır isteğin trace ID'sini taşır
+# LOG_ASYNC=True (varsayılan): biçimlendirme ve disk yazımı arka plan thread'inde yapılır, dosya JSON satırlarıdır
+with startup.phase("logging"):
+    log_pipeline = configure_logging(
+        path=os.environ.get("LOG_FILE", "bot_logs.log"),
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        async_mode=os.environ.get("LOG_ASYNC", "True") == "True",
+        max_bytes=int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        backup_count=int(os.environ.get("LOG_BACKUP_COUNT", 7)),
+        filters=(TraceIdFilter(),)
+    )
+if log_pipeline:
+    atexit.register(log_pipeline.stop)
 logger = logging.getLogger("trade_bot")
+# Yüksek sinyal hızında ham payload sadece örneklenerek loglanır
+payload_log_sampler = LogSampler(max_per_second=int(os.environ.get("LOG_PAYLOAD_PER_SECOND", 5)))
+
+# Hot-path metrikleri - /metrics üzerinden Prometheus formatında sunulur
+metrics = MetricsRegistry()
+http_latency = metrics.histogram("http_request_duration_seconds", "HTTP request latency", ("endpoint", "method"))
+http_requests = metrics.counter("http_requests_total", "HTTP requests by status", ("endpoint", "status"))
+webhook_stage_latency = metrics.histogram("webhook_stage_duration_seconds", "Webhook processing stage latency", ("stage",))
+signals_total = metrics.counter("signals_total", "Processed signals by result", ("signal", "status"))
+exchange_latency = metrics.histogram("exchange_request_duration_seconds", "Binance API call latency", ("method",))
+exchange_errors = metrics.counter("exchange_errors_total", "Failed Binance API calls", ("method",))
+discord_latency = metrics.histogram("discord_post_duration_seconds", "Discord webhook post latency")
+discord_posts = metrics.counter("discord_posts_total", "Discord webhook posts by status", ("status",))
+
+# Sinyal geçmişi - /api/signals ve /api/stats sabit boyutlu tampondan yanıt verir, log dosyası taranmaz
+# STATE_BACKEND=sqlite ile tampon state dosyasındadır ve tüm worker'lar aynı geçmişi görür
+signal_history = create_signal_history(int(os.environ.get("SIGNAL_HISTORY_SIZE", 10000)), shared_state)
+
+@contextmanager
+def timed_stage(stage):
+    """Aşama süresini metrik histogramına ve sinyalin geçmiş kaydına yazar"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        webhook_stage_latency.observe(elapsed, (stage,))
+        record_stage(stage, elapsed)
+
+# Kalıcı trade journal - restart/redeploy sonrası limitler ve bot durumu geri yüklenir
+# API key'ler bilinçli olarak diske yazılmaz; restart sonrası web sitesinden yeniden bağlanmalıdır
+TRADE_JOURNAL_PATH = os.environ.get("TRADE_JOURNAL_PATH", "trade_journal.db")
+trade_journal = None
+
+def recover_state():
+    """Journal'dan limitleri ve bot durumunu kurar - warm-up thread'inde, trading uçları açılmadan önce çalışır"""
+    global trade_journal
+    if not TRADE_JOURNAL_PATH:
+        return
+    try:
+        journal = TradeJournal(TRADE_JOURNAL_PATH, history_days=trade_limits.history.maxlen)
+        recovered = journal.recover()
+        # Paylaşılan durumu sadece ilk açılan worker kurar - sonradan açılanlar canlı durumu ezmez
+        if shared_state.hsetnx("meta", "recovered", time.time()):
+            trade_limits.restore_state(recovered.limits.export_state())
+            for user_id, limits in recovered.user_limits.items():
+                user_trade_limits[user_id] = create_trading_limits(user_id)
+                user_trade_limits[user_id].restore_state(limits.export_state())
+            bot_state.status = recovered.bot.get("status", bot_state.status)
+            bot_state.active_user = recovered.bot.get("active_user", bot_state.active_user)
+        trade_journal = journal
+    except Exception as e:
+        logger.error(f"Trade journal açılamadı, durum sadece bellekte tutulacak: {e}")
+
+def publish_bot_state():
+    """Bot durum değişikliğini journal'a yazar ve dashboard'lara bildirir"""
+    if trade_journal:
+        trade_journal.append("bot", {"status": bot_state.status, "active_user": bot_state.active_user})
+    dashboard_feed.bump("bot")
 
 # Flask uygulaması
 app = Flask(__name__)
 
 # Flask CORS desteği
-from flask_cors import CORS
-CORS(app, origins=["https://sivilabdullah.github.io", "http://localhost:3000", "http://127.0.0.1:5500"])
+CORS(app, origins=["https://sivilabdullah.github.io", "http://localhost:3000", "http://127.0.0.1:5500"],
+     expose_headers=["ETag", "X-Request-ID"], max_age=600)
+
+@app.before_request
+def start_request_trace():
+    g.request_started = time.perf_counter()
+    g.trace_id = new_trace_id(request.headers.get('X-Request-ID'))
+    begin_stages()
+
+# Warm-up bitene kadar sadece sağlık ve metrik uçları yanıt verir - sinyaller kurtarılmamış durumla işlenmez
+STARTUP_WAIT_TIMEOUT = float(os.environ.get("STARTUP_WAIT_TIMEOUT", 30))
+STARTUP_OPEN_ENDPOINTS = ("health_check", "get_metrics")
+
+@app.before_request
+def wait_for_warmup():
+    if startup.ready.is_set() or request.endpoint in STARTUP_OPEN_ENDPOINTS:
+        return None
+    if not startup.wait_ready(STARTUP_WAIT_TIMEOUT):
+        return jsonify({"status": "error", "message": "Server is still starting"}), 503
+    return None
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    started = g.get('request_started')
+    if started is not None:
+        http_latency.observe(time.perf_counter() - started, (endpoint, request.method))
+    http_requests.inc((endpoint, str(response.status_code)))
+    response.headers['X-Request-ID'] = g.get('trace_id', '')
+    return response
+
+@app.teardown_request
+def clear_request_stages(exc):
+    # İstek thread'i yeniden kullanıldığında önceki isteğin aşamaları taşınmaz
+    end_stages()
+
+# Binance HTTP istek zaman aşımı (saniye) - takılan istek worker thread'ini süresiz tutmaz
+EXCHANGE_REQUEST_TIMEOUT = float(os.environ.get("EXCHANGE_REQUEST_TIMEOUT", 10))
+
+# Tüm exchange çağrıları hesap bazlı ağırlık bütçesinden geçer - emirler önceliklidir, aynı okumalar birleşir
+exchange_scheduler = ExchangeScheduler(
+    weight_limit=int(os.environ.get("EXCHANGE_WEIGHT_LIMIT", 2400)),
+    reserve_ratio=float(os.environ.get("EXCHANGE_ORDER_RESERVE", 0.2)),
+    wait_timeout=float(os.environ.get("EXCHANGE_WAIT_TIMEOUT", 10)),
+    request_timeout=EXCHANGE_REQUEST_TIMEOUT
+)
+
+def load_um_futures():
+    """binance client modülünü ilk ihtiyaçta yükler"""
+    global UMFutures
+    if UMFutures is None:
+        from binance.um_futures import UMFutures
+    return UMFutures
+
+def create_binance_client(api_key, secret_key):
+    """Yeni bir Binance Futures client'ı oluşturur"""
+    client = load_um_futures()(key=api_key, secret=secret_key, base_url=BINANCE_BASE_URL, show_limit_usage=True,
+                               timeout=EXCHANGE_REQUEST_TIMEOUT)
+    return ScheduledClient(InstrumentedClient(client, exchange_latency, exchange_errors),
+                           exchange_scheduler, api_key[:8] if api_key else "public")
+
+# Kullanıcı bazlı client havuzu - her çağrıda yeni session/TLS handshake açılmasını önler
+client_registry = ClientRegistry(
+    create_binance_client,
+    idle_timeout=int(os.environ.get("CLIENT_IDLE_TIMEOUT", 900))
+)
 
 def get_active_client():
     """Kullanıcıdan alınan API key'leriyle Binance client'ı döndürür"""
-    global active_trading_user
     
     # 1. Web sitesinden alınan API key'ler (öncelik)
-    if active_trading_user and active_trading_user in user_api_keys:
-        user_keys = user_api_keys[active_trading_user]
+    if bot_state.active_user and bot_state.active_user in user_api_keys:
+        user_keys = user_api_keys[bot_state.active_user]
         try:
-            client = UMFutures(
-                key=user_keys['api_key'], 
-                secret=user_keys['secret_key'], 
-                base_url="https://testnet.binancefuture.com"
-            )
-            logger.info(f"✅ Aktif kullanıcı API key'leri kullanılıyor: {active_trading_user}")
-            return client
+            return client_registry.get(bot_state.active_user, user_keys['api_key'], user_keys['secret_key'])
         except Exception as e:
             logger.error(f"Aktif kullanıcı client hatası: {e}")
             
     # 2. Herhangi bir kullanıcının API key'leri
     if user_api_keys:
-        for user_id, user_keys in user_api_keys.items():
+        for user_id, user_keys in list(user_api_keys.items()):
             try:
-                client = UMFutures(
-                    key=user_keys['api_key'], 
-                    secret=user_keys['secret_key'], 
-                    base_url="https://testnet.binancefuture.com"
-                )
-                logger.info(f"✅ Kullanıcı API key'leri kullanılıyor: {user_id}")
-                active_trading_user = user_id
+                client = client_registry.get(user_id, user_keys['api_key'], user_keys['secret_key'])
+                logger.info("✅ Kullanıcı API key'leri kullanılıyor: %s", user_id)
+                bot_state.active_user = user_id
                 return client
             except Exception as e:
                 logger.error(f"User {user_id} client hatası: {e}")
@@ -150,128 +271,505 @@ def get_active_client():
     # 3. Environment variables (fallback)
     if API_KEY and API_SECRET:
         logger.warning("⚠️ Environment variables kullanılıyor")
-        return UMFutures(key=API_KEY, secret=API_SECRET, base_url="https://testnet.binancefuture.com")
+        return client_registry.get("__env__", API_KEY, API_SECRET)
     
     logger.error("❌ Hiçbir API key bulunamadı!")
     return None
 
+def client_for(user_id=None):
+    """Belirtilen kullanıcının client'ını, kullanıcı yoksa aktif client'ı döndürür"""
+    user_keys = user_api_keys.get(user_id) if user_id else None
+    if user_keys:
+        return client_registry.get(user_id, user_keys['api_key'], user_keys['secret_key'])
+    return get_active_client()
+
+# Discord bildirimleri arka plan thread'inde, toplu olarak gönderilir - webhook gecikmesi Discord'a bağlı değildir
+discord_dispatcher = DiscordDispatcher(
+    DISCORD_WEBHOOK_URL,
+    max_queue=int(os.environ.get("DISCORD_QUEUE_SIZE", 500)),
+    batch_window=float(os.environ.get("DISCORD_BATCH_WINDOW", 0.5)),
+    observer=lambda elapsed, status: (discord_latency.observe(elapsed), discord_posts.inc((str(status),)))
+)
+
 def send_discord_message(content):
-    """Discord webhook'una mesaj gönderir"""
+    """Discord webhook'una mesaj gönderir (kuyruğa ekler, bloklamaz)"""
     try:
         if DISCORD_WEBHOOK_URL:
-            webhook_url = DISCORD_WEBHOOK_URL
-            data = {"content": content}
-            response = requests.post(webhook_url, json=data)
-            logger.info(f"Discord mesajı gönderildi: {content[:50]}...")
-            return response
+            queued = discord_dispatcher.send(content)
+            if not queued:
+                logger.warning("Discord kuyruğu dolu, mesaj atlandı: %s...", content[:50])
+            return queued
         else:
-            logger.info(f"Discord mesajı (webhook yok): {content[:50]}...")
+            logger.info("Discord mesajı (webhook yok): %s...", content[:50])
     except Exception as e:
         logger.error(f"Discord mesajı gönderme hatası: {e}")
         return None
 
-def get_open_positions(symbol=None):
-    """Açık pozisyonları getirir"""
+# Websocket ile beslenen mark price ve hesap görünümü - bağlıyken bakiye/pozisyon okumaları REST'e gitmez
+market_streams = MarketStreams(
+    BINANCE_STREAM_URL,
+    client_for,
+    enabled=os.environ.get("MARKET_STREAMS", "True") == "True",
+    keepalive_interval=float(os.environ.get("LISTEN_KEY_KEEPALIVE", 1800)),
+    on_update=lambda: dashboard_feed.bump("account")
+)
+
+# Açık pozisyon snapshot cache'i - dashboard polling ve sinyal burst'lerinde exchange çağrılarını paylaştırır
+positions_cache = PositionsCache(ttl=float(os.environ.get("POSITIONS_CACHE_TTL", 5)))
+
+def get_open_positions(symbol=None, user_id=None):
+    """Açık pozisyonları getirir (user_id verilmezse aktif kullanıcı)"""
     try:
-        active_client = get_active_client()
+        view = market_streams.account_view(user_id or bot_state.active_user)
+        if view is not None:
+            positions = view.open_positions()
+            return [p for p in positions if p['symbol'] == symbol] if symbol else positions
+        
+        active_client = client_for(user_id)
         if not active_client:
             logger.error("Client bulunamadı - pozisyonlar alınamıyor")
             return []
             
-        positions = active_client.get_position_risk()
-        if symbol:
-            positions = [p for p in positions if p['symbol'] == symbol and float(p['positionAmt']) != 0]
-        else:
-            positions = [p for p in positions if float(p['positionAmt']) != 0]
+        def fetch_positions():
+            positions = [p for p in active_client.get_position_risk() if float(p['positionAmt']) != 0]
+            logger.info("Açık pozisyonlar alındı: %s adet", len(positions))
+            return positions
         
-        logger.info(f"Açık pozisyonlar alındı: {len(positions)} adet")
-        return positions
+        cache_key = user_id if user_id in user_api_keys else (bot_state.active_user or "__env__")
+        positions = positions_cache.get(cache_key, fetch_positions)
+        if symbol:
+            return [p for p in positions if p['symbol'] == symbol]
+        return list(positions)
     except Exception as e:
         logger.error(f"Pozisyon bilgisi alma hatası: {e}")
         return []
 
-def parse_webhook_data(request):
-    """
-    TradingView webhook verilerini farklı formatlardan parse eder
-    """
+# Exchange sembol filtreleri başlangıçta bir kez yüklenir ve arka planda yenilenir - sinyal başına REST çağrısı yok
+exchange_info_cache = ExchangeInfoCache(
+    lambda: create_binance_client(None, None).exchange_info(),
+    refresh_interval=float(os.environ.get("EXCHANGE_INFO_REFRESH", 3600))
+)
+position_sizer = PositionSizer(
+    exchange_info_cache,
+    atr_multiplier=float(os.environ.get("ATR_STOP_MULTIPLIER", 1.5)),
+    max_leverage=float(os.environ.get("MAX_LEVERAGE", 10))
+)
+# Entry + SL + TP1-3: varsayılan entry ardından tek batch (2 istek); BRACKET_SINGLE_BATCH=True ile tek istek
+bracket_executor = BracketExecutor(
+    exchange_info_cache,
+    tp_multipliers=[float(m) for m in os.environ.get("TP_ATR_MULTIPLIERS", "1,2,3").split(",")],
+    single_batch=os.environ.get("BRACKET_SINGLE_BATCH", "False") == "True",
+    state=shared_state
+)
+
+def get_available_balance(user_id=None):
+    """Kullanıcının (verilmezse aktif kullanıcının) kullanılabilir USDT bakiyesini döndürür"""
+    view = market_streams.account_view(user_id or bot_state.active_user)
+    if view is not None and not view.available_stale:
+        return view.available
+    active_client = client_for(user_id)
+    if not active_client:
+        return 0.0
+    available = float(active_client.account().get('availableBalance', 0))
+    if view is not None:
+        # Pozisyon değişiminden sonraki ilk boyutlandırma marjini REST'ten alır, sonrakiler stream'den
+        view.refresh_available(available)
+    return available
+
+def size_order(data, side, user_id=None):
+    """Sinyal için exchange kurallarına uygun emir boyutunu hesaplar; hesaplanamazsa None"""
     try:
-        content_type = request.content_type or ""
-        raw_data = request.data.decode('utf-8') if request.data else ""
-        
-        logger.info(f"📨 Webhook alındı - Content-Type: '{content_type}'")
-        logger.info(f"📨 Raw data: {raw_data[:200]}...")
+        with timed_stage("sizing"):
+            balance = get_available_balance(user_id)
+            # Referans fiyat: taze mark price, yoksa sinyaldeki fiyat
+            price = market_streams.mark_price(data.symbol) or data.price
+            order_size = position_sizer.size(data.symbol, side, balance, data.risk, price, data.atr)
+        logger.info("📐 Emir boyutu: %s %s %s @%s SL %s", order_size.side, order_size.quantity, data.symbol, order_size.price, order_size.stop_price)
+        return order_size
+    except SizingError as e:
+        logger.warning("Emir boyutu hesaplanamadı (%s): %s", data.symbol, e)
+        return None
+
+def format_positions(positions):
+    """Exchange pozisyon satırlarını dashboard görünümüne çevirir"""
+    formatted = []
+    for p in positions:
+        amount = float(p['positionAmt'])
+        formatted.append({
+            "symbol": p['symbol'],
+            "side": "LONG" if amount > 0 else "SHORT",
+            "amount": amount,
+            "entry_price": float(p.get('entryPrice', 0)),
+            # UI 2 hane gösteriyor - küçük dalgalanmalar yeni versiyon üretmesin
+            "unrealized_pnl": round(float(p.get('unRealizedProfit', 0)), 2)
+        })
+    return formatted
+
+def build_dashboard_snapshot():
+    """Dashboard'un ihtiyaç duyduğu bot durumu, istatistik ve pozisyonları tek snapshot'ta toplar"""
+    limits = trade_limits.snapshot()
+    total_trades = sum(c['trades'] for c in limits['symbols'].values())
+    failed_trades = sum(c['failed'] for c in limits['symbols'].values())
+    positions = dashboard_feed.positions
+    return {
+        "bot": {
+            "bot_status": bot_state.status,
+            "active_user": bot_state.active_user,
+            "connected_users": len(user_api_keys),
+            "open_positions": len(positions),
+            "daily_trades": total_trades,
+            "uptime": "Running" if bot_state.status == "running" else "Stopped"
+        },
+        "stats": {
+            "date": limits['date'],
+            "total_trades": total_trades,
+            "failed_trades": failed_trades,
+            "success_rate": (total_trades - failed_trades) / total_trades * 100 if total_trades else 0.0,
+            "daily_pnl": round(sum(c['pnl'] for c in limits['symbols'].values()), 2),
+            "blocked_symbols": limits['blocked_symbols']
+        },
+        "positions": {
+            "total_positions": len(positions),
+            "positions": positions
+        }
+    }
+
+# Dashboard snapshot/ETag/SSE yayını - pozisyonlar sadece izleyici varken arka planda yenilenir
+dashboard_feed = DashboardFeed(
+    build_dashboard_snapshot,
+    refresh_positions=lambda: format_positions(get_open_positions()) if user_api_keys else [],
+    refresh_interval=float(os.environ.get("DASHBOARD_REFRESH_INTERVAL", 15)),
+    shared=shared_state if shared_state.shared else None
+)
+
+def on_limits_event(event_type, payload):
+    """TradingLimits olaylarını journal'a yazar ve dashboard'lara bildirir"""
+    if trade_journal:
+        trade_journal.append(event_type, payload)
+    dashboard_feed.bump(event_type)
+
+def limits_for(user_id):
+    """Hesabın işlem limitlerini döndürür - fan-out modunda her hesabın kendi limitleri vardır"""
+    if not SIGNAL_FANOUT or not user_id:
+        return trade_limits
+    limits = user_trade_limits.get(user_id)
+    if limits is None:
+        limits = user_trade_limits.setdefault(user_id, create_trading_limits(user_id))
+    return limits
+
+def process_signal(data, user_id=None, notify=True, checked=False):
+    """Doğrulanmış sinyali (Signal) bir hesapta işler, sonucu sinyal geçmişine yazar ve (yanıt, HTTP kodu) döndürür"""
+    user_id = user_id or bot_state.active_user
+    started = time.perf_counter()
+    with stage_scope() as stages:
+        body, status_code = handle_signal(data, user_id, notify, checked)
+    signal_history.add(data.symbol, data.signal, user_id, status_code, time.perf_counter() - started, stages, get_trace_id())
+    return body, status_code
+
+# İşlem limitlerine tabi giriş sinyalleri
+ENTRY_SIGNALS = ("buy", "smart_buy", "sell", "smart_sell")
+
+def handle_signal(data, user_id, notify=True, checked=False):
+    """process_signal'in gövdesi: limitler (checked ise toplu kontrol yapılmıştır), boyutlandırma ve emirler"""
+    limits = limits_for(user_id)
+    # Fan-out'ta hesap başına Discord mesajı yerine tek özet gönderilir
+    discord = send_discord_message if notify else (lambda content: None)
+    try:
+        # Verileri çıkar
+        signal = data.signal
+        symbol = data.symbol
+        price = data.price
+        atr = data.atr
+        risk_percentage = data.risk
         
-        data = None
+        logger.info("🚀 Sinyal işleniyor: %s %s @%s (User: %s)", signal, symbol, price, user_id)
+        discord(f"🎯 **SİNYAL ALINDI** - {signal} {symbol} @{price}")
         
-        # 1. JSON Content-Type kontrolü
-        if 'application/json' in content_type:
-            try:
-                data = request.get_json(force=False)
-                if data:
-                    logger.info("✅ JSON formatında parse edildi")
-                    return data
-            except Exception as e:
-                logger.warning(f"JSON parse hatası: {e}")
+        # İşlem limitleri sadece girişlere uygulanır - reduce-only çıkışlar (tp1-3) engellenmez ve sayılmaz
+        if checked or signal not in ENTRY_SIGNALS:
+            allowed = True
+        else:
+            with timed_stage("limits"):
+                allowed = limits.can_trade(symbol)
+        if not allowed:
+            logger.warning("⛔ %s için işlem limitleri aşıldı (User: %s)", symbol, user_id)
+            discord(f"⛔️ **İŞLEM ENGELLENDİ** - {symbol} limit aşımı")
+            signals_total.inc((signal, "blocked"))
+            return {"status": "error", "message": "Trading limits exceeded", "user": user_id}, 429
         
-        # 2. Form data kontrolü
-        if request.form:
-            form_data = dict(request.form)
-            logger.info(f"📋 Form data alındı: {list(form_data.keys())}")
+        # Sinyal işleme - entry, SL ve TP bacakları birlikte (batch) gönderilir
+        order_size = None
+        execution = None
+        if signal in ENTRY_SIGNALS:
+            side = "BUY" if signal in ["buy", "smart_buy"] else "SELL"
+            logger.info("%s %s sinyali işleniyor: %s", "📈" if side == "BUY" else "📉", side, symbol)
+            discord(f"{'📈' if side == 'BUY' else '📉'} **{side} SİNYALİ** - {symbol} işlem hazırlanıyor")
+            order_size = size_order(data, side, user_id)
+            if order_size is None:
+                signals_total.inc((signal, "rejected"))
+                return {"status": "error", "message": "Order could not be sized", "user": user_id}, 400
+            # Eski emir iptali sadece açık pozisyon veya kayıtlı bracket varsa yapılır (stream/cache - ek istek yok)
+            has_position = bool(get_open_positions(symbol, user_id))
+            with timed_stage("execution"):
+                execution = bracket_executor.open(client_for(user_id), order_size, atr, account=user_id,
+                                                  tp_prices=[data.get(level) for level in TP_LEVELS],
+                                                  has_position=has_position)
             
-            # İlk key'i JSON olarak parse etmeye çalış
-            if form_data:
-                first_key = list(form_data.keys())[0]
-                try:
-                    data = json.loads(first_key)
-                    logger.info("✅ Form data JSON olarak parse edildi")
-                    return data
-                except:
-                    logger.info("📋 Form data direkt kullanılıyor")
-                    return form_data
-        
-        # 3. Raw data parse (TradingView alert formatı)
-        if raw_data:
-            try:
-                # alert('{ ... }') formatını algıla
-                if 'alert(' in raw_data:
-                    start_index = raw_data.find('{')
-                    end_index = raw_data.rfind('}')
-                    if start_index != -1 and end_index != -1:
-                        json_str = raw_data[start_index:end_index+1]
-                        data = json.loads(json_str)
-                        logger.info("✅ Alert formatından JSON parse edildi")
-                        return data
-                
-                # Direkt JSON parse
-                if raw_data.strip().startswith('{'):
-                    data = json.loads(raw_data)
-                    logger.info("✅ Raw JSON parse edildi")
-                    return data
-                    
-            except Exception as e:
-                logger.warning(f"Raw data parse hatası: {e}")
+        elif signal in ["tp1", "tp2", "tp3"]:
+            logger.info("💰 Take Profit sinyali: %s %s", signal, symbol)
+            discord(f"💰 **{signal.upper()}** - {symbol}")
+            positions = get_open_positions(symbol, user_id)
+            position_amt = float(positions[0]['positionAmt']) if positions else 0.0
+            with timed_stage("execution"):
+                execution = bracket_executor.take_profit(client_for(user_id), symbol, signal, position_amt, account=user_id,
+                                                         levels=data.tp_levels)
         
-        # 4. URL-encoded data
-        if request.values:
-            data = dict(request.values)
-            logger.info(f"🌐 URL-encoded data alındı: {list(data.keys())}")
-            return data
+        # Emir gerçekleştiğinde pozisyon snapshot'ı eskir
+        positions_cache.invalidate(user_id)
         
-        # 5. En son çare - force JSON parse
-        try:
-            data = request.get_json(force=True)
-            if data:
-                logger.info("✅ Force JSON parse başarılı")
-                return data
-        except Exception as e:
-            logger.warning(f"Force JSON parse hatası: {e}")
+        if execution and execution.skipped:
+            # Bacak borsada zaten dolmuş / pozisyon kapanmış - işlem yok, başarısız sayılmaz
+            logger.info("💤 %s %s için emir gerekmedi: %s", signal, symbol, execution.skipped)
+            signals_total.inc((signal, "skipped"))
+            return {"status": "ok", "message": f"No order needed: {execution.skipped}", "signal": signal,
+                    "symbol": symbol, "user": user_id, "order": None, "execution": execution.to_dict()}, 200
         
-        logger.error("❌ Hiçbir format parse edilemedi")
-        return None
+        # Giriş bacaklarının sonucu işlem kaydına yansır - reddedilen bacak başarısız işlem sayılır
+        ok = execution.ok if execution else True
+        if signal in ENTRY_SIGNALS:
+            limits.record_trade(symbol, is_successful=ok)
+        signals_total.inc((signal, "ok" if ok else "failed"))
+        if execution and not ok:
+            failed_legs = ", ".join(f"{leg.name}: {leg.error}" for leg in execution.legs if not leg.ok)
+            discord(f"❌ **EMİR HATASI** - {symbol} ({failed_legs[:150]})")
+        elif execution:
+            discord(f"✅ **EMİRLER GÖNDERİLDİ** - {signal} {symbol} ({len(execution.legs)} emir, {execution.requests} istek)")
+        
+        return {
+            "status": "ok" if ok else "error", 
+            "message": "Webhook processed successfully" if ok else "Order execution failed",
+            "signal": signal,
+            "symbol": symbol,
+            "user": user_id,
+            "order": order_size.to_dict() if order_size else None,
+            "execution": execution.to_dict() if execution else None
+        }, 200 if ok else 502
         
     except Exception as e:
-        logger.error(f"Webhook data parse hatası: {e}")
-        return None
+        error_msg = f"Webhook işleme hatası: {e}"
+        logger.error(error_msg)
+        discord(f"❌ **WEBHOOK HATASI** - {str(e)[:100]}")
+        signals_total.inc((data.signal, "error"))
+        return {"status": "error", "message": str(e), "user": user_id}, 500
+
+# Fan-out modunda hesaplar sınırlı bir thread havuzunda, hesap başına zaman aşımıyla paralel işlenir
+fanout_executor = FanoutExecutor(
+    max_workers=int(os.environ.get("FANOUT_WORKERS", 8)),
+    user_timeout=float(os.environ.get("FANOUT_USER_TIMEOUT", 10))
+)
+
+def execute_signal(data, notify=True):
+    """Sinyali aktif hesapta veya (SIGNAL_FANOUT=True) tüm bağlı hesaplarda çalıştırır"""
+    if not SIGNAL_FANOUT:
+        return process_signal(data, notify=notify)
+    
+    user_ids = list(user_api_keys.keys())
+    if not user_ids:
+        return {"status": "error", "message": "No user API keys found."}, 400
+    
+    if notify:
+        send_discord_message(f"🎯 **SİNYAL ALINDI** - {data.signal} {data.symbol} @{data.price} → {len(user_ids)} hesap")
+    results = fanout_executor.run(traced(lambda user_id: process_signal(data, user_id, notify=False)), user_ids)
+    body, status_code = aggregate_results(data, results)
+    if notify:
+        send_discord_message(f"📡 **FAN-OUT** - {data.signal} {data.symbol}: {body['succeeded']}/{body['accounts']} hesap başarılı"
+                             + (f", {body['pending']} hesap bekliyor" if body['pending'] else ""))
+    return body, status_code
+
+def process_queued_signal(item):
+    """Kuyruktan alınan sinyali işler - kabul ile işleme arasında bot durdurulduysa atlar"""
+    trace_id, data = item
+    set_trace_id(trace_id)
+    if bot_state.status != "running":
+        logger.warning("Bot durumu: %s - Kuyruktaki sinyal işlenmedi", bot_state.status)
+        return {"status": "error", "message": f"Bot is not running. Status: {bot_state.status}"}, 400
+    return execute_signal(data)
+
+def execute_coalesced(items):
+    """Pencerede birleşen [(signal_id, Signal)] sinyallerini net niyetlere indirip sırayla çalıştırır"""
+    intents, summary = merge_signals(items)
+    symbol = items[0][1].symbol
+    if len(items) > 1:
+        logger.info("🧩 %s sinyali birleştirildi: %s → %s", symbol, " + ".join(summary["signals"]), summary["intent"])
+    if summary.get("dropped"):
+        dropped = [data.signal for signal_id, data in items if signal_id in summary["dropped"]]
+        logger.warning("🧩 %s: net giriş (%s) nedeniyle uygulanmayan sinyaller: %s", symbol, summary["intent"], ", ".join(dropped))
+        send_discord_message(f"🧩 **SİNYAL ATLANDI** - {symbol}: {', '.join(dropped)} yeni giriş ({summary['intent']}) nedeniyle uygulanmadı")
+    if not intents:
+        signal_history.add(symbol, "flat", bot_state.active_user, 200, 0.0, trace_id=get_trace_id(), outcome="flat")
+        send_discord_message(f"🧩 **SİNYALLER DENGELENDİ** - {symbol}: {' + '.join(summary['signals'])} → işlem yok")
+        body, status_code = {"status": "ok", "message": "Signals cancelled out, no order placed",
+                             "signal": "flat", "symbol": symbol}, 200
+    elif len(intents) == 1:
+        body, status_code = execute_signal(intents[0])
+    else:
+        # Ardışık olmayan TP seviyeleri (tp1 + tp3) ayrı emirlerle, seviye sırasıyla çalışır
+        results = [execute_signal(intent) for intent in intents]
+        succeeded = sum(1 for _, code in results if code < 400)
+        status_code = 200 if succeeded else max(code for _, code in results)
+        body = {
+            "status": "ok" if succeeded == len(results) else ("partial" if succeeded else "error"),
+            "signal": summary["intent"],
+            "symbol": symbol,
+            "results": [dict(result, http_status=code) for result, code in results]
+        }
+    return dict(body, coalesced=summary), status_code
+
+def process_queued_batch(items):
+    """Kuyrukta pencere içinde biriken aynı sembol sinyallerini birleştirip işler"""
+    set_trace_id(items[0][1][0])
+    if bot_state.status != "running":
+        logger.warning("Bot durumu: %s - Kuyruktaki %s sinyal işlenmedi", bot_state.status, len(items))
+        return {"status": "error", "message": f"Bot is not running. Status: {bot_state.status}"}, 400
+    return execute_coalesced([(signal_id, data) for signal_id, (_, data) in items])
+
+# Sembol başına birleştirme penceresi (ms) - 0 kapalı; aynı bardaki alarm burst'leri tek emre iner
+SIGNAL_COALESCE_WINDOW = float(os.environ.get("SIGNAL_COALESCE_MS", 0)) / 1000
+signal_coalescer = SignalCoalescer(
+    execute_coalesced,
+    window=SIGNAL_COALESCE_WINDOW,
+    wait_timeout=float(os.environ.get("SIGNAL_COALESCE_TIMEOUT", 30))
+) if SIGNAL_COALESCE_WINDOW > 0 else None
+
+# Asenkron webhook modu: sinyal doğrulanıp kuyruğa alınır, 202 ile hemen yanıt verilir
+WEBHOOK_ASYNC = os.environ.get("WEBHOOK_ASYNC", "False") == "True"
+signal_executor = SignalExecutor(
+    process_queued_signal,
+    workers=int(os.environ.get("SIGNAL_WORKERS", 4)),
+    max_pending=int(os.environ.get("SIGNAL_QUEUE_SIZE", 1000)),
+    coalesce_window=SIGNAL_COALESCE_WINDOW,
+    batch_handler=process_queued_batch,
+    shared=shared_state if shared_state.shared else None
+)
+
+# Tekrarlanan (retry/çift alarm) sinyaller için idempotency cache
+WEBHOOK_DEDUP_WAIT = float(os.environ.get("WEBHOOK_DEDUP_WAIT", 10))
+dedup_cache = IdempotencyCache(
+    max_entries=int(os.environ.get("WEBHOOK_DEDUP_SIZE", 10000)),
+    ttl=float(os.environ.get("WEBHOOK_DEDUP_TTL", 300)),
+    shared=shared_state if shared_state.shared else None
+)
+
+def dispatch_signal(data):
+    """Sinyali moda göre kuyruğa alır veya hemen işler; (yanıt, HTTP kodu) döndürür"""
+    if WEBHOOK_ASYNC:
+        try:
+            signal_id = signal_executor.submit(data.symbol, (get_trace_id(), data))
+        except SignalQueueFull as e:
+            logger.error("❌ %s", e)
+            return {"status": "error", "message": "Signal queue is full"}, 503
+        
+        logger.info("📥 Sinyal kuyruğa alındı: %s %s %s", signal_id, data.signal, data.symbol)
+        return {
+            "status": "accepted",
+            "signal_id": signal_id,
+            "status_url": f"/api/signals/{signal_id}"
+        }, 202
+    
+    with timed_stage("execute"):
+        if signal_coalescer:
+            signal_id, (body, status_code) = signal_coalescer.submit(data)
+            return dict(body, signal_id=signal_id), status_code
+        return execute_signal(data)
+
+def check_trading_ready():
+    """Bot durumu, API key ve aktif kullanıcı kontrolü; sinyal işlenemiyorsa (yanıt, HTTP kodu) döndürür"""
+    # Bot durumu kontrolü - zarar limitiyle durduysa önce gün değişimi uygulanır
+    if bot_state.status == "halted":
+        trade_limits.roll_day()
+    if bot_state.status != "running":
+        logger.warning("Bot durumu: %s - Sinyal işlenmedi", bot_state.status)
+        send_discord_message(f"⚠️ **BOT PASİF** - Bot durumu: {bot_state.status}")
+        return {"status": "error", "message": f"Bot is not running. Status: {bot_state.status}"}, 400
+    
+    # API key kontrolü
+    if not user_api_keys:
+        logger.warning("❌ Kullanıcı API key'i bulunamadı")
+        send_discord_message("🔑 **API KEY GEREKLİ** - Web sitesinden API key bağlayın")
+        return {
+            "status": "error", 
+            "message": "No user API keys found. Connect API keys via website.",
+            "action_required": "Connect API keys"
+        }, 400
+    
+    # Aktif kullanıcı kontrolü
+    if not bot_state.active_user or bot_state.active_user not in user_api_keys:
+        logger.warning("⚠️ Aktif trading kullanıcısı yok")
+        if user_api_keys:
+            bot_state.active_user = list(user_api_keys.keys())[0]
+            logger.info("✅ İlk kullanıcı aktif yapıldı: %s", bot_state.active_user)
+        else:
+            send_discord_message("⚠️ **AKTİF KULLANICI YOK**")
+            return {
+                "status": "error", 
+                "message": "No active trading user. Login and connect API keys.",
+                "action_required": "Login and connect API keys"
+            }, 400
+    return None
+
+# Toplu alarm girişi: bar kapanışında yüzlerce sembolün sinyali tek istekle gelir
+# Limitler batch için tek seferde kontrol edilir, semboller paralel (aynı sembolün sinyalleri sırayla) işlenir
+BATCH_MAX_SIGNALS = int(os.environ.get("BATCH_MAX_SIGNALS", 500))
+batch_executor = FanoutExecutor(
+    max_workers=int(os.environ.get("BATCH_WORKERS", 16)),
+    user_timeout=float(os.environ.get("BATCH_TIMEOUT", 30))
+)
+
+def execute_batch(signals):
+    """[(sıra, Signal)] listesini çalıştırır; {sıra: (yanıt, HTTP kodu)} döndürür"""
+    results = {}
+    runnable = signals
+    if not SIGNAL_FANOUT:
+        # Tek açık pozisyon okuması ve tek limit okumasıyla tüm batch kontrol edilir
+        user_id = bot_state.active_user
+        limits = limits_for(user_id)
+        with timed_stage("limits"):
+            open_symbols = {p['symbol'] for p in get_open_positions(user_id=user_id)}
+            # Çıkış sinyalleri (tp1-3) limitlere tabi değildir
+            entries = [(index, data) for index, data in signals if data.signal in ENTRY_SIGNALS]
+            allowed = dict(zip((index for index, _ in entries),
+                               limits.can_trade_many([data.symbol for _, data in entries], open_symbols)))
+        runnable = []
+        for index, data in signals:
+            if allowed.get(index, True):
+                runnable.append((index, data))
+                continue
+            signals_total.inc((data.signal, "blocked"))
+            signal_history.add(data.symbol, data.signal, user_id, 429, 0.0, trace_id=get_trace_id())
+            results[index] = ({"status": "error", "message": "Trading limits exceeded", "symbol": data.symbol,
+                                "user": user_id}, 429)
+
+    groups = {}
+    for index, data in runnable:
+        groups.setdefault(data.symbol, []).append((index, data))
+
+    def run_symbol(symbol):
+        # Fan-out modunda limitler her hesapta ayrıca kontrol edilir
+        return [(index, execute_signal(data, notify=False) if SIGNAL_FANOUT
+                 else process_signal(data, notify=False, checked=True))
+                for index, data in groups[symbol]]
+
+    outcomes = batch_executor.run(traced(run_symbol), list(groups),
+                                  pending_message="Signals for {key} still processing, result will be logged")
+    for symbol, outcome in outcomes.items():
+        if isinstance(outcome, tuple):
+            # Zaman aşımı/hata - sembolün tüm sinyallerine sinyal bilgisiyle yazılır
+            body, status_code = outcome
+            results.update((index, (dict(body, signal=data.signal, symbol=symbol), status_code))
+                           for index, data in groups[symbol])
+        else:
+            results.update(outcome)
+    return results
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
@@ -279,105 +777,166 @@ def webhook():
     try:
         logger.info("🎯 Webhook isteği alındı")
         
-        # Bot durumu kontrolü
-        global bot_status
-        if bot_status != "running":
-            logger.warning(f"Bot durumu: {bot_status} - Sinyal işlenmedi")
-            send_discord_message(f"⚠️ **BOT PASİF** - Bot durumu: {bot_status}")
-            return jsonify({"status": "error", "message": f"Bot is not running. Status: {bot_status}"}), 400
+        not_ready = check_trading_ready()
+        if not_ready:
+            body, status_code = not_ready
+            return jsonify(body), status_code
         
-        # API key kontrolü
-        if not user_api_keys:
-            logger.warning("❌ Kullanıcı API key'i bulunamadı")
-            send_discord_message("🔑 **API KEY GEREKLİ** - Web sitesinden API key bağlayın")
-            return jsonify({
-                "status": "error", 
-                "message": "No user API keys found. Connect API keys via website.",
-                "action_required": "Connect API keys"
-            }), 400
+        # Webhook verilerini tek geçişte çöz ve doğrula
+        try:
+            with timed_stage("decode"):
+                data = decode_webhook_request(request)
+        except WebhookDecodeError as e:
+            logger.error("❌ Webhook verisi parse edilemedi: %s", e)
+            return jsonify({"status": "error", "message": f"Failed to parse webhook data: {e}"}), 400
+        # Her sinyal JSON loga yapılandırılmış kayıt olarak düşer - backtest.py bu kayıtları yeniden oynatır
+        logger.info("📨 Sinyal alındı: %s %s", data.signal, data.symbol, extra={"alert": data.to_dict()})
+        if payload_log_sampler.allow():
+            logger.info("📨 Sinyal verisi: %r", data)
         
-        # Aktif kullanıcı kontrolü
-        if not active_trading_user or active_trading_user not in user_api_keys:
-            logger.warning("⚠️ Aktif trading kullanıcısı yok")
-            if user_api_keys:
-                active_trading_user = list(user_api_keys.keys())[0]
-                logger.info(f"✅ İlk kullanıcı aktif yapıldı: {active_trading_user}")
-            else:
-                send_discord_message("⚠️ **AKTİF KULLANICI YOK**")
-                return jsonify({
-                    "status": "error", 
-                    "message": "No active trading user. Login and connect API keys.",
-                    "action_required": "Login and connect API keys"
-                }), 400
+        # Idempotency: aynı sinyalin tekrarları ilk sonucu alır, tekrar işlenmez
+        idempotency_key = signal_idempotency_key(data, request.headers.get('Idempotency-Key'))
+        if not idempotency_key:
+            body, status_code = dispatch_signal(data)
+            return jsonify(body), status_code
         
-        # Webhook verilerini parse et
-        data = parse_webhook_data(request)
+        is_owner, entry = dedup_cache.begin(idempotency_key)
+        if not is_owner:
+            with timed_stage("dedup_wait"):
+                result = dedup_cache.wait(entry, timeout=WEBHOOK_DEDUP_WAIT)
+            logger.info("♻️ Tekrarlanan sinyal atlandı: %s %s", data.signal, data.symbol)
+            signal_history.add(data.symbol, data.signal, bot_state.active_user, result[1] if result else 409,
+                               time.perf_counter() - g.request_started, trace_id=get_trace_id(), outcome="duplicate")
+            if result is None:
+                return jsonify({"status": "error", "message": "Duplicate signal is still being processed"}), 409
+            body, status_code = result
+            return jsonify(dict(body, duplicate=True)), status_code
         
-        if not data:
-            logger.error("❌ Webhook verisi parse edilemedi")
-            return jsonify({"status": "error", "message": "Failed to parse webhook data"}), 400
-            
-        logger.info(f"✅ Parse edilmiş data: {data}")
+        try:
+            body, status_code = dispatch_signal(data)
+        except Exception:
+            dedup_cache.abort(idempotency_key, entry)
+            raise
+        # Sunucu hataları cache'lenmez - tekrar deneme işlenebilsin
+        if status_code >= 500:
+            dedup_cache.abort(idempotency_key, entry)
+        else:
+            dedup_cache.complete(entry, (body, status_code))
+        return jsonify(body), status_code
         
-        # Gerekli alanları kontrol et
-        if not all(key in data for key in ['signal', 'symbol']):
-            logger.error(f"❌ Eksik alanlar. Mevcut: {list(data.keys())}")
-            return jsonify({"status": "error", "message": "Missing required fields: signal, symbol"}), 400
-            
-        # Verileri çıkar
-        signal = data['signal']
-        symbol = data['symbol']
-        price = data.get('price', '0')
-        atr = data.get('atr', None)
-        risk_percentage = float(data.get('risk', 1.0))
-        
-        logger.info(f"🚀 Sinyal işleniyor: {signal} {symbol} @{price} (User: {active_trading_user})")
-        send_discord_message(f"🎯 **SİNYAL ALINDI** - {signal} {symbol} @{price}")
-        
-        # İşlem limitlerini kontrol et
-        if not trade_limits.can_trade(symbol):
-            logger.warning(f"⛔ {symbol} için işlem limitleri aşıldı")
-            send_discord_message(f"⛔️ **İŞLEM ENGELLENDİ** - {symbol} limit aşımı")
-            return jsonify({"status": "error", "message": "Trading limits exceeded"}), 429
-        
-        # Basit sinyal işleme
-        if signal in ["buy", "smart_buy"]:
-            logger.info(f"📈 BUY sinyali işleniyor: {symbol}")
-            send_discord_message(f"📈 **BUY SİNYALİ** - {symbol} işlem hazırlanıyor")
-            # İşlem mantığı buraya eklenecek
-            
-        elif signal in ["sell", "smart_sell"]:
-            logger.info(f"📉 SELL sinyali işleniyor: {symbol}")
-            send_discord_message(f"📉 **SELL SİNYALİ** - {symbol} işlem hazırlanıyor")
-            # İşlem mantığı buraya eklenecek
-            
-        elif signal in ["tp1", "tp2", "tp3"]:
-            logger.info(f"💰 Take Profit sinyali: {signal} {symbol}")
-            send_discord_message(f"💰 **{signal.upper()}** - {symbol}")
-            # TP mantığı buraya eklenecek
+    except Exception as e:
+        error_msg = f"Webhook işleme hatası: {e}"
+        logger.error(error_msg)
+        send_discord_message(f"❌ **WEBHOOK HATASI** - {str(e)[:100]}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/webhook/batch', methods=['POST'])
+def webhook_batch():
+    """Toplu webhook: JSON dizi, {"signals": [...]} veya NDJSON; sonuçlar gönderim sırasıyla döner"""
+    try:
+        not_ready = check_trading_ready()
+        if not_ready:
+            body, status_code = not_ready
+            return jsonify(body), status_code
         
-        # Başarılı işlem kaydı
-        trade_limits.record_trade(symbol, is_successful=True)
+        try:
+            with timed_stage("decode"):
+                items = decode_batch(request.get_data(), max_signals=BATCH_MAX_SIGNALS)
+        except WebhookDecodeError as e:
+            logger.error("❌ Toplu webhook verisi parse edilemedi: %s", e)
+            return jsonify({"status": "error", "message": f"Failed to parse batch: {e}"}), 400
+        logger.info("📦 Toplu webhook alındı: %s sinyal", len(items))
         
-        return jsonify({
-            "status": "ok", 
-            "message": "Webhook processed successfully",
-            "signal": signal,
-            "symbol": symbol,
-            "user": active_trading_user
-        })
+        results = {}
+        signals = []
+        owned = {}
+        for index, (data, error) in enumerate(items):
+            if error:
+                results[index] = ({"status": "error", "message": f"Failed to parse webhook data: {error}"}, 400)
+                continue
+            logger.info("📨 Sinyal alındı: %s %s", data.signal, data.symbol, extra={"alert": data.to_dict()})
+            # Idempotency: batch beklemez - işlenmekte olan tekrar 409 alır
+            idempotency_key = signal_idempotency_key(data)
+            if idempotency_key:
+                is_owner, entry = dedup_cache.begin(idempotency_key)
+                if not is_owner:
+                    result = dedup_cache.wait(entry, timeout=0)
+                    signal_history.add(data.symbol, data.signal, bot_state.active_user, result[1] if result else 409, 0.0,
+                                       trace_id=get_trace_id(), outcome="duplicate")
+                    results[index] = (dict(result[0], duplicate=True), result[1]) if result else \
+                        ({"status": "error", "message": "Duplicate signal is still being processed"}, 409)
+                    continue
+                owned[index] = (idempotency_key, entry)
+            signals.append((index, data))
+        
+        try:
+            if WEBHOOK_ASYNC:
+                results.update((index, dispatch_signal(data)) for index, data in signals)
+            elif signals:
+                with timed_stage("execute"):
+                    results.update(execute_batch(signals))
+        except Exception:
+            for idempotency_key, entry in owned.values():
+                dedup_cache.abort(idempotency_key, entry)
+            raise
+        for index, (idempotency_key, entry) in owned.items():
+            # Sunucu hataları cache'lenmez - tekrar deneme işlenebilsin
+            if results[index][1] >= 500:
+                dedup_cache.abort(idempotency_key, entry)
+            else:
+                dedup_cache.complete(entry, results[index])
+        
+        body, status_code = aggregate_batch_results([results[index] for index in range(len(items))])
+        send_discord_message(f"📦 **TOPLU SİNYAL** - {body['count']} sinyal: {body['succeeded']} başarılı, "
+                             f"{body['blocked']} engellendi, {body['failed']} hata")
+        return jsonify(body), status_code
         
     except Exception as e:
-        error_msg = f"Webhook işleme hatası: {e}"
+        error_msg = f"Toplu webhook işleme hatası: {e}"
         logger.error(error_msg)
         send_discord_message(f"❌ **WEBHOOK HATASI** - {str(e)[:100]}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/signals/<signal_id>', methods=['GET'])
+def get_signal_status(signal_id):
+    """Kuyruğa alınan sinyalin durumunu/sonucunu döndürür"""
+    result = signal_executor.get_result(signal_id)
+    if not result:
+        return jsonify({"status": "error", "message": "Signal not found"}), 404
+    return jsonify({"status": "ok", "signal": result})
+
+@app.route('/api/signals', methods=['GET'])
+def list_signals():
+    """Son sinyalleri bellekteki geçmişten sayfalı döndürür (symbol, user, outcome filtreleri)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        before = request.args.get('before', type=int)
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit must be an integer"}), 400
+    signals, next_before = signal_history.query(
+        symbol=request.args.get('symbol', type=lambda s: s.upper()),
+        user=request.args.get('user'),
+        outcome=request.args.get('outcome'),
+        before=before,
+        limit=limit
+    )
+    return jsonify({"status": "ok", "signals": signals, "count": len(signals), "next_before": next_before})
+
+@app.route('/api/stats', methods=['GET'])
+def get_signal_stats():
+    """Sinyal sonuç/gecikme toplamları ve günün limit sayaçları - log taranmaz"""
+    symbol = request.args.get('symbol', type=lambda s: s.upper())
+    user = request.args.get('user')
+    return jsonify({
+        "status": "ok",
+        "signals": signal_history.stats(symbol=symbol, user=user),
+        "limits": user_trade_limits.get(user, trade_limits).snapshot()
+    })
+
 # API key yönetimi endpoint'i
 @app.route('/api/keys', methods=['POST'])
 def manage_api_keys():
     """API key'leri yönetir"""
-    global active_trading_user
     try:
         data = request.get_json(force=True)
         if not data:
@@ -401,9 +960,12 @@ def manage_api_keys():
                 
             # Binance bağlantısını test et
             try:
-                test_client = UMFutures(key=api_key, secret=secret_key, base_url="https://testnet.binancefuture.com")
+                test_client = create_binance_client(api_key, secret_key)
                 account_info = test_client.account()
                 if account_info:
+                    # Test edilen client'ı havuza al - ilk sinyalde yeniden bağlanılmaz
+                    client_registry.put(user_id, test_client, api_key, secret_key)
+                    
                     # API key'leri kaydet
                     user_api_keys[user_id] = {
                         'api_key': api_key,
@@ -412,9 +974,11 @@ def manage_api_keys():
                         'status': 'active'
                     }
                     
-                    active_trading_user = user_id
+                    bot_state.active_user = user_id
+                    market_streams.add_user(user_id)
                     
                     logger.info(f"✅ User {user_id} API keys connected")
+                    dashboard_feed.bump("keys")
                     send_discord_message(f"🔑 **API BAĞLANTISI** - User {user_id}")
                     
                     return jsonify({
@@ -433,13 +997,17 @@ def manage_api_keys():
         elif action == 'disconnect':
             if user_id in user_api_keys:
                 del user_api_keys[user_id]
+                market_streams.remove_user(user_id)
+                client_registry.evict(user_id)
+                positions_cache.forget(user_id)
                 
-                if active_trading_user == user_id:
-                    active_trading_user = None
+                if bot_state.active_user == user_id:
+                    bot_state.active_user = None
                     if user_api_keys:
-                        active_trading_user = list(user_api_keys.keys())[0]
+                        bot_state.active_user = list(user_api_keys.keys())[0]
                 
                 logger.info(f"🔓 User {user_id} API keys disconnected")
+                dashboard_feed.bump("keys")
                 send_discord_message(f"🔓 **API BAĞLANTI KESİLDİ** - User {user_id}")
                 return jsonify({"status": "ok", "message": "API keys disconnected"})
             else:
@@ -468,7 +1036,6 @@ def manage_api_keys():
 def start_bot():
     """Bot'u başlatır"""
     try:
-        global bot_status, active_trading_user
         data = request.get_json(force=True) if request.data else {}
         user_id = data.get('user_id') if data else None
         
@@ -489,26 +1056,27 @@ def start_bot():
                 "action_required": "Connect Binance API keys"
             }), 400
             
-        if bot_status == "running":
+        if bot_state.status == "running":
             return jsonify({"status": "error", "message": "Bot is already running"}), 400
             
         # Aktif kullanıcıyı ayarla
         if user_id and user_id in user_api_keys:
-            active_trading_user = user_id
+            bot_state.active_user = user_id
             logger.info(f"✅ Aktif kullanıcı: {user_id}")
         elif user_api_keys:
-            active_trading_user = list(user_api_keys.keys())[0]
-            logger.info(f"✅ İlk kullanıcı aktif: {active_trading_user}")
+            bot_state.active_user = list(user_api_keys.keys())[0]
+            logger.info(f"✅ İlk kullanıcı aktif: {bot_state.active_user}")
         
-        bot_status = "running"
-        logger.info(f"🚀 Bot başlatıldı - User: {active_trading_user}")
-        send_discord_message(f"🚀 **BOT BAŞLATILDI** - User: {active_trading_user}")
+        bot_state.status = "running"
+        publish_bot_state()
+        logger.info(f"🚀 Bot başlatıldı - User: {bot_state.active_user}")
+        send_discord_message(f"🚀 **BOT BAŞLATILDI** - User: {bot_state.active_user}")
         
         return jsonify({
             "status": "ok",
             "message": "Bot started successfully",
-            "bot_status": bot_status,
-            "active_user": active_trading_user,
+            "bot_status": bot_state.status,
+            "active_user": bot_state.active_user,
             "api_source": "website"
         })
         
@@ -520,21 +1088,21 @@ def start_bot():
 def stop_bot():
     """Bot'u durdurur"""
     try:
-        global bot_status
         data = request.get_json(force=True) if request.data else {}
         user_id = data.get('user_id') if data else None
         
-        if bot_status in ["stopped", "offline"]:
+        if bot_state.status in ["stopped", "offline"]:
             return jsonify({"status": "error", "message": "Bot is already stopped"}), 400
             
-        bot_status = "stopped"
+        bot_state.status = "stopped"
+        publish_bot_state()
         logger.info(f"⏹️ Bot durduruldu - User: {user_id}")
         send_discord_message(f"⏹️ **BOT DURDURULDU** - User: {user_id}")
         
         return jsonify({
             "status": "ok",
             "message": "Bot stopped successfully",
-            "bot_status": bot_status
+            "bot_status": bot_state.status
         })
         
     except Exception as e:
@@ -548,31 +1116,135 @@ def get_bot_status():
         positions = get_open_positions()
         open_positions_count = len(positions)
         
-        today = trade_limits.get_today_key()
-        daily_trades = trade_limits.daily_trades.get(today, {})
-        total_daily_trades = sum(daily_trades.values()) if daily_trades else 0
+        total_daily_trades = trade_limits.total_daily_trades()
         
         return jsonify({
             "status": "ok",
-            "bot_status": bot_status,
+            "bot_status": bot_state.status,
             "open_positions": open_positions_count,
             "daily_trades": total_daily_trades,
             "connected_users": len(user_api_keys),
-            "active_user": active_trading_user,
-            "uptime": "Running" if bot_status == "running" else "Stopped"
+            "active_user": bot_state.active_user,
+            "uptime": "Running" if bot_state.status == "running" else "Stopped",
+            "startup": startup.report(),
+            "state": shared_state.stats(),
+            "client_cache": client_registry.stats(),
+            "positions_cache": positions_cache.stats(),
+            "journal": trade_journal.stats() if trade_journal else None,
+            "discord": discord_dispatcher.stats(),
+            "signal_queue": signal_executor.stats(),
+            "coalescer": signal_coalescer.stats() if signal_coalescer else None,
+            "signal_history": {"capacity": signal_history.capacity, "size": len(signal_history)},
+            "dedup_cache": dedup_cache.stats(),
+            "dashboard": dashboard_feed.stats(),
+            "exchange_info": exchange_info_cache.stats(),
+            "exchange_scheduler": exchange_scheduler.stats(),
+            "orders": bracket_executor.stats(),
+            "streams": market_streams.stats(),
+            "pnl_reconciler": pnl_reconciler.stats(),
+            "fanout": fanout_executor.stats() if SIGNAL_FANOUT else None,
+            "batch": batch_executor.stats(),
+            "logging": dict(log_pipeline.stats(), payload_suppressed=payload_log_sampler.suppressed) if log_pipeline else None
         })
         
     except Exception as e:
         logger.error(f"Status check error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    """Bot durumu, istatistikler ve pozisyonları tek yanıtta döndürür - değişmediyse 304"""
+    try:
+        if request.headers.get('If-None-Match') == dashboard_feed.etag:
+            dashboard_feed.touch()
+            return Response(status=304, headers={"ETag": dashboard_feed.etag})
+        
+        version, snapshot = dashboard_feed.current()
+        response = jsonify(dict(snapshot, status="ok", version=version))
+        response.headers['ETag'] = dashboard_feed.etag_for(version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Dashboard snapshot error: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route('/api/dashboard/stream', methods=['GET'])
+def stream_dashboard():
+    """Dashboard değişikliklerini Server-Sent Events ile iter"""
+    subscriber = dashboard_feed.subscribe()
+    if subscriber is None:
+        return jsonify({"status": "error", "message": "Too many dashboard streams"}), 503
+    return Response(dashboard_feed.stream(subscriber), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Kuyruk derinlikleri ve cache boyutları scrape anında okunur
+metrics.gauge("signal_queue_pending", "Signals waiting in the async queue", lambda: signal_executor.stats()["pending"])
+metrics.gauge("discord_queue_depth", "Discord messages waiting to be posted", lambda: discord_dispatcher.stats()["queue_depth"])
+metrics.gauge("discord_dropped_total", "Discord messages dropped on a full queue", lambda: discord_dispatcher.dropped)
+metrics.gauge("journal_pending", "Journal events waiting to be written", lambda: trade_journal.stats()["pending"] if trade_journal else 0)
+metrics.gauge("dedup_cache_entries", "Idempotency cache entries", lambda: dedup_cache.stats()["size"])
+metrics.gauge("client_cache_entries", "Pooled exchange clients", lambda: client_registry.stats()["size"])
+metrics.gauge("dashboard_subscribers", "Open dashboard SSE streams", lambda: dashboard_feed.stats()["subscribers"])
+metrics.gauge("log_queue_depth", "Log records waiting for the writer thread", lambda: log_pipeline.stats()["queue_depth"] if log_pipeline else 0)
+metrics.gauge("log_dropped_total", "Log records dropped on a full queue", lambda: log_pipeline.handler.dropped if log_pipeline else 0)
+metrics.gauge("exchange_weight_available", "Remaining request weight in the local budget",
+              lambda: {account: b["available"] for account, b in exchange_scheduler.stats()["accounts"].items()}, ("account",))
+metrics.gauge("exchange_weight_used_1m", "Request weight reported by X-MBX-USED-WEIGHT-1M",
+              lambda: {account: b["used_weight_1m"] for account, b in exchange_scheduler.stats()["accounts"].items()}, ("account",))
+metrics.gauge("exchange_paused_seconds", "Seconds left in a 429/418 backoff",
+              lambda: {account: b["paused_for"] for account, b in exchange_scheduler.stats()["accounts"].items()}, ("account",))
+metrics.gauge("exchange_coalesced_total", "Read calls served by an identical in-flight request", lambda: exchange_scheduler.coalesced)
+metrics.gauge("exchange_rejected_total", "Calls rejected because the weight budget stayed exhausted", lambda: exchange_scheduler.rejected)
+metrics.gauge("exchange_rate_limited_total", "429/418 responses from the exchange", lambda: exchange_scheduler.rate_limited)
+metrics.gauge("bot_running", "1 when the bot is running", lambda: 1 if bot_state.status == "running" else 0)
+metrics.gauge("startup_ready", "1 once background warm-up has finished", lambda: 1 if startup.ready.is_set() else 0)
+
+def reconciled_accounts():
+    """PnL'i uzlaştırılacak (hesap, client, limitler) - fan-out'ta her hesap kendi limitlerine işlenir"""
+    if not user_api_keys and not (API_KEY and API_SECRET):
+        return []
+    if SIGNAL_FANOUT:
+        return [(user_id, client_for(user_id), limits_for(user_id)) for user_id in user_api_keys]
+    user_id = bot_state.active_user
+    return [(user_id or "__env__", client_for(user_id), trade_limits)]
+
+# Gerçekleşmiş PnL borsanın gelir geçmişinden artımlı çekilir - günlük PnL ve zarar limiti buna dayanır
+pnl_reconciler = PnlReconciler(
+    reconciled_accounts,
+    shared_state,
+    interval=float(os.environ.get("PNL_RECONCILE_INTERVAL", 60))
+)
+metrics.gauge("daily_realized_pnl", "Realized PnL reconciled from the exchange for the current UTC day",
+              lambda: trade_limits.total_daily_pnl())
+metrics.gauge("pnl_reconcile_errors_total", "Failed PnL reconciliation requests", lambda: pnl_reconciler.errors)
+
+# Ağır alt sistemler arka planda hazırlanır; /health bu sırada yanıt verir
+startup.warm_up([
+    ("journal", recover_state),
+    ("exchange_client", load_um_futures),
+    ("exchange_info", exchange_info_cache.start),
+    ("market_streams", market_streams.start_market),
+    ("pnl_reconciler", pnl_reconciler.start)
+])
+startup.mark("imported")
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text formatında metrikler"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Sağlık kontrol endpoint'i
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Railway health check endpoint'i"""
+    """Railway health check endpoint'i - warm-up beklenmez"""
+    startup.mark("first_healthy")
     return jsonify({
         "status": "healthy",
-        "bot_status": bot_status,
+        "ready": startup.ready.is_set(),
+        "bot_status": bot_state.status,
         "connected_users": len(user_api_keys),
         "timestamp": datetime.datetime.utcnow().isoformat()
     })
@@ -343,9 +343,16 @@ class Dashboard {
     }
 
     startStatusUpdates() {
-        // Update bot status every 30 seconds
+        // Sunucu destekliyorsa SSE ile sadece değişiklikler alınır
+        if (window.EventSource) {
+            this.openDashboardStream();
+        }
+
+        // SSE bağlı değilse 30 saniyede bir koşullu (ETag) istek
         setInterval(() => {
-            this.loadBotStatus();
+            if (this.dashboardStream && this.dashboardStream.readyState === EventSource.OPEN) {
+                return;
+            }
             this.loadRealTimeStats();
         }, 30000);
         
@@ -353,32 +360,33 @@ class Dashboard {
         this.loadRealTimeStats();
     }
 
-    async loadRealTimeStats() {
-        try {
-            // Bot durumu
-            const statusResponse = await fetch(`${this.botApiUrl}/api/bot/status`);
-            if (statusResponse.ok) {
-                const statusData = await statusResponse.json();
-                if (statusData.status === 'ok') {
-                    this.updateRealTimeStats(statusData);
-                }
+    openDashboardStream() {
+        const stream = new EventSource(`${this.botApiUrl}/api/dashboard/stream`);
+        const applyEvent = (event) => {
+            try {
+                this.applyDashboardSnapshot(JSON.parse(event.data));
+            } catch (error) {
+                console.warn('Dashboard stream parse error:', error);
             }
+        };
+        stream.addEventListener('snapshot', applyEvent);
+        stream.addEventListener('delta', applyEvent);
+        this.dashboardStream = stream;
+    }
 
-            // İşlem istatistikleri
-            const statsResponse = await fetch(`${this.botApiUrl}/api/stats`);
-            if (statsResponse.ok) {
-                const statsData = await statsResponse.json();
-                if (statsData.status === 'ok') {
-                    this.updateTradingStats(statsData.stats);
-                }
+    async loadRealTimeStats() {
+        try {
+            // Bot durumu, istatistikler ve pozisyonlar tek istekte; değişmediyse 304 döner
+            const headers = this.dashboardETag ? { 'If-None-Match': this.dashboardETag } : {};
+            const response = await fetch(`${this.botApiUrl}/api/dashboard`, { headers });
+            if (response.status === 304) {
+                return;
             }
-
-            // Açık pozisyonlar
-            const positionsResponse = await fetch(`${this.botApiUrl}/api/positions`);
-            if (positionsResponse.ok) {
-                const positionsData = await positionsResponse.json();
-                if (positionsData.status === 'ok') {
-                    this.updatePositionsInfo(positionsData);
+            if (response.ok) {
+                const data = await response.json();
+                if (data.status === 'ok') {
+                    this.dashboardETag = response.headers.get('ETag');
+                    this.applyDashboardSnapshot(data);
                 }
             }
         } catch (error) {
@@ -387,6 +395,22 @@ class Dashboard {
         }
     }
 
+    applyDashboardSnapshot(data) {
+        // Snapshot veya SSE delta'sı - sadece gelen bölümler güncellenir
+        if (data.bot) {
+            localStorage.setItem('bot_status', data.bot.bot_status);
+            this.updateBotStatus(data.bot.bot_status);
+            this.updateBotInfo(data.bot);
+            this.updateRealTimeStats(data.bot);
+        }
+        if (data.stats) {
+            this.updateTradingStats(data.stats);
+        }
+        if (data.positions) {
+            this.updatePositionsInfo(data.positions);
+        }
+    }
+
     updateRealTimeStats(data) {
         // Performance kartındaki istatistikleri güncelle
         const stats = document.querySelectorAll('.performance-stats .stat-item');